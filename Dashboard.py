@@ -1,21 +1,40 @@
 import streamlit as st
-import yfinance as yf
 import pandas as pd
 import numpy as np
 import plotly.graph_objs as go
 import plotly.express as px
 from datetime import datetime, timedelta
 import time
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
+import io
 import json
 import os
-from sklearn.linear_model import LinearRegression
-from sklearn.preprocessing import PolynomialFeatures
-from sklearn.pipeline import make_pipeline
+import tempfile
+import zipfile
 import pytz
 import warnings
+from storage import TrackerStore, DEFAULT_USER, DEFAULT_WATCHLIST
+from identity import verify_token
+from market_data import get_data_source, market_session, FX_SYMBOL, ISRAEL_INDICES
+from notifications import send_email, format_digest_email, NotificationDispatcher
+from streaming import StreamHub, INTERVAL_MS
+from performance import EquityCurve, lots_frame
+from ledger import Ledger, build_ledger, parse_transactions_csv, value_positions
+from screener import UNIVERSES, PRESET_CONDITIONS, fetch_panel, compute_indicators, scan
+from forecasting import ForecastRunner, MODELS as FORECAST_MODELS
+from montecarlo import forecast_bands
+from bars import PRICE_COLUMNS, compact_bars, bars_view
+from history_cache import HistoryCache
+from alerts import AlertBook, ALERT_WORKER, DEFAULT_HYSTERESIS, DEFAULT_COOLDOWN
+from prefetch import Prefetcher, predict_views
+from symbol_master import get_symbol_master, CURRENCY_SIGNS
+from charts import (
+    FigureCache, bars_version, price_figure, price_traces, session_day, index_figure, index_traces,
+    MAP_SIZES, market_map_frame, market_map_figure,
+)
+from reports import STAT_LABELS, symbol_report, render_html, render_pdf, generate_reports
+from intraday import IntradayStore, window as intraday_window, seasonality, volume_profile, auction_stats, auction_summary
+from market_calendar import session_for_symbol, weekly_hours
+from arbitrage import dual_listed_pairs, load_spreads, latest_spreads, spread_quotes, parse_spread_symbol, spread_symbol
 warnings.filterwarnings('ignore')
 
 # Configuration de la page
@@ -26,6 +45,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Fréquence de lecture du flux temps réel (mémoire locale, sans requête REST)
+STREAM_REFRESH_SEC = 0.5
+
 # Configuration du fuseau horaire
 USER_TIMEZONE = pytz.timezone('Europe/Paris')  # UTC+2 (heure d'été)
 ISRAEL_TIMEZONE = pytz.timezone('Asia/Jerusalem')  # UTC+2/UTC+3 (Idt)
@@ -105,62 +127,52 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-# Initialisation des variables de session
-if 'price_alerts' not in st.session_state:
-    st.session_state.price_alerts = []
-
-if 'portfolio' not in st.session_state:
-    st.session_state.portfolio = {}
-
-if 'watchlist' not in st.session_state:
-    st.session_state.watchlist = [
-        'TEVA',           # Teva Pharmaceutical Industries (TA100, aussi listé US)
-        'AZRG.TA',        # Azrieli Group
-        'BEZQ.TA',        # Bezeq
-        'LUMI.TA',        # Bank Leumi
-        'POLI.TA',        # Bank Hapoalim
-        'ICL.TA',         # ICL Group
-        'NICE',           # Nice Systems (TA100 & NASDAQ)
-        'ELAL.TA',        # El Al Airlines
-        'ENOG.TA',        # Energix
-        'KSML.TA'         # Kamada
-    ]
+# Stockage persistant (partagé entre toutes les sessions du serveur)
+@st.cache_resource
+def get_store():
+    """Connexion unique au stockage SQLite"""
+    return TrackerStore()
+
+store = get_store()
+
+def current_user():
+    """Utilisateur authentifié : compte Streamlit (st.login) si configuré, sinon jeton signé ?token=
+
+    Sans l'un ni l'autre, l'utilisateur par défaut (déploiement mono-utilisateur).
+    """
+    if st.user.get('is_logged_in'):
+        return st.user.get('email')
+    token = st.query_params.get('token')
+    if token is None:
+        return DEFAULT_USER
+    user = verify_token(token)
+    if user is None:
+        st.error("🔒 אסימון גישה לא תקף / Jeton d'accès invalide ou expiré")
+        st.stop()
+    return user
+
+user_id = current_user()
+
+# Initialisation des variables de session depuis le stockage
+def sync_session_state():
+    """Recharge l'état de session depuis le cache du stockage"""
+    state = store.get_user_state(user_id)
+    for key in ('price_alerts', 'portfolio', 'transactions', 'watchlist', 'email_config'):
+        st.session_state[key] = state[key]
+
+if st.session_state.get('user_id') != user_id:
+    st.session_state.user_id = user_id
+    sync_session_state()
 
 if 'notifications' not in st.session_state:
     st.session_state.notifications = []
 
-if 'email_config' not in st.session_state:
-    st.session_state.email_config = {
-        'enabled': False,
-        'smtp_server': 'smtp.gmail.com',
-        'smtp_port': 587,
-        'email': '',
-        'password': ''
-    }
-
 # Mapping des suffixes TASE
 TASE_EXCHANGES = {
     '.TA': 'Tel Aviv',
     '': 'US Listed/Global'
 }
 
-# Jours fériés israéliens (dates variables, liste partielle)
-ISRAELI_HOLIDAYS_2024 = [
-    '2024-03-24',  # Pourim
-    '2024-04-22',  # Pessah (1er jour)
-    '2024-04-23',  # Pessah (2ème jour)
-    '2024-04-28',  # Pessah (7ème jour)
-    '2024-04-29',  # Pessah (8ème jour)
-    '2024-05-13',  # Yom Ha'atzmaut
-    '2024-06-11',  # Shavouot
-    '2024-10-03',  # Roch Hachana
-    '2024-10-04',  # Roch Hachana
-    '2024-10-13',  # Yom Kippour
-    '2024-10-18',  # Souccot
-    '2024-10-19',  # Souccot
-    '2024-10-25',  # Sim'hat Torah
-]
-
 # Titre principal
 st.markdown("<h1 class='main-header'>🇮🇱 Tracker Bourse Israël - TASE en Temps Réel</h1>", unsafe_allow_html=True)
 
@@ -179,14 +191,40 @@ st.markdown(f"""
 </div>
 """, unsafe_allow_html=True)
 
+# Jours de la semaine (lundi = 0) : hébreu, français
+WEEKDAY_NAMES = [('שני', 'Lundi'), ('שלישי', 'Mardi'), ('רביעי', 'Mercredi'), ('חמישי', 'Jeudi'),
+                 ('שישי', 'Vendredi'), ('שבת', 'Samedi'), ('ראשון', 'Dimanche')]
+
+def week_hours_lines(session='TASE'):
+    """Horaires du calendrier des séances regroupés par plages de jours consécutifs aux mêmes heures"""
+    hours = weekly_hours(session)
+    # Semaine commençant au dimanche (TASE dimanche-jeudi) ou au lundi
+    days = sorted(hours, key=lambda d: (d + 1) % 7 if 6 in hours else d)
+    groups = []
+    for day in days:
+        if groups and groups[-1][2] == hours[day] and (groups[-1][1] + 1) % 7 == day:
+            groups[-1][1] = day
+        else:
+            groups.append([day, day, hours[day]])
+    return [
+        (WEEKDAY_NAMES[first], WEEKDAY_NAMES[last], open_time, close_time)
+        for first, last, (open_time, close_time) in groups
+    ]
+
+def _day_range(first, last, lang):
+    return first[lang] if first == last else f"{first[lang]}-{last[lang]}"
+
 # Note sur les marchés israéliens
-st.markdown("""
+tase_hours = ", ".join(
+    f"{_day_range(first, last, 1)} {open_time}-{close_time}" for first, last, open_time, close_time in week_hours_lines()
+)
+st.markdown(f"""
 <div class='israel-market-note'>
     <b>🇮🇱 Bourse de Tel Aviv (TASE) :</b><br>
     - Actions locales: suffixe .TA (ex: LUMI.TA, BEZQ.TA)<br>
     - Double cotation: symboles US (TEVA, NICE, ICL)<br>
-    - Horaires trading: Dimanche-Jeudi 09:45-16:25 (heure Israël)<br>
-    - Fermé le vendredi, samedi et jours fériés juifs
+    - Horaires trading: {tase_hours} (heure Israël)<br>
+    - Fermé les autres jours et les jours fériés juifs
 </div>
 """, unsafe_allow_html=True)
 
@@ -203,7 +241,10 @@ with st.sidebar:
          "📧 התראות אימייל / Email",
          "📤 ייצוא נתונים / Export",
          "🤖 תחזיות ML / Prédictions",
-         "🇮🇱 מדדי תל אביב / Indices"]
+         "🇮🇱 מדדי תל אביב / Indices",
+         "🔎 סורק מניות / Screener",
+         "⚖️ ארביטראז' / Arbitrage",
+         "⏱️ ניתוח תוך-יומי / Intraday"]
     )
     
     st.markdown("---")
@@ -223,9 +264,26 @@ with st.sidebar:
     )
     
     if symbol == "אחר / Autre...":
-        symbol = st.text_input("הכנס סימן / Entrer symbole", value="TEVA").upper()
-        if symbol and symbol not in st.session_state.watchlist:
-            st.session_state.watchlist.append(symbol)
+        # Autocomplétion sur le référentiel local (symbole, nom anglais ou hébreu); saisie libre acceptée
+        master = get_symbol_master()
+        symbol = st.selectbox(
+            "הכנס סימן / Entrer symbole",
+            options=master.symbols,
+            index=master.symbols.index("TEVA"),
+            format_func=master.label,
+            accept_new_options=True
+        )
+        symbol = (symbol or "TEVA").strip().upper()
+        if symbol not in master:
+            # Pas d'ajout à la watchlist d'un symbole inconnu (faute de frappe probable)
+            suggestions = master.suggest(symbol)
+            st.warning(
+                f"סימן לא מוכר / Symbole inconnu : {symbol}"
+                + (f" — {', '.join(suggestions)} ?" if suggestions else "")
+            )
+        elif symbol not in st.session_state.watchlist:
+            store.add_watchlist_symbol(user_id, symbol)
+            sync_session_state()
     
     # Note sur les suffixes
     st.caption("""
@@ -256,8 +314,13 @@ with st.sidebar:
             index=4 if period == "1d" else 6
         )
     
+    # Flux temps réel (intervalles intraday uniquement)
+    streaming_mode = False
+    if interval in INTERVAL_MS:
+        streaming_mode = st.checkbox("⚡ זרם חי / Flux temps réel", value=False)
+    
     # Auto-refresh
-    auto_refresh = st.checkbox("רענון אוטומטי / Auto-refresh", value=False)
+    auto_refresh = st.checkbox("רענון אוטומטי / Auto-refresh", value=False, disabled=streaming_mode)
     if auto_refresh:
         refresh_rate = st.slider(
             "תדירות (שניות) / Fréquence (sec)",
@@ -268,46 +331,186 @@ with st.sidebar:
         )
 
 # Fonctions utilitaires
+@st.cache_resource
+def get_stream_hub():
+    """Connexion websocket unique partagée par toutes les sessions"""
+    return StreamHub()
+
+@st.cache_resource
+def get_forecast_runner():
+    """Pool de processus partagé pour les modèles de prévision"""
+    return ForecastRunner()
+
+@st.cache_data(ttl=3600, max_entries=64, show_spinner=False)
+def load_forecast_bands(symbol, data_version, horizon, method, n_paths, _close, bars_per_day=1):
+    """Bandes Monte Carlo en jours, en cache par (symbole, version des données, horizon)"""
+    return forecast_bands(_close, horizon, n_paths=n_paths, method=method, seed=0, bars_per_step=bars_per_day)
+
+@st.cache_resource
+def get_source():
+    """Source de données partagée (Yahoo ou rejeu local, cf. TRACKER_DATA_SOURCE)"""
+    return get_data_source()
+
+@st.cache_resource
+def get_history_cache():
+    """Plages d'historique par (symbole, intervalle), partagées entre sessions"""
+    return HistoryCache(get_source())
+
 @st.cache_data(ttl=300)
+def load_info(symbol):
+    """Informations sur l'entreprise"""
+    return get_source().get_info(symbol)
+
+@st.cache_resource(ttl=300, max_entries=1000, show_spinner=False)
+def load_bars(symbol, period, interval):
+    """Barres compactes de l'intervalle demandé, en UTC+2, partagées entre sessions"""
+    # Seules les plages manquantes de la granularité de base sont téléchargées
+    return compact_bars(get_history_cache().get_interval(symbol, period, interval), USER_TIMEZONE)
+
 def load_stock_data(symbol, period, interval):
     """Charge les données boursières"""
     try:
-        ticker = yf.Ticker(symbol)
-        hist = ticker.history(period=period, interval=interval)
-        info = ticker.info
-        
-        # Convertir l'index en UTC+2
-        if not hist.empty:
-            if hist.index.tz is None:
-                hist.index = hist.index.tz_localize('UTC').tz_convert(USER_TIMEZONE)
-            else:
-                hist.index = hist.index.tz_convert(USER_TIMEZONE)
-        
+        # Vue en lecture seule sur le cache : ni désérialisation ni copie
+        hist = bars_view(load_bars(symbol, period, interval))
+        info = load_info(symbol)
         return hist, info
     except Exception as e:
         st.error(f"שגיאה / Erreur: {e}")
         return None, None
 
+@st.cache_data(ttl=60, show_spinner=False)
+def load_quotes(symbols):
+    """Cotations groupées (prix, variation) en un seul téléchargement"""
+    return get_source().get_quotes(symbols)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_dual_spreads(pairs):
+    """Primes des doubles cotations TASE / US (barres 1 minute alignées sur USD/ILS)"""
+    return load_spreads(get_history_cache().get_interval, list(pairs))
+
+@st.cache_data(ttl=60, show_spinner=False)
+def load_spread_quotes(symbols):
+    """Dernière prime (pb) ou dernier z-score des symboles d'écart, évalués comme des cotations"""
+    return spread_quotes(get_history_cache().get_interval, list(symbols))
+
+@st.cache_data(ttl=300, max_entries=32, show_spinner=False)
+def load_report(symbol, period, interval, data_version, _bars):
+    """Statistiques et rapport (HTML, PDF) du symbole, en cache par version des barres"""
+    report = symbol_report(symbol, _bars, period, interval)
+    return report['stats'], render_html(report), render_pdf(report)
+
+def build_watchlist_reports(symbols, period, interval, user_id):
+    """Rapports de la watchlist en archive ZIP (barres du cache d'historiques partagé)"""
+    with tempfile.TemporaryDirectory() as out_dir:
+        result = generate_reports(
+            symbols, out_dir, period, interval, history=get_history_cache(), store=store, user_id=user_id
+        )
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for path in result['files']:
+                archive.write(path, os.path.basename(path))
+    return buffer.getvalue(), result
+
+@st.cache_resource
+def get_intraday_store():
+    """Agrégats intraday journaliers persistés (profil de volume, saisonnalité, enchères)"""
+    return IntradayStore()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def refresh_intraday(symbol):
+    """Intègre les séances 1 minute récentes du symbole (au plus une fois toutes les 5 minutes)"""
+    return get_intraday_store().update(symbol, get_history_cache().get_interval(symbol, '5d', '1m'))
+
+@st.cache_data(ttl=300)
+def load_closes(symbols, start, interval='1d'):
+    """Panneau de clôtures aligné (dates x symboles) en un téléchargement"""
+    closes = get_source().get_closes(symbols, start, interval)
+    if closes.index.tz is not None:
+        closes.index = closes.index.tz_convert(USER_TIMEZONE).tz_localize(None)
+    return closes
+
+# Vues chargées à la chauffe : période et intervalle par défaut de la barre latérale
+DEFAULT_VIEW = ('1mo', '1d')
+INDEX_PERIODS = ('1d', '5d')
+
+@st.cache_resource
+def get_prefetcher():
+    """Préchargement partagé; la première session lance la chauffe des caches en arrière-plan"""
+    prefetcher = Prefetcher(load_bars, ttl=300)
+    watchlist = tuple(sorted(DEFAULT_WATCHLIST))
+    prefetcher.warm(
+        [(load_quotes, watchlist), (load_quotes, (FX_SYMBOL,))]
+        + [(load_bars, s, *DEFAULT_VIEW) for s in DEFAULT_WATCHLIST]
+        + [(load_bars, idx, p, '1d') for p in INDEX_PERIODS for idx in ISRAEL_INDICES]
+    )
+    return prefetcher
+
+def get_figure_cache():
+    """Figures de la session, resservies ou prolongées d'un rerun à l'autre"""
+    if 'figure_cache' not in st.session_state:
+        st.session_state.figure_cache = FigureCache()
+    return st.session_state.figure_cache
+
+def get_equity_curve(portfolio, transactions):
+    """Courbe de valeur du portefeuille, mise à jour incrémentalement entre deux reruns"""
+    # Les ventes sortent du portefeuille comme des lots négatifs (flux sortant)
+    sells = {}
+    for t in transactions:
+        if t['type'] == 'sell':
+            sells.setdefault(t['symbol'], []).append({'shares': -t['quantity'], 'buy_price': t['price'], 'date': t['date']})
+    lots = pd.concat([lots_frame(portfolio), lots_frame(sells)], ignore_index=True)
+    lots = lots.sort_values('date', kind='stable').reset_index(drop=True)
+    if lots.empty:
+        return None
+    lots['date'] = lots['date'].dt.normalize()
+    symbols = tuple(sorted(lots['symbol'].unique()))
+    closes = load_closes(symbols + (FX_SYMBOL,), lots['date'].min().strftime('%Y-%m-%d'))
+    if closes.empty:
+        return None
+    fx = closes[FX_SYMBOL].fillna(3.7)  # Taux approximatif si indisponible
+    
+    # Reconstruction complète seulement si les lots ont changé
+    signature = (
+        tuple(lot.get('id') for lots_pf in portfolio.values() for lot in lots_pf),
+        tuple(t['id'] for t in transactions)
+    )
+    cached = st.session_state.get('equity_curve')
+    if cached is None or cached[0] != signature:
+        cached = (signature, EquityCurve(lots, symbols))
+        st.session_state.equity_curve = cached
+    return cached[1].update(closes[list(symbols)], fx)
+
+EXCHANGE_LABELS = {
+    'TASE': 'Tel Aviv (TASE)',
+    'INDEX': 'Tel Aviv (TASE)',
+    'NASDAQ': 'NASDAQ',
+    'NYSE': 'NYSE',
+}
+
 def get_exchange(symbol):
-    """Détermine l'échange pour un symbole"""
-    if symbol.endswith('.TA'):
-        return 'Tel Aviv (TASE)'
-    else:
-        return 'US/Global'
+    """Détermine l'échange pour un symbole (référentiel local)"""
+    return EXCHANGE_LABELS.get(get_symbol_master().exchange(symbol), 'US/Global')
 
 def get_currency(symbol):
-    """Détermine la devise pour un symbole"""
-    if symbol.endswith('.TA'):
-        return 'ILS'  # Shekel
-    else:
-        return 'USD'
+    """Détermine la devise pour un symbole (référentiel local)"""
+    return get_symbol_master().currency(symbol)
+
+def currency_sign(symbol):
+    """Signe monétaire du symbole (₪ ou $; aucun pour un écart de double cotation)"""
+    if parse_spread_symbol(symbol):
+        return ''
+    return CURRENCY_SIGNS.get(get_currency(symbol), '$')
 
 def format_currency(value, symbol):
     """Formate la monnaie selon le symbole"""
-    if symbol.endswith('.TA'):
-        return f"₪{value:.2f}"
-    else:
-        return f"${value:.2f}"
+    return f"{currency_sign(symbol)}{value:.2f}"
+
+def check_symbol(symbol):
+    """Validation locale d'une saisie : (connu, suggestions), sans requête réseau"""
+    master = get_symbol_master()
+    if symbol in master:
+        return True, []
+    return False, master.suggest(symbol)
 
 def send_email_alert(subject, body, to_email):
     """Envoie une notification par email"""
@@ -315,107 +518,132 @@ def send_email_alert(subject, body, to_email):
         return False
     
     try:
-        msg = MIMEMultipart()
-        msg['From'] = st.session_state.email_config['email']
-        msg['To'] = to_email
-        msg['Subject'] = subject
-        msg.attach(MIMEText(body, 'html'))
-        
-        server = smtplib.SMTP(
-            st.session_state.email_config['smtp_server'], 
-            st.session_state.email_config['smtp_port']
-        )
-        server.starttls()
-        server.login(
-            st.session_state.email_config['email'],
-            st.session_state.email_config['password']
-        )
-        server.send_message(msg)
-        server.quit()
+        send_email(store.get_smtp_config(user_id), subject, body, to_email)
         return True
     except Exception as e:
         st.error(f"שגיאת שליחה / Erreur d'envoi: {e}")
         return False
 
+@st.cache_resource
+def get_dispatcher():
+    """Envoi des emails en arrière-plan (le rendu n'attend pas le serveur SMTP)"""
+    return NotificationDispatcher(max_workers=2)
+
 def check_price_alerts(current_price, symbol):
-    """Vérifie les alertes de prix"""
-    triggered = []
-    for alert in st.session_state.price_alerts:
-        if alert['symbol'] == symbol:
-            if alert['condition'] == 'above' and current_price >= alert['price']:
-                triggered.append(alert)
-            elif alert['condition'] == 'below' and current_price <= alert['price']:
-                triggered.append(alert)
+    """Transitions groupées des alertes de l'utilisateur; renvoie [(symbole, prix, alerte)] déclenchées
+
+    Quand le worker d'alertes tourne, il est seul à évaluer et notifier : le dashboard
+    n'affiche que l'état persisté. Sinon l'état est relu dans le stockage (invalidé par
+    data_version) et chaque transition n'est notifiée que si cette session l'a écrite.
+    """
+    if store.worker_alive(ALERT_WORKER):
+        sync_session_state()
+        return []
+    alerts = store.get_user_state(user_id)['price_alerts']
+    if not alerts:
+        return []
+    book = AlertBook(alerts)
+    # Écarts de double cotation : calculés sur les barres en cache, pas de cotation à télécharger
+    spreads = tuple(s for s in book.symbols if parse_spread_symbol(s))
+    symbols = tuple(s for s in book.symbols if s not in spreads)
+    quotes = load_quotes(symbols) if symbols else None
+    if spreads:
+        quotes = pd.concat([q for q in (quotes, load_spread_quotes(spreads)) if q is not None])
+    if symbol in quotes.index and current_price is not None:
+        quotes = quotes.copy()
+        quotes.loc[symbol, 'price'] = current_price
+    fired, prices, changed = book.transition(quotes, time.time())
+    if not len(changed):
+        return []
     
+    # Persistance des transitions; les alertes à usage unique déclenchées sont retirées
+    fired = book.commit(store, fired, changed)
+    triggered = [(book.alerts[i]['symbol'], prices[i], book.alerts[i]) for i in fired]
+    sync_session_state()
     return triggered
 
+# Libellés affichés pour chaque raison de statut
+MARKET_STATUS_LABELS = {
+    'open': ("פתוח / Ouvert", "🟢"),
+    'weekend': ("סגור (סופ ש) / Fermé (weekend)", "🔴"),
+    'holiday': ("סגור (חג) / Fermé (férié)", "🔴"),
+    'closed': ("סגור / Fermé", "🔴"),
+}
+
 def get_market_status():
     """Détermine le statut des marchés israéliens"""
-    israel_now = datetime.now(ISRAEL_TIMEZONE)
-    israel_hour = israel_now.hour
-    israel_minute = israel_now.minute
-    israel_weekday = israel_now.weekday()
-    israel_date = israel_now.strftime('%Y-%m-%d')
-    
-    # Weekend (vendredi = 4, samedi = 5 en Python)
-    if israel_weekday >= 4:
-        return "סגור (סופ ש) / Fermé (weekend)", "🔴"
-    
-    # Jours fériés
-    if israel_date in ISRAELI_HOLIDAYS_2024:
-        return "סגור (חג) / Fermé (férié)", "🔴"
-    
-    # Horaires TASE: Dimanche-Jeudi 09:45 - 16:25
-    if (israel_hour > 9 or (israel_hour == 9 and israel_minute >= 45)) and israel_hour < 16:
-        return "פתוח / Ouvert", "🟢"
-    elif israel_hour == 16 and israel_minute <= 25:
-        return "פתוח / Ouvert", "🟢"
-    elif israel_hour == 16 and israel_minute > 25:
-        return "סגור / Fermé", "🔴"
-    else:
-        return "סגור / Fermé", "🔴"
+    _, reason = market_session()
+    return MARKET_STATUS_LABELS[reason]
 
 def safe_get_metric(hist, metric, index=-1):
-    """Récupère une métrique en toute sécurité"""
-    try:
-        if hist is not None and not hist.empty and len(hist) > abs(index):
-            return hist[metric].iloc[index]
-        return 0
-    except:
-        return 0
+    """Métrique de la barre valide d'indice index; None si indisponible (jamais un prix nul par défaut)"""
+    if hist is None or hist.empty or metric not in hist:
+        return None
+    values = hist[metric].to_numpy(dtype=float)
+    valid = np.isfinite(values) & (values > 0) if metric in PRICE_COLUMNS else np.isfinite(values)
+    values = values[valid]
+    return float(values[index]) if len(values) >= abs(index) else None
+
+def notify_price_alerts(price):
+    """Vérifie les alertes au prix courant; affiche et envoie par email celles qui se déclenchent"""
+    triggered_alerts = check_price_alerts(price, symbol)
+    if triggered_alerts:
+        st.balloons()
+        for alert_symbol, alert_price, alert in triggered_alerts:
+            st.success(f"🎯 התראה הופעלה / Alerte déclenchée pour {alert_symbol} à {currency_sign(alert_symbol)}{alert_price:.2f}")
+        
+        # Un seul email récapitulatif, envoyé sans bloquer la page
+        config = st.session_state.email_config
+        if config['enabled'] and config['email']:
+            config = store.get_smtp_config(user_id)
+            subject, body = format_digest_email(
+                triggered_alerts, datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+            )
+            get_dispatcher().submit(config, subject, body, config['email'])
 
 # Chargement des données
 hist, info = load_stock_data(symbol, period, interval)
 
+# Préchargement des vues voisines (période, intervalle, symboles suivants) avant le prochain clic
+prefetcher = get_prefetcher()
+prefetcher.record((symbol, period, interval))
+prefetcher.schedule(predict_views(symbol, period, interval, st.session_state.watchlist))
+
+with st.sidebar.expander("⚡ טעינה מוקדמת / Préchargement"):
+    prefetch_report = prefetcher.report()
+    st.caption(
+        f"הצלחה / Succès : {prefetch_report['hit_rate']:.0%} des préchargements, "
+        f"{prefetch_report['demand_hit_rate']:.0%} des vues affichées"
+    )
+    st.caption(
+        f"Terminés : {prefetch_report['completed']} · En cours : {prefetch_report['pending']} · "
+        f"Ignorés (budget) : {prefetch_report['skipped']} · "
+        f"Non consultés : {prefetch_report['unused_bytes'] / 1024:.0f} Ko"
+    )
+
+with st.sidebar.expander("🩺 איכות נתונים / Qualité des données"):
+    quality = get_history_cache().quality.get(symbol)
+    if quality is None:
+        st.caption("אין בדיקות / Aucun contrôle pour ce symbole")
+    else:
+        for row in quality.to_dict('records'):
+            coverage = f"{row['coverage']:.1%}" if pd.notna(row['coverage']) else "—"
+            st.caption(
+                f"**{row['interval']}** · {row['received']} barres reçues · couverture {coverage} · "
+                f"doublons {row['duplicates']} · invalides {row['invalid']} · figées {row['stale']} · "
+                f"hors séance {row['off_session']} · aberrantes {row['outliers']} · "
+                f"manquantes {row['missing']} (récupérées {row['recovered']}, {row['refetched']} requêtes)"
+            )
+
 # Vérification si les données sont disponibles
-if hist is None or hist.empty:
+current_price = safe_get_metric(hist, 'Close')
+if current_price is None:
+    # Aucune clôture valide : ni prix affiché à 0, ni alerte évaluée
     st.warning(f"⚠️ לא ניתן לטעון נתונים עבור {symbol} / Impossible de charger les données pour {symbol}")
-    current_price = 0
+    hist = None
 else:
-    current_price = safe_get_metric(hist, 'Close')
-    currency_symbol = "₪" if symbol.endswith('.TA') else "$"
-    
-    # Vérification des alertes
-    triggered_alerts = check_price_alerts(current_price, symbol)
-    for alert in triggered_alerts:
-        st.balloons()
-        st.success(f"🎯 התראה הופעלה / Alerte déclenchée pour {symbol} à {currency_symbol}{current_price:.2f}")
-        
-        # Notification email
-        if st.session_state.email_config['enabled']:
-            subject = f"🚨 התראת מחיר / Alerte prix - {symbol}"
-            body = f"""
-            <h2>התראת מחיר הופעלה / Alerte de prix déclenchée</h2>
-            <p><b>סימן / Symbole:</b> {symbol}</p>
-            <p><b>מחיר נוכחי / Prix actuel:</b> {currency_symbol}{current_price:.2f}</p>
-            <p><b>תנאי / Condition:</b> {alert['condition']} {currency_symbol}{alert['price']:.2f}</p>
-            <p><b>תאריך (UTC+2) / Date:</b> {datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')}</p>
-            """
-            send_email_alert(subject, body, st.session_state.email_config['email'])
-        
-        # Retirer l'alerte si elle est à usage unique
-        if alert.get('one_time', False):
-            st.session_state.price_alerts.remove(alert)
+    currency_symbol = currency_sign(symbol)
+    notify_price_alerts(current_price)
 
 # ============================================================================
 # SECTION 1: TABLEAU DE BORD
@@ -426,135 +654,113 @@ if menu == "📈 Tableau de bord":
     st.info(f"{market_icon} שוק תל אביב / Marché TASE: {market_status}")
     
     if hist is not None and not hist.empty:
-        # Métriques principales
         exchange = get_exchange(symbol)
         currency = get_currency(symbol)
         st.subheader(f"📊 נתונים בזמן אמת / Aperçu temps réel - {symbol} ({exchange})")
         
-        col1, col2, col3, col4 = st.columns(4)
+        previous_close = safe_get_metric(hist, 'Close', -2) or current_price
         
-        previous_close = safe_get_metric(hist, 'Close', -2) if len(hist) > 1 else current_price
-        change = current_price - previous_close
-        change_pct = (change / previous_close * 100) if previous_close != 0 else 0
-        
-        with col1:
-            st.metric(
-                label="מחיר נוכחי / Prix actuel",
-                value=format_currency(current_price, symbol),
-                delta=f"{change:.2f} ({change_pct:.2f}%)"
+        def price_chart(bars, key):
+            """Figure de la session resservie (référence seule côté navigateur) ou prolongée des nouvelles barres"""
+            fig = get_figure_cache().get_bars(
+                key,
+                bars,
+                lambda bars: price_figure(bars, symbol, period, interval, currency_sign(symbol)),
+                lambda bars, start: price_traces(bars, interval, start),
+                layout_version=session_day(bars, interval)
             )
+            st.plotly_chart(fig, use_container_width=True)
         
-        with col2:
-            day_high = safe_get_metric(hist, 'High')
-            st.metric("מקסימום / Plus haut", format_currency(day_high, symbol))
-        
-        with col3:
-            day_low = safe_get_metric(hist, 'Low')
-            st.metric("מינימום / Plus bas", format_currency(day_low, symbol))
-        
-        with col4:
-            volume = safe_get_metric(hist, 'Volume')
-            volume_formatted = f"{volume/1e6:.1f}M" if volume > 1e6 else f"{volume/1e3:.1f}K"
-            st.metric("מחזור / Volume", volume_formatted)
-        
-        # Dernière mise à jour
-        st.caption(f"עדכון אחרון / Dernière MAJ: {hist.index[-1].strftime('%Y-%m-%d %H:%M:%S')} UTC+2")
-        
-        # Graphique principal
-        st.subheader("📉 התפתחות מחיר / Évolution du prix")
-        
-        fig = go.Figure()
-        
-        # Chandeliers ou ligne selon l'intervalle
-        if interval in ["1m", "2m", "5m", "15m", "30m", "1h"]:
-            fig.add_trace(go.Candlestick(
-                x=hist.index,
-                open=hist['Open'],
-                high=hist['High'],
-                low=hist['Low'],
-                close=hist['Close'],
-                name='Prix',
-                increasing_line_color='#00cc96',
-                decreasing_line_color='#ef553b'
-            ))
-        else:
-            fig.add_trace(go.Scatter(
-                x=hist.index,
-                y=hist['Close'],
-                mode='lines',
-                name='Prix',
-                line=dict(color='#0038b8', width=2)
-            ))
-        
-        # Ajouter les moyennes mobiles
-        if len(hist) >= 20:
-            ma_20 = hist['Close'].rolling(window=20).mean()
-            fig.add_trace(go.Scatter(
-                x=hist.index,
-                y=ma_20,
-                mode='lines',
-                name='MA 20',
-                line=dict(color='orange', width=1, dash='dash')
-            ))
-        
-        if len(hist) >= 50:
-            ma_50 = hist['Close'].rolling(window=50).mean()
-            fig.add_trace(go.Scatter(
-                x=hist.index,
-                y=ma_50,
-                mode='lines',
-                name='MA 50',
-                line=dict(color='purple', width=1, dash='dash')
-            ))
-        
-        # Volume
-        fig.add_trace(go.Bar(
-            x=hist.index,
-            y=hist['Volume'],
-            name='Volume',
-            yaxis='y2',
-            marker=dict(color='lightgray', opacity=0.3)
-        ))
-        
-        # Ajouter des lignes verticales pour les heures de trading
-        if interval in ["1m", "5m", "15m", "30m", "1h"] and not hist.empty:
-            # Ajouter une zone pour les heures de trading TASE
-            last_date = hist.index[-1].date()
-            try:
-                tase_open = ISRAEL_TIMEZONE.localize(datetime.combine(last_date, datetime.strptime("09:45", "%H:%M").time()))
-                tase_close = ISRAEL_TIMEZONE.localize(datetime.combine(last_date, datetime.strptime("16:25", "%H:%M").time()))
-                
-                tase_open_utc2 = tase_open.astimezone(USER_TIMEZONE)
-                tase_close_utc2 = tase_close.astimezone(USER_TIMEZONE)
-                
-                fig.add_vrect(
-                    x0=tase_open_utc2,
-                    x1=tase_close_utc2,
-                    fillcolor="blue",
-                    opacity=0.1,
-                    layer="below",
-                    line_width=0,
-                    annotation_text="TASE Session"
+        # Rafraîchissement automatique : seul ce fragment se relance, avec les barres rechargées
+        @st.fragment(run_every=refresh_rate if auto_refresh and not streaming_mode else None)
+        def price_panel():
+            """Métriques principales, et graphique hors flux temps réel"""
+            bars = load_stock_data(symbol, period, interval)[0]
+            price = safe_get_metric(bars, 'Close')
+            if price is None:
+                bars, price = hist, current_price
+            elif price != current_price:
+                # Prix rechargé depuis l'exécution complète de la page
+                notify_price_alerts(price)
+            
+            col1, col2, col3, col4 = st.columns(4)
+            
+            previous = safe_get_metric(bars, 'Close', -2) or price
+            change = price - previous
+            change_pct = (change / previous * 100) if previous != 0 else 0
+            
+            with col1:
+                st.metric(
+                    label="מחיר נוכחי / Prix actuel",
+                    value=format_currency(price, symbol),
+                    delta=f"{change:.2f} ({change_pct:.2f}%)"
                 )
-            except:
-                pass
+            
+            with col2:
+                day_high = safe_get_metric(bars, 'High')
+                st.metric("מקסימום / Plus haut", format_currency(day_high, symbol))
+            
+            with col3:
+                day_low = safe_get_metric(bars, 'Low')
+                st.metric("מינימום / Plus bas", format_currency(day_low, symbol))
+            
+            with col4:
+                volume = safe_get_metric(bars, 'Volume')
+                volume_formatted = f"{volume/1e6:.1f}M" if volume > 1e6 else f"{volume/1e3:.1f}K"
+                st.metric("מחזור / Volume", volume_formatted)
+            
+            # Dernière mise à jour
+            st.caption(f"עדכון אחרון / Dernière MAJ: {bars.index[-1].strftime('%Y-%m-%d %H:%M:%S')} UTC+2")
+            
+            if not streaming_mode:
+                # Graphique principal
+                st.subheader("📉 התפתחות מחיר / Évolution du prix")
+                price_chart(bars, ('price', symbol, period, interval))
         
-        fig.update_layout(
-            title=f"{symbol} - {period} (שעות UTC+2 / heures UTC+2)",
-            yaxis_title=f"מחיר / Prix ({'₪' if symbol.endswith('.TA') else '$'})",
-            yaxis2=dict(
-                title="מחזור / Volume",
-                overlaying='y',
-                side='right',
-                showgrid=False
-            ),
-            xaxis_title="תאריך (UTC+2) / Date",
-            height=600,
-            hovermode='x unified',
-            template='plotly_white'
-        )
+        price_panel()
         
-        st.plotly_chart(fig, use_container_width=True)
+        # Barre courante et graphique alimentés par le flux (seul ce fragment est réexécuté)
+        if streaming_mode:
+            get_stream_hub().subscribe(symbol, interval, hist)
+            
+            @st.fragment(run_every=STREAM_REFRESH_SEC)
+            def live_bar_panel():
+                """Barre OHLCV courante mise à jour en place, graphique prolongé des barres du flux"""
+                hub = get_stream_hub()
+                bar, tick, version = hub.snapshot(symbol, interval)
+                if bar is None or tick is None:
+                    st.caption("⏳ ממתין לזרם / En attente du flux...")
+                else:
+                    live_change = tick['price'] - previous_close
+                    live_change_pct = (live_change / previous_close * 100) if previous_close != 0 else 0
+                    bar_start = datetime.fromtimestamp(bar['start'] / 1000, USER_TIMEZONE)
+                    tick_time = datetime.fromtimestamp(tick['time'] / 1000, USER_TIMEZONE)
+                    
+                    st.markdown(f"#### ⚡ בר נוכחי / Barre en cours ({bar_start.strftime('%H:%M')} UTC+2)")
+                    col_l1, col_l2, col_l3, col_l4, col_l5 = st.columns(5)
+                    col_l1.metric(
+                        "מחיר חי / Prix live",
+                        format_currency(tick['price'], symbol),
+                        delta=f"{live_change:.2f} ({live_change_pct:.2f}%)"
+                    )
+                    col_l2.metric("פתיחה / Ouverture", format_currency(bar['open'], symbol))
+                    col_l3.metric("מקסימום / Plus haut", format_currency(bar['high'], symbol))
+                    col_l4.metric("מינימום / Plus bas", format_currency(bar['low'], symbol))
+                    col_l5.metric("מחזור / Volume", f"{bar['volume']:,}")
+                    st.caption(f"טיק אחרון / Dernier tick: {tick_time.strftime('%H:%M:%S')} UTC+2 | #{version}")
+                if not hub.connected:
+                    st.caption(f"🔌 מתחבר מחדש / Reconnexion au flux... ({hub.reconnects})")
+                
+                # Historique REST prolongé des barres du flux (la première remplace la dernière barre REST)
+                bars = hist
+                live = hub.bars(symbol, interval)
+                if not live.empty:
+                    live = live.tz_convert(hist.index.tz) if hist.index.tz is not None else live.tz_localize(None)
+                    bars = pd.concat([hist[hist.index < live.index[0]], live])
+                st.subheader("📉 התפתחות מחיר / Évolution du prix")
+                price_chart(bars, ('price', symbol, period, interval, 'live'))
+            
+            live_bar_panel()
         
         # Informations sur l'entreprise
         with st.expander("ℹ️ פרטי חברה / Informations entreprise"):
@@ -611,71 +817,120 @@ elif menu == "💰 תיק השקעות / Portefeuille":
             buy_price = st.number_input("מחיר קנייה / Prix achat", min_value=0.01, step=0.01, value=100.0)
             
             if st.form_submit_button("הוסף לתיק / Ajouter"):
-                if symbol_pf and shares > 0:
-                    if symbol_pf not in st.session_state.portfolio:
-                        st.session_state.portfolio[symbol_pf] = []
-                    
-                    st.session_state.portfolio[symbol_pf].append({
-                        'shares': shares,
-                        'buy_price': buy_price,
-                        'date': datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
-                    })
+                known, suggestions = check_symbol(symbol_pf)
+                if not known and suggestions:
+                    st.error(f"סימן לא מוכר / Symbole inconnu : {symbol_pf} — {', '.join(suggestions)} ?")
+                elif symbol_pf and shares > 0:
+                    store.add_lot(
+                        user_id, symbol_pf, shares, buy_price,
+                        datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+                    )
+                    sync_session_state()
                     st.success(f"✅ {shares} מניות {symbol_pf} נוספו / actions ajoutées")
-    
+
+        # Ventes, dividendes et frais
+        st.markdown("### ➖ מכירה / Vente, dividende, frais")
+        with st.form("add_transaction"):
+            held_symbols = sorted(st.session_state.portfolio.keys()) or ["TEVA"]
+            symbol_tx = st.selectbox("סימן / Symbole", options=held_symbols)
+            tx_type = st.selectbox(
+                "סוג / Type",
+                options=["sell", "dividend", "fee"],
+                format_func=lambda x: {"sell": "מכירה / Vente", "dividend": "דיבידנד / Dividende", "fee": "עמלה / Frais"}[x]
+            )
+            col_q, col_p, col_f = st.columns(3)
+            with col_q:
+                tx_quantity = st.number_input("כמות / Quantité", min_value=0.0, step=0.01, value=1.0)
+            with col_p:
+                tx_price = st.number_input("מחיר/סכום / Prix/Montant", min_value=0.0, step=0.01, value=100.0)
+            with col_f:
+                tx_fees = st.number_input("עמלות / Frais", min_value=0.0, step=0.01, value=0.0)
+            
+            if st.form_submit_button("רשום / Enregistrer"):
+                transaction = {
+                    'symbol': symbol_tx,
+                    'type': tx_type,
+                    'date': datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S'),
+                    'quantity': tx_quantity if tx_type != 'fee' else 0.0,
+                    'price': tx_price,
+                    'fees': tx_fees
+                }
+                try:
+                    Ledger(build_ledger(st.session_state.portfolio, st.session_state.transactions + [transaction]))
+                    store.add_transaction(
+                        user_id, transaction['symbol'], transaction['type'], transaction['date'],
+                        transaction['quantity'], transaction['price'], transaction['fees']
+                    )
+                    sync_session_state()
+                    st.success(f"✅ {symbol_tx} נרשם / enregistré")
+                except ValueError as e:
+                    st.error(f"שגיאה / Erreur: {e}")
+
+        # Import / export du portefeuille
+        with st.expander("📂 ייבוא/ייצוא / Import/Export"):
+            import_format = st.radio(
+                "פורמט / Format",
+                ["פוזיציות / Positions", "דוח ברוקר / Relevé courtier"],
+                horizontal=True
+            )
+            uploaded = st.file_uploader(
+                "CSV (symbol, shares, buy_price, date)" if import_format.startswith("פוזיציות")
+                else "CSV (date, symbol, type, quantity, price, fees)",
+                type=["csv"],
+                key="import_lots"
+            )
+            if uploaded is not None and st.button("📥 ייבוא / Importer"):
+                try:
+                    if import_format.startswith("פוזיציות"):
+                        count = store.import_lots_csv(user_id, uploaded.getvalue())
+                    else:
+                        transactions = parse_transactions_csv(uploaded.getvalue())
+                        # Validation (ventes à découvert) avant écriture
+                        Ledger(build_ledger(st.session_state.portfolio, st.session_state.transactions + transactions))
+                        count = store.import_transactions(user_id, transactions)
+                    sync_session_state()
+                    st.success(f"✅ {count} שורות יובאו / lignes importées")
+                except (KeyError, ValueError) as e:
+                    st.error(f"קובץ לא תקין / Fichier invalide: {e}")
+
+            st.download_button(
+                label="📤 ייצוא JSON / Exporter JSON",
+                data=json.dumps(store.export_user(user_id), indent=2, default=str),
+                file_name=f"portfolio_{user_id}_{datetime.now(USER_TIMEZONE).strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json"
+            )
+
     with col1:
         st.markdown("### 📊 ביצועי תיק / Performance portefeuille")
         
         if st.session_state.portfolio:
-            portfolio_data = []
-            total_value_usd = 0
-            total_cost_usd = 0
-            total_value_ils = 0
-            total_cost_ils = 0
+            # Cotations groupées (un seul téléchargement) et lots ouverts après appariement FIFO
+            ledger = Ledger(build_ledger(st.session_state.portfolio, st.session_state.transactions))
+            quotes = load_quotes(tuple(sorted(st.session_state.portfolio)))
+            fx_rate = load_quotes((FX_SYMBOL,))['price'].get(FX_SYMBOL)
+            fx_rate = fx_rate if fx_rate and fx_rate > 0 else 3.7  # Taux approximatif si indisponible
+            positions = value_positions(st.session_state.portfolio, st.session_state.transactions, quotes['price'], fx_rate)
             
-            for symbol_pf, positions in st.session_state.portfolio.items():
-                try:
-                    ticker = yf.Ticker(symbol_pf)
-                    hist = ticker.history(period='1d')
-                    if not hist.empty:
-                        current = hist['Close'].iloc[-1]
-                    else:
-                        current = 0
-                    
-                    exchange = get_exchange(symbol_pf)
-                    currency = get_currency(symbol_pf)
-                    
-                    for pos in positions:
-                        shares = pos['shares']
-                        buy_price = pos['buy_price']
-                        cost = shares * buy_price
-                        value = shares * current
-                        profit = value - cost
-                        profit_pct = (profit / cost * 100) if cost > 0 else 0
-                        
-                        if currency == 'ILS':
-                            total_cost_ils += cost
-                            total_value_ils += value
-                            # Conversion approximative USD/ILS pour le total (taux fixe pour l'affichage)
-                            usd_rate = 3.7  # Taux approximatif
-                            total_cost_usd += cost / usd_rate
-                            total_value_usd += value / usd_rate
-                        else:
-                            total_cost_usd += cost
-                            total_value_usd += value
-                        
-                        portfolio_data.append({
-                            'סימן/Symbole': symbol_pf,
-                            'בורסה/Marché': exchange,
-                            'מטבע/Devise': currency,
-                            'כמות/Actions': shares,
-                            "מחיר קנייה/Achat": format_currency(buy_price, symbol_pf),
-                            'מחיר נוכחי/Actuel': format_currency(current, symbol_pf),
-                            'שווי/Valeur': format_currency(value, symbol_pf),
-                            'רווח/Profit': format_currency(profit, symbol_pf),
-                            'רווח %': f"{profit_pct:.1f}%"
-                        })
-                except Exception as e:
-                    st.warning(f"לא ניתן לטעון / Impossible charger {symbol_pf}")
+            total_value_usd = positions['value_usd'].sum()
+            total_cost_usd = positions['cost_usd'].sum()
+            ils = positions[positions['currency'] == 'ILS']
+            total_value_ils = ils['value'].sum()
+            total_cost_ils = ils['cost'].sum()
+            
+            portfolio_data = [
+                {
+                    'סימן/Symbole': pos.symbol,
+                    'בורסה/Marché': get_exchange(pos.symbol),
+                    'מטבע/Devise': pos.currency,
+                    'כמות/Actions': pos.shares,
+                    "מחיר קנייה/Achat": format_currency(pos.buy_price, pos.symbol),
+                    'מחיר נוכחי/Actuel': format_currency(pos.price, pos.symbol),
+                    'שווי/Valeur': format_currency(pos.value, pos.symbol),
+                    'רווח/Profit': format_currency(pos.profit, pos.symbol),
+                    'רווח %': f"{pos.profit_pct:.1f}%"
+                }
+                for pos in positions.itertuples()
+            ]
             
             if portfolio_data:
                 # Métriques globales
@@ -710,17 +965,87 @@ elif menu == "💰 תיק השקעות / Portefeuille":
                 # Graphique de répartition
                 try:
                     fig_pie = px.pie(
-                        names=[p['סימן/Symbole'] for p in portfolio_data],
-                        values=[float(p['שווי/Valeur'].replace('₪', '').replace('$', '').replace(',', '')) for p in portfolio_data],
+                        names=positions['symbol'],
+                        values=positions['value'],
                         title="התפלגות התיק / Répartition portefeuille"
                     )
                     st.plotly_chart(fig_pie)
                 except:
                     st.warning("לא ניתן ליצור גרף / Impossible générer graphique")
                 
+                # Résultat réalisé (ventes, dividendes, frais)
+                if st.session_state.transactions:
+                    st.markdown("### 💵 רווח ממומש / Résultat réalisé")
+                    method = st.radio(
+                        "שיטה / Méthode",
+                        ["fifo", "average"],
+                        format_func=lambda x: "FIFO" if x == "fifo" else "עלות ממוצעת / Coût moyen",
+                        horizontal=True
+                    )
+                    realized = ledger.summary(method)
+                    st.dataframe(
+                        realized.rename(columns={
+                            'shares': 'כמות/Actions',
+                            'cost_basis': 'עלות/Coût restant',
+                            'realized': 'רווח ממומש/Réalisé',
+                            'dividends': 'דיבידנדים/Dividendes',
+                            'fees': 'עמלות/Frais',
+                            'net': 'נטו/Net'
+                        }).style.format(precision=2),
+                        use_container_width=True
+                    )
+                
+                # Performance historique depuis la date d'achat de chaque lot
+                st.markdown("### 📈 ביצועים היסטוריים / Performance historique (USD)")
+                curve = get_equity_curve(st.session_state.portfolio, st.session_state.transactions)
+                if curve is not None and not curve.curve.empty:
+                    perf = curve.summary()
+                    col_p1, col_p2, col_p3 = st.columns(3)
+                    col_p1.metric("תשואה משוקללת זמן / TWR", f"{perf['twr']*100:.2f}%")
+                    col_p2.metric(
+                        "תשואה משוקללת הון / MWR (annuel)",
+                        f"{perf['mwr']*100:.2f}%" if not np.isnan(perf['mwr']) else "N/A"
+                    )
+                    col_p3.metric("ירידה מקסימלית / Drawdown max", f"{perf['max_drawdown']*100:.2f}%")
+                    
+                    equity = curve.curve
+                    fig_equity = go.Figure()
+                    fig_equity.add_trace(go.Scatter(
+                        x=equity.index, y=equity['value'], mode='lines',
+                        name='שווי/Valeur', line=dict(color='#0038b8', width=2)
+                    ))
+                    fig_equity.add_trace(go.Scatter(
+                        x=equity.index, y=equity['invested'], mode='lines',
+                        name='הושקע/Investi', line=dict(color='gray', dash='dash')
+                    ))
+                    fig_equity.add_trace(go.Scatter(
+                        x=equity.index, y=equity['drawdown'] * 100, mode='lines',
+                        name='Drawdown %', yaxis='y2', fill='tozeroy',
+                        line=dict(color='rgba(239,85,59,0.6)')
+                    ))
+                    fig_equity.update_layout(
+                        yaxis_title="USD",
+                        yaxis2=dict(title="Drawdown %", overlaying='y', side='right', showgrid=False),
+                        height=450,
+                        hovermode='x unified',
+                        template='plotly_white'
+                    )
+                    st.plotly_chart(fig_equity, use_container_width=True)
+                    
+                    contributions = curve.contributions()
+                    fig_contrib = px.bar(
+                        contributions.reset_index(), x='symbol', y='pnl',
+                        color='pnl', color_continuous_scale=['#ef553b', '#00cc96'],
+                        title="תרומה לפי נייר / Contribution par symbole (USD)"
+                    )
+                    st.plotly_chart(fig_contrib, use_container_width=True)
+                else:
+                    st.info("אין נתונים היסטוריים / Historique indisponible")
+                
                 # Bouton pour vider le portefeuille
                 if st.button("🗑️ רוקן תיק / Vider portefeuille"):
-                    st.session_state.portfolio = {}
+                    store.clear_portfolio(user_id)
+                    sync_session_state()
                     st.rerun()
             else:
                 st.info("אין נתוני ביצועים / Aucune donnée performance")
@@ -742,8 +1067,8 @@ elif menu == "🔔 התראות מחיר / Alertes":
             exchange = get_exchange(alert_symbol)
             st.caption(f"בורסה/Marché: {exchange}")
             
-            currency_symbol = "₪" if alert_symbol.endswith('.TA') else "$"
-            default_price = float(current_price * 1.05) if current_price > 0 else 100.0
+            currency_symbol = currency_sign(alert_symbol)
+            default_price = float(current_price * 1.05) if current_price else 100.0
             alert_price = st.number_input(
                 f"מחיר יעד / Prix cible ({currency_symbol})", 
                 min_value=0.01, 
@@ -759,31 +1084,57 @@ elif menu == "🔔 התראות מחיר / Alertes":
             
             one_time = alert_type.startswith("חד פעמי")
             
+            col_hyst, col_cool = st.columns(2)
+            with col_hyst:
+                hysteresis_pct = st.number_input(
+                    "היסטרזיס / Hystérésis (%)",
+                    min_value=0.0, max_value=20.0, step=0.1,
+                    value=DEFAULT_HYSTERESIS * 100,
+                    help="Écart de retour sous/au-dessus du seuil avant réarmement"
+                )
+            with col_cool:
+                cooldown_min = st.number_input(
+                    "צינון / Refroidissement (min)",
+                    min_value=0, max_value=1440, step=5,
+                    value=DEFAULT_COOLDOWN // 60
+                )
+            
             if st.form_submit_button("צור התראה / Créer"):
-                st.session_state.price_alerts.append({
-                    'symbol': alert_symbol,
-                    'price': alert_price,
-                    'condition': condition,
-                    'one_time': one_time,
-                    'created': datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
-                })
-                st.success(f"✅ התראה נוצרה / Alerte créée pour {alert_symbol} à {currency_symbol}{alert_price:.2f}")
+                known, suggestions = check_symbol(alert_symbol)
+                if not known and suggestions:
+                    st.error(f"סימן לא מוכר / Symbole inconnu : {alert_symbol} — {', '.join(suggestions)} ?")
+                else:
+                    store.add_alert(
+                        user_id, alert_symbol, alert_price, condition, one_time,
+                        datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S'),
+                        hysteresis=hysteresis_pct / 100, cooldown=int(cooldown_min) * 60
+                    )
+                    sync_session_state()
+                    st.success(f"✅ התראה נוצרה / Alerte créée pour {alert_symbol} à {currency_symbol}{alert_price:.2f}")
     
     with col2:
         st.markdown("### 📋 התראות פעילות / Alertes actives")
+        if store.worker_alive(ALERT_WORKER):
+            st.caption("🛰️ ההתראות מוערכות על ידי ה-worker / Alertes évaluées et notifiées par le worker (affichage seul)")
         if st.session_state.price_alerts:
+            alert_state_labels = {
+                'armed': '🟢 חמושה/Armée',
+                'triggered': '🎯 הופעלה/Déclenchée',
+                'cooldown': '⏳ צינון/Refroidissement'
+            }
             for i, alert in enumerate(st.session_state.price_alerts):
                 with st.container():
-                    currency_symbol = "₪" if alert['symbol'].endswith('.TA') else "$"
+                    currency_symbol = currency_sign(alert['symbol'])
                     st.markdown(f"""
-                    <div class='alert-box alert-warning'>
-                        <b>{alert['symbol']}</b> - {alert['condition']} {currency_symbol}{alert['price']:.2f}<br>
-                        <small>נוצרה/Créée: {alert['created']} (UTC+2) | {('חד פעמי/Unique' if alert['one_time'] else 'קבוע/Permanent')}</small>
+                    <div class='alert-box {'alert-success' if alert['state'] == 'triggered' else 'alert-warning'}'>
+                        <b>{alert['symbol']}</b> - {alert['condition']} {currency_symbol}{alert['price']:.2f} | {alert_state_labels.get(alert['state'], alert['state'])}<br>
+                        <small>נוצרה/Créée: {alert['created']} (UTC+2) | {('חד פעמי/Unique' if alert['one_time'] else 'קבוע/Permanent')} | ±{alert['hysteresis'] * 100:.1f}% / {alert['cooldown'] // 60} min</small>
                     </div>
                     """, unsafe_allow_html=True)
                     
                     if st.button(f"מחק / Supprimer", key=f"del_alert_{i}"):
-                        st.session_state.price_alerts.pop(i)
+                        store.delete_alert(user_id, alert['id'])
+                        sync_session_state()
                         st.rerun()
         else:
             st.info("אין התראות פעילות / Aucune alerte active")
@@ -804,20 +1155,25 @@ elif menu == "📧 התראות אימייל / Email":
         
         with col2:
             email = st.text_input("כתובת אימייל / Adresse email", value=st.session_state.email_config['email'])
-            password = st.text_input("סיסמה / Mot de passe", type="password", value=st.session_state.email_config['password'])
+            password = st.text_input(
+                "סיסמה / Mot de passe", type="password", value="",
+                placeholder="••••••••" if st.session_state.email_config['password_set'] else "",
+                help="Laisser vide pour conserver le mot de passe enregistré"
+            )
         
         test_email = st.text_input("אימייל לבדיקה (אופציונלי) / Email test (optionnel)")
         
         col_btn1, col_btn2 = st.columns(2)
         with col_btn1:
             if st.form_submit_button("💾 שמור הגדרות / Sauvegarder"):
-                st.session_state.email_config = {
+                store.save_email_config(user_id, {
                     'enabled': enabled,
                     'smtp_server': smtp_server,
-                    'smtp_port': smtp_port,
+                    'smtp_port': int(smtp_port),
                     'email': email,
                     'password': password
-                }
+                })
+                sync_session_state()
                 st.success("ההגדרות נשמרו / Configuration sauvegardée !")
         
         with col_btn2:
@@ -848,9 +1204,9 @@ elif menu == "📤 ייצוא נתונים / Export":
         with col1:
             st.markdown("### 📊 נתונים היסטוריים / Données historiques")
             # Afficher avec fuseau horaire
-            display_hist = hist.copy()
-            display_hist.index = display_hist.index.strftime('%Y-%m-%d %H:%M:%S (UTC+2)')
-            st.dataframe(display_hist.tail(20))
+            display_hist = hist.tail(20)
+            display_hist = display_hist.set_axis(display_hist.index.strftime('%Y-%m-%d %H:%M:%S (UTC+2)'))
+            st.dataframe(display_hist)
             
             # Export CSV
             csv = hist.to_csv()
@@ -863,23 +1219,47 @@ elif menu == "📤 ייצוא נתונים / Export":
         
         with col2:
             st.markdown("### 📈 דוח PDF / Rapport PDF")
-            st.info("יצירת דוח PDF (סימולציה) / Génération PDF (simulée)")
+            stats, report_html, report_pdf = load_report(symbol, period, interval, bars_version(hist), hist)
             
             # Statistiques
             st.markdown("**סטטיסטיקות / Statistiques:**")
-            stats = {
-                'ממוצע/Moyenne': hist['Close'].mean(),
-                'סטיית תקן/Écart-type': hist['Close'].std(),
-                'מינימום/Min': hist['Close'].min(),
-                'מקסימום/Max': hist['Close'].max(),
-                'שינוי כולל/Variation totale': f"{(hist['Close'].iloc[-1] / hist['Close'].iloc[0] - 1) * 100:.2f}%" if len(hist) > 1 else "N/A"
-            }
+            for key, (he, fr, money) in STAT_LABELS.items():
+                value = stats.get(key, np.nan)
+                st.write(f"{he}/{fr}: {format_currency(value, symbol) if money else f'{value:.2f}'}")
             
-            for key, value in stats.items():
-                if isinstance(value, float):
-                    st.write(f"{key}: {format_currency(value, symbol)}")
-                else:
-                    st.write(f"{key}: {value}")
+            col_r1, col_r2 = st.columns(2)
+            report_name = f"{symbol}_rapport_{datetime.now(USER_TIMEZONE).strftime('%Y%m%d_%H%M%S')}"
+            col_r1.download_button(
+                label="📥 הורד PDF / Télécharger PDF",
+                data=report_pdf,
+                file_name=f"{report_name}.pdf",
+                mime="application/pdf"
+            )
+            col_r2.download_button(
+                label="📥 הורד HTML / Télécharger HTML",
+                data=report_html,
+                file_name=f"{report_name}.html",
+                mime="text/html"
+            )
+            
+            # Rapports de toute la watchlist (pool de processus, barres du cache partagé)
+            if st.button("🗂️ דוחות לכל הרשימה / Rapports de la watchlist"):
+                with st.spinner("יוצר דוחות / Génération des rapports..."):
+                    st.session_state.watchlist_reports = build_watchlist_reports(
+                        tuple(st.session_state.watchlist), period, interval, user_id
+                    )
+            if st.session_state.get('watchlist_reports'):
+                archive, result = st.session_state.watchlist_reports
+                st.caption(
+                    f"{result['symbols']} דוחות / rapports en {result['total_s']:.1f} s "
+                    f"({result['charts_cached']} graphiques en cache)"
+                )
+                st.download_button(
+                    label="📥 הורד ZIP / Télécharger ZIP",
+                    data=archive,
+                    file_name=f"rapports_{datetime.now(USER_TIMEZONE).strftime('%Y%m%d')}.zip",
+                    mime="application/zip"
+                )
             
             # Export JSON
             json_data = {
@@ -888,8 +1268,8 @@ elif menu == "📤 ייצוא נתונים / Export":
                 'currency': get_currency(symbol),
                 'last_update': datetime.now(USER_TIMEZONE).isoformat(),
                 'timezone': 'UTC+2',
-                'current_price': float(current_price) if current_price else 0,
-                'statistics': {k: (float(v) if isinstance(v, (int, float)) else v) for k, v in stats.items()},
+                'current_price': float(current_price) if current_price else None,
+                'statistics': stats,
                 'data': hist.reset_index().to_dict(orient='records')
             }
             
@@ -909,7 +1289,7 @@ elif menu == "🤖 תחזיות ML / Prédictions":
     st.subheader("🤖 תחזיות עם למידת מכונה / Prédictions Machine Learning")
     
     if hist is not None and not hist.empty and len(hist) > 30:
-        st.markdown("### מודל חיזוי (רגרסיה פולינומית) / Modèle prédiction (Régression polynomiale)")
+        st.markdown("### מודלי חיזוי / Modèles de prédiction")
         
         # Note sur les spécificités israéliennes
         st.info("""
@@ -921,7 +1301,8 @@ elif menu == "🤖 תחזיות ML / Prédictions":
         """)
         
         # Préparation des données
-        df_pred = hist[['Close']].reset_index()
+        # Nom d'index variable selon la source et l'intervalle (Date, Datetime)
+        df_pred = hist[['Close']].rename_axis('Date').reset_index()
         df_pred['Days'] = (df_pred['Date'] - df_pred['Date'].min()).dt.days
         
         X = df_pred['Days'].values.reshape(-1, 1)
@@ -936,112 +1317,180 @@ elif menu == "🤖 תחזיות ML / Prédictions":
         
         with col2:
             st.markdown("### אפשרויות / Options")
+            selected_models = st.multiselect(
+                "מודלים / Modèles",
+                options=list(FORECAST_MODELS.keys()),
+                default=list(FORECAST_MODELS.keys()),
+                format_func=lambda x: FORECAST_MODELS[x][1]
+            )
+            holdout = st.slider("תקופת בדיקה / Période de test (points)", min_value=5, max_value=60, value=min(20, len(y) // 4))
             show_confidence = st.checkbox("הצג רווח בר סמך / Intervalle confiance", value=True)
+            if show_confidence:
+                mc_method = st.radio(
+                    "סימולציה / Simulation",
+                    ["bootstrap", "gbm"],
+                    format_func=lambda x: "Bootstrap des rendements" if x == "bootstrap" else "Brownien géométrique (GBM)",
+                    horizontal=True
+                )
+                n_paths = st.select_slider(
+                    "מסלולים / Trajectoires",
+                    options=[10_000, 50_000, 100_000, 200_000],
+                    value=100_000
+                )
         
-        # Entraînement du modèle
-        model = make_pipeline(
-            PolynomialFeatures(degree=degree),
-            LinearRegression()
-        )
-        model.fit(X, y)
-        
-        # Prédictions
+        # Lancement des modèles en arrière-plan (résultats partagés par version des données)
         last_day = X[-1][0]
-        future_days = np.arange(last_day + 1, last_day + days_to_predict + 1).reshape(-1, 1)
-        predictions = model.predict(future_days)
+        future_days = np.arange(last_day + 1, last_day + days_to_predict + 1)
+        data_version = (period, interval, str(hist.index[-1]), len(y), float(y[-1]))
+        forecast_key = (symbol, *data_version, days_to_predict, holdout, degree)
+        runner = get_forecast_runner()
+        runner.submit(
+            forecast_key, X[:, 0], y, future_days, holdout,
+            models=selected_models, params={'polynomial': {'degree': degree}}
+        )
         
         # Dates futures (en UTC+2)
         last_date = df_pred['Date'].iloc[-1]
         future_dates = [last_date + timedelta(days=i+1) for i in range(days_to_predict)]
         
-        # Visualisation
-        fig_pred = go.Figure()
-        
-        # Données historiques
-        fig_pred.add_trace(go.Scatter(
-            x=df_pred['Date'],
-            y=y,
-            mode='lines',
-            name='היסטוריה/Historique',
-            line=dict(color='blue')
-        ))
+        # Bandes de prévision Monte Carlo (distribution des prix à chaque horizon)
+        bands = None
+        if show_confidence:
+            # Barres intraday : un pas de simulation = une séance (médiane des barres par jour de l'historique)
+            bars_per_day = int(hist.groupby(hist.index.date).size().median()) if interval in INTERVAL_MS else 1
+            bands = load_forecast_bands(symbol, data_version, days_to_predict, mc_method, n_paths, y, bars_per_day)
         
-        # Prédictions
-        fig_pred.add_trace(go.Scatter(
-            x=future_dates,
-            y=predictions,
-            mode='lines+markers',
-            name='תחזית/Prédictions',
-            line=dict(color='red', dash='dash'),
-            marker=dict(size=8)
-        ))
+        polling = runner.pending(forecast_key)
         
-        # Intervalle de confiance (simulé)
-        if show_confidence:
-            residuals = y - model.predict(X)
-            std_residuals = np.std(residuals)
+        @st.fragment(run_every=1 if polling else None)
+        def forecast_panel():
+            """Affiche les modèles terminés sans bloquer sur les plus lents"""
+            results = runner.results(forecast_key)
+            results = {name: results[name] for name in selected_models if name in results}
+            if polling and not any(r['status'] == 'pending' for r in results.values()):
+                st.rerun()
             
-            upper_bound = predictions + 2 * std_residuals
-            lower_bound = predictions - 2 * std_residuals
+            done = {name: r for name, r in results.items() if r['status'] == 'done'}
+            waiting = [FORECAST_MODELS[name][1] for name, r in results.items() if r['status'] == 'pending']
+            if waiting:
+                st.caption(f"⏳ בחישוב / En cours: {', '.join(waiting)}")
+            for name, r in results.items():
+                if r['status'] == 'timeout':
+                    st.warning(f"⏱️ {FORECAST_MODELS[name][1]}: חריגה מזמן / budget de temps dépassé")
+                elif r['status'] == 'error':
+                    st.warning(f"{FORECAST_MODELS[name][1]}: {r['error']}")
+            if not done:
+                return
             
-            fig_pred.add_trace(go.Scatter(
-                x=future_dates + future_dates[::-1],
-                y=np.concatenate([upper_bound, lower_bound[::-1]]),
-                fill='toself',
-                fillcolor='rgba(255,0,0,0.2)',
-                line=dict(color='rgba(255,0,0,0)'),
-                name='רווח בר סמך 95% / IC 95%'
-            ))
-        
-        fig_pred.update_layout(
-            title=f"תחזיות עבור {symbol} - {days_to_predict} ימים / Prédictions {days_to_predict} jours (UTC+2)",
-            xaxis_title="תאריך (UTC+2) / Date",
-            yaxis_title=f"מחיר / Prix ({'₪' if symbol.endswith('.TA') else '$'})",
-            hovermode='x unified',
-            template='plotly_white'
-        )
-        
-        st.plotly_chart(fig_pred, use_container_width=True)
-        
-        # Tableau des prédictions
-        st.markdown("### 📋 תחזיות מפורטות / Prédictions détaillées")
-        pred_df = pd.DataFrame({
-            'תאריך (UTC+2)/Date': [d.strftime('%Y-%m-%d') for d in future_dates],
-            'מחיר חזוי/Prix prédit': [format_currency(p, symbol) for p in predictions],
-            'אחוז שינוי/Variation %': [f"{(p/current_price - 1)*100:.2f}%" for p in predictions]
-        })
-        st.dataframe(pred_df, use_container_width=True)
-        
-        # Métriques de performance
-        st.markdown("### 📊 ביצועי מודל / Performance modèle")
-        residuals = y - model.predict(X)
-        mse = np.mean(residuals**2)
-        rmse = np.sqrt(mse)
-        mae = np.mean(np.abs(residuals))
-        
-        col_m1, col_m2, col_m3 = st.columns(3)
-        col_m1.metric("RMSE", f"{format_currency(rmse, symbol)}")
-        col_m2.metric("MAE", f"{format_currency(mae, symbol)}")
-        col_m3.metric("R²", f"{model.score(X, y):.3f}")
-        
-        # Analyse des tendances
-        st.markdown("### 📈 ניתוח מגמות / Analyse tendances")
-        last_price = current_price
-        last_pred = predictions[-1]
-        trend = "עולה 📈 / Haussière" if last_pred > last_price else "יורדת 📉 / Baissière" if last_pred < last_price else "יציבה ➡️ / Neutre"
-        
-        if last_pred > last_price * 1.05:
-            strength = "מגמת עלייה חזקה 🚀 / Forte haussière"
-        elif last_pred > last_price:
-            strength = "מגמת עלייה קלה 📈 / Légère haussière"
-        elif last_pred < last_price * 0.95:
-            strength = "מגמת ירידה חזקה 🔻 / Forte baissière"
-        elif last_pred < last_price:
-            strength = "מגמת ירידה קלה 📉 / Légère baissière"
-        else:
-            strength = "מגמה יציבה ⏸️ / Stable"
+            # Meilleur modèle : erreur minimale sur la période de test
+            best = min(done, key=lambda name: done[name]['metrics'].get('rmse', np.inf))
+            predictions = done[best]['forecast']
+            
+            # Visualisation, reconstruite seulement si les modèles terminés ou les bandes changent
+            def build_prediction_figure():
+                fig_pred = go.Figure()
+            
+                # Données historiques
+                fig_pred.add_trace(go.Scatter(
+                    x=df_pred['Date'],
+                    y=y,
+                    mode='lines',
+                    name='היסטוריה/Historique',
+                    line=dict(color='blue')
+                ))
+            
+                # Prédictions de chaque modèle
+                for name, r in done.items():
+                    fig_pred.add_trace(go.Scatter(
+                        x=future_dates,
+                        y=r['forecast'],
+                        mode='lines+markers',
+                        name=f"תחזית/Prédictions - {FORECAST_MODELS[name][1]}",
+                        line=dict(dash='dash', width=3 if name == best else 1),
+                        marker=dict(size=8 if name == best else 4)
+                    ))
+            
+                # Intervalles de prévision simulés (95% et 50%) et médiane
+                if bands is not None:
+                    for low, high, opacity, label in [(0.025, 0.975, 0.15, '95%'), (0.25, 0.75, 0.3, '50%')]:
+                        fig_pred.add_trace(go.Scatter(
+                            x=future_dates + future_dates[::-1],
+                            y=np.concatenate([bands[high].to_numpy(), bands[low].to_numpy()[::-1]]),
+                            fill='toself',
+                            fillcolor=f'rgba(255,0,0,{opacity})',
+                            line=dict(color='rgba(255,0,0,0)'),
+                            name=f'רווח בר סמך {label} / IC {label} (Monte Carlo)'
+                        ))
+                    fig_pred.add_trace(go.Scatter(
+                        x=future_dates,
+                        y=bands[0.5],
+                        mode='lines',
+                        name='חציון / Médiane (Monte Carlo)',
+                        line=dict(color='red', dash='dot')
+                    ))
+            
+                fig_pred.update_layout(
+                    title=f"תחזיות עבור {symbol} - {days_to_predict} ימים / Prédictions {days_to_predict} jours (UTC+2)",
+                    xaxis_title="תאריך (UTC+2) / Date",
+                    yaxis_title=f"מחיר / Prix ({currency_sign(symbol)})",
+                    hovermode='x unified',
+                    template='plotly_white'
+                )
+                return fig_pred
+            
+            fig_pred = get_figure_cache().get(
+                ('prediction', symbol),
+                (forecast_key, tuple(done), best, show_confidence and (mc_method, n_paths)),
+                build_prediction_figure
+            )
+            st.plotly_chart(fig_pred, use_container_width=True)
+            
+            # Comparaison des modèles sur la période de test
+            st.markdown("### 📊 השוואת מודלים / Comparaison des modèles")
+            comparison = pd.DataFrame([
+                {
+                    'מודל/Modèle': FORECAST_MODELS[name][1] + (' ⭐' if name == best else ''),
+                    'RMSE': r['metrics'].get('rmse', np.nan),
+                    'MAE': r['metrics'].get('mae', np.nan),
+                    'MAPE %': r['metrics'].get('mape', np.nan),
+                    'זמן/Durée (s)': r['seconds']
+                }
+                for name, r in done.items()
+            ])
+            st.dataframe(comparison.style.format(precision=3), use_container_width=True)
+            
+            # Tableau des prédictions
+            st.markdown(f"### 📋 תחזיות מפורטות / Prédictions détaillées ({FORECAST_MODELS[best][1]})")
+            pred_df = pd.DataFrame({
+                'תאריך (UTC+2)/Date': [d.strftime('%Y-%m-%d') for d in future_dates],
+                'מחיר חזוי/Prix prédit': [format_currency(p, symbol) for p in predictions],
+                'אחוז שינוי/Variation %': [f"{(p/current_price - 1)*100:.2f}%" for p in predictions]
+            })
+            if bands is not None:
+                pred_df['גבול תחתון/IC 95% bas'] = [format_currency(p, symbol) for p in bands[0.025]]
+                pred_df['גבול עליון/IC 95% haut'] = [format_currency(p, symbol) for p in bands[0.975]]
+            st.dataframe(pred_df, use_container_width=True)
+            
+            # Analyse des tendances
+            st.markdown("### 📈 ניתוח מגמות / Analyse tendances")
+            last_price = current_price
+            last_pred = predictions[-1]
+            trend = "עולה 📈 / Haussière" if last_pred > last_price else "יורדת 📉 / Baissière" if last_pred < last_price else "יציבה ➡️ / Neutre"
+            
+            if last_pred > last_price * 1.05:
+                strength = "מגמת עלייה חזקה 🚀 / Forte haussière"
+            elif last_pred > last_price:
+                strength = "מגמת עלייה קלה 📈 / Légère haussière"
+            elif last_pred < last_price * 0.95:
+                strength = "מגמת ירידה חזקה 🔻 / Forte baissière"
+            elif last_pred < last_price:
+                strength = "מגמת ירידה קלה 📉 / Légère baissière"
+            else:
+                strength = "מגמה יציבה ⏸️ / Stable"
+            
+            st.info(f"**מגמה חזויה / Tendance prévue:** {trend} - {strength}")
         
-        st.info(f"**מגמה חזויה / Tendance prévue:** {trend} - {strength}")
+        forecast_panel()
         
         # Facteurs spécifiques Israël
         with st.expander("🇮🇱 גורמים המשפיעים על השוק הישראלי / Facteurs marché israélien"):
@@ -1067,19 +1516,7 @@ elif menu == "🤖 תחזיות ML / Prédictions":
 elif menu == "🇮🇱 מדדי תל אביב / Indices":
     st.subheader("🇮🇱 מדדי בורסת תל אביב / Indices TASE")
     
-    # Liste des indices israéliens
-    israel_indices = {
-        '^TA125': 'TA-125',
-        '^TA35': 'TA-35',
-        '^TA90': 'TA-90',
-        '^TA_BANKS': 'TA-Banks',
-        '^TA_OILGAS': 'TA-Oil&Gas',
-        '^TA_TECH': 'TA-Technology',
-        '^TA_REAL_ESTATE': 'TA-Real Estate',
-        '^TA_BIO_SCIENCE': 'TA-Biomed',
-        'TEVA': 'Teva (référence)',
-        'LUMI.TA': 'Bank Leumi (référence)'
-    }
+    israel_indices = ISRAEL_INDICES
     
     col1, col2 = st.columns([2, 1])
     
@@ -1104,16 +1541,10 @@ elif menu == "🇮🇱 מדדי תל אביב / Indices":
     with col1:
         # Charger et afficher l'indice sélectionné
         try:
-            index_ticker = yf.Ticker(selected_index)
-            index_hist = index_ticker.history(period=perf_period)
+            # Barres journalières en cache (UTC+2), préchargées au démarrage
+            index_hist = bars_view(load_bars(selected_index, perf_period, '1d'))
             
             if not index_hist.empty:
-                # Convertir en UTC+2
-                if index_hist.index.tz is None:
-                    index_hist.index = index_hist.index.tz_localize('UTC').tz_convert(USER_TIMEZONE)
-                else:
-                    index_hist.index = index_hist.index.tz_convert(USER_TIMEZONE)
-                
                 current_index = index_hist['Close'].iloc[-1]
                 prev_index = index_hist['Close'].iloc[-2] if len(index_hist) > 1 else current_index
                 index_change = current_index - prev_index
@@ -1129,21 +1560,11 @@ elif menu == "🇮🇱 מדדי תל אביב / Indices":
                 st.caption(f"עדכון אחרון / Dernière MAJ: {index_hist.index[-1].strftime('%Y-%m-%d %H:%M:%S')} UTC+2")
                 
                 # Graphique de l'indice
-                fig_index = go.Figure()
-                fig_index.add_trace(go.Scatter(
-                    x=index_hist.index,
-                    y=index_hist['Close'],
-                    mode='lines',
-                    name=israel_indices[selected_index],
-                    line=dict(color='#0038b8', width=2)
-                ))
-                
-                fig_index.update_layout(
-                    title=f"התפתחות / Évolution - {perf_period} (שעות UTC+2 / heures UTC+2)",
-                    xaxis_title="תאריך (UTC+2) / Date",
-                    yaxis_title="נקודות / Points",
-                    height=400,
-                    template='plotly_white'
+                fig_index = get_figure_cache().get_bars(
+                    ('index', selected_index, perf_period),
+                    index_hist,
+                    lambda bars: index_figure(bars, israel_indices[selected_index], perf_period),
+                    index_traces
                 )
                 
                 st.plotly_chart(fig_index, use_container_width=True)
@@ -1165,11 +1586,10 @@ elif menu == "🇮🇱 מדדי תל אביב / Indices":
     comparison_data = []
     for idx, name in list(israel_indices.items())[:6]:  # Limiter à 6 indices
         try:
-            ticker = yf.Ticker(idx)
-            hist = ticker.history(period="5d")
-            if not hist.empty:
-                current = hist['Close'].iloc[-1]
-                prev = hist['Close'].iloc[0]
+            index_bars = load_bars(idx, "5d", '1d')
+            if not index_bars.empty:
+                current = index_bars['Close'].iloc[-1]
+                prev = index_bars['Close'].iloc[0]
                 change_pct = ((current - prev) / prev * 100) if prev != 0 else 0
                 
                 comparison_data.append({
@@ -1200,71 +1620,325 @@ elif menu == "🇮🇱 מדדי תל אביב / Indices":
         - **TA-Biomed** : מניות ביומד / Biomédical
         
         **שעות מסחר (שעון ישראל) / Horaires trading (heure Israël):**
-        - ראשון-חמישי / Dimanche-Jeudi: 09:45 - 16:25
-        - שישי-שבת / Vendredi-Samedi: סגור / Fermé
+        """ + "".join(
+            f"\n        - {_day_range(first, last, 0)} / {_day_range(first, last, 1)}: {open_time} - {close_time}"
+            for first, last, open_time, close_time in week_hours_lines()
+        ) + """
+        - שאר הימים / Autres jours: סגור / Fermé
         - חגים / Jours fériés: סגור / Fermé
-        
-        **המרה ל-UTC+2 / Correspondance UTC+2:**
-        - פתיחה / Ouverture: 08:45 (חורף/hiver) / 07:45 (קיץ/été)
-        - נעילה / Fermeture: 15:25 (חורף/hiver) / 14:25 (קיץ/été)
         """)
 
+# ============================================================================
+# SECTION 8: SCREENER
+# ============================================================================
+elif menu == "🔎 סורק מניות / Screener":
+    st.subheader("🔎 סורק מניות / Screener TASE")
+    
+    @st.cache_data(ttl=300, show_spinner=False)
+    def load_screener_indicators(symbols):
+        """Panneau aligné (téléchargement parallèle) et table d'indicateurs de l'univers"""
+        panel = fetch_panel(get_source(), symbols, period='1y', interval='1d')
+        return compute_indicators(panel)
+    
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        universe = st.selectbox("יקום / Univers", options=list(UNIVERSES.keys()))
+        presets = st.multiselect(
+            "תנאים / Conditions",
+            options=list(PRESET_CONDITIONS.keys()),
+            default=["Volume > 2x moy. 20j"]
+        )
+        expression = st.text_area(
+            "ביטוי / Expression",
+            value=" and ".join(f"({PRESET_CONDITIONS[p]})" for p in presets),
+            help="Colonnes: price, change_pct, gap_pct, volume_ratio, sma_fast, sma_slow, "
+                 "ma_cross_up, ma_cross_down, rsi, high_52w, pct_from_52w_high, at_52w_high. "
+                 "Opérateurs: < <= > >= == !=, and / or / not, abs(), nombres"
+        )
+    
+    with col2:
+        with st.spinner("טוען נתונים / Chargement de l'univers..."):
+            indicators = load_screener_indicators(tuple(UNIVERSES[universe]))
+        
+        try:
+            scan_start = time.perf_counter()
+            matches = scan(indicators, expression)
+            scan_ms = (time.perf_counter() - scan_start) * 1000
+            
+            col_m1, col_m2 = st.columns(2)
+            col_m1.metric("תוצאות / Résultats", f"{len(matches)} / {len(indicators)}")
+            col_m2.metric("זמן סריקה / Durée du scan", f"{scan_ms:.1f} ms")
+            
+            st.dataframe(
+                matches.sort_values('change_pct', ascending=False).rename(columns={
+                    'price': 'מחיר/Prix',
+                    'change_pct': 'שינוי/Var %',
+                    'gap_pct': 'פער/Gap %',
+                    'volume_ratio': 'נפח יחסי/Vol. relatif',
+                    'rsi': 'RSI',
+                    'pct_from_52w_high': 'מהשיא/Écart plus haut 52s %'
+                }).drop(columns=['volume', 'sma_fast', 'sma_slow', 'high_52w']).style.format(precision=2),
+                use_container_width=True
+            )
+        except Exception as e:
+            st.error(f"ביטוי לא תקין / Expression invalide: {e}")
+
+# ============================================================================
+# SECTION 9: ARBITRAGE DES DOUBLES COTATIONS
+# ============================================================================
+elif menu == "⚖️ ארביטראז' / Arbitrage":
+    st.subheader("⚖️ פערי רישום כפול / Écarts des doubles cotations TASE / US")
+    st.caption(
+        "Prime du cours TASE sur le cours US converti au USD/ILS, en points de base (barres 1 minute). "
+        "Seule la fenêtre où les deux places cotent est comparée; z-score sur les dernières observations."
+    )
+
+    pairs = tuple(dual_listed_pairs())
+    with st.spinner("טוען נתונים / Chargement des barres 1 minute..."):
+        spreads = load_dual_spreads(pairs)
+
+    if spreads.empty:
+        st.info("אין חפיפה / Aucune séance commune TASE / US sur la période")
+    else:
+        latest = latest_spreads(spreads)
+        st.dataframe(
+            pd.DataFrame({
+                'מחיר ת"א/TASE (₪)': latest['tase_ils'],
+                'מחיר ארה"ב/US ($)': latest['us_usd'],
+                'USD/ILS': latest['usd_ils'],
+                'פרמיה/Prime (pb)': latest['premium_bp'],
+                'z-score': latest['zscore'],
+                'שעה/Heure (UTC+2)': latest['timestamp'].dt.tz_convert(USER_TIMEZONE).dt.strftime('%d/%m %H:%M'),
+            }).sort_values('פרמיה/Prime (pb)', key=np.abs, ascending=False).style.format(precision=2),
+            use_container_width=True
+        )
+
+        col1, col2 = st.columns([2, 1])
+
+        with col1:
+            pair = st.selectbox("זוג / Paire", options=list(latest.index))
+            history = spreads[spreads['pair'] == pair]
+            times = history['timestamp'].dt.tz_convert(USER_TIMEZONE)
+            fig_spread = go.Figure()
+            fig_spread.add_trace(go.Scatter(
+                x=times, y=history['premium_bp'], mode='lines', name='Prime (pb)', line=dict(color='#0038b8', width=1.5)
+            ))
+            fig_spread.add_trace(go.Scatter(
+                x=times, y=history['zscore'], mode='lines', name='z-score', yaxis='y2',
+                line=dict(color='orange', width=1, dash='dot')
+            ))
+            fig_spread.update_layout(
+                title=f"{pair} (שעות UTC+2 / heures UTC+2)",
+                yaxis_title="פרמיה / Prime (pb)",
+                yaxis2=dict(title="z-score", overlaying='y', side='right', showgrid=False),
+                xaxis_title="תאריך (UTC+2) / Date",
+                height=450,
+                hovermode='x unified',
+                template='plotly_white'
+            )
+            st.plotly_chart(fig_spread, use_container_width=True)
+
+        with col2:
+            st.markdown("### 🔔 התראת פער / Alerte d'écart")
+            tase_symbol, us_symbol = latest.loc[pair, ['tase', 'us']]
+            with st.form("new_spread_alert"):
+                metric = st.radio("מדד / Mesure", ["bp", "z"], format_func=lambda m: {'bp': 'Prime (pb)', 'z': 'z-score'}[m])
+                condition = st.selectbox("תנאי / Condition", ["above", "below"])
+                threshold = st.number_input("סף / Seuil", value=50.0, step=5.0, help="Points de base ou écarts-types, négatif pour une décote")
+                one_time = st.checkbox("חד פעמי / Une fois")
+                cooldown_min = st.number_input(
+                    "צינון / Refroidissement (min)", min_value=0, max_value=1440, step=5, value=DEFAULT_COOLDOWN // 60
+                )
+                if st.form_submit_button("צור התראה / Créer"):
+                    alert_symbol = spread_symbol(tase_symbol, us_symbol, metric)
+                    store.add_alert(
+                        user_id, alert_symbol, threshold, condition, one_time,
+                        datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S'),
+                        hysteresis=DEFAULT_HYSTERESIS, cooldown=int(cooldown_min) * 60
+                    )
+                    sync_session_state()
+                    st.success(f"✅ התראה נוצרה / Alerte créée : {alert_symbol} {condition} {threshold:.2f}")
+
+# ============================================================================
+# SECTION 10: ANALYSE INTRADAY
+# ============================================================================
+elif menu == "⏱️ ניתוח תוך-יומי / Intraday":
+    st.subheader(f"⏱️ ניתוח תוך-יומי / Analyse intraday - {symbol}")
+    
+    col_w, col_b = st.columns(2)
+    with col_w:
+        months = st.selectbox("חלון / Fenêtre", [1, 3, 6, 12], index=1, format_func=lambda m: f"{m} mois")
+    with col_b:
+        bucket = st.selectbox("פרק זמן / Tranche", [1, 5, 15, 30], index=2, format_func=lambda b: f"{b} min")
+    
+    # Séances récentes intégrées aux agrégats persistés; la vue ne relit pas les barres brutes
+    refresh_intraday(symbol)
+    stack = get_intraday_store().load(symbol)
+    if len(stack['days']):
+        stack = intraday_window(stack, start=stack['days'][-1] - pd.DateOffset(months=months))
+    
+    if not len(stack['days']):
+        st.info(f"אין נתוני דקה / Aucune barre 1 minute pour {symbol}")
+    else:
+        session = session_for_symbol(symbol)
+        season = seasonality(stack, session, bucket)
+        profile, poc, (value_low, value_high) = volume_profile(stack, levels=80)
+        auctions = auction_stats(stack)
+        summary = auction_summary(auctions)
+        st.caption(
+            f"{len(stack['days'])} séances du {stack['days'][0]:%d/%m/%Y} au {stack['days'][-1]:%d/%m/%Y} "
+            f"(heure locale {session}) — l'historique s'allonge à chaque mise à jour quotidienne"
+        )
+        
+        col_m1, col_m2, col_m3, col_m4 = st.columns(4)
+        col_m1.metric("נקודת שליטה / Point de contrôle", format_currency(poc, symbol))
+        col_m2.metric("אזור ערך / Zone de valeur (70%)", f"{format_currency(value_low, symbol)} – {format_currency(value_high, symbol)}")
+        col_m3.metric("פתיחה / Volume d'ouverture", f"{summary.at['open_volume_pct', 'mean']:.1f}%")
+        col_m4.metric("נעילה / Volume de clôture", f"{summary.at['close_volume_pct', 'mean']:.1f}%")
+        
+        col1, col2 = st.columns([1, 2])
+        
+        with col1:
+            fig_profile = go.Figure(go.Bar(
+                x=profile['volume'], y=profile['price'], orientation='h', name='Volume',
+                marker=dict(color=np.where(profile['price'].between(value_low, value_high), '#0038b8', 'lightgray'))
+            ))
+            fig_profile.add_hline(y=poc, line_dash='dash', line_color='orange', annotation_text='POC')
+            fig_profile.update_layout(
+                title="פרופיל נפח / Profil de volume",
+                xaxis_title="מחזור / Volume",
+                yaxis_title=f"מחיר / Prix ({currency_sign(symbol)})",
+                height=500,
+                template='plotly_white'
+            )
+            st.plotly_chart(fig_profile, use_container_width=True)
+        
+        with col2:
+            fig_season = go.Figure()
+            fig_season.add_trace(go.Bar(
+                x=season.index, y=season['volume'], name='Volume moyen', marker=dict(color='lightgray')
+            ))
+            fig_season.add_trace(go.Scatter(
+                x=season.index, y=season['volatility_bp'], name='Volatilité (pb)', yaxis='y2',
+                mode='lines', line=dict(color='#ef553b', width=2)
+            ))
+            fig_season.add_trace(go.Scatter(
+                x=season.index, y=season['range_bp'], name='Amplitude moyenne (pb)', yaxis='y2',
+                mode='lines', line=dict(color='#0038b8', width=2, dash='dot')
+            ))
+            fig_season.update_layout(
+                title=f"עונתיות / Saisonnalité par tranche de {bucket} min",
+                xaxis_title="שעה / Heure",
+                yaxis_title="מחזור / Volume",
+                yaxis2=dict(title="נקודות בסיס / Points de base", overlaying='y', side='right', showgrid=False),
+                height=500,
+                hovermode='x unified',
+                template='plotly_white'
+            )
+            st.plotly_chart(fig_season, use_container_width=True)
+        
+        st.markdown("### 🔔 מכרזי פתיחה ונעילה / Enchères d'ouverture et de clôture")
+        st.dataframe(
+            summary.rename(index={
+                'gap_bp': "Écart d'ouverture (pb)",
+                'open_volume_pct': "Volume 1re barre (%)",
+                'close_volume_pct': "Volume dernière barre (%)",
+                'close_move_bp': "Mouvement de clôture (pb)",
+                'range_bp': "Amplitude de séance (pb)",
+            }).style.format(precision=2),
+            use_container_width=True
+        )
+
 # ============================================================================
 # WATCHLIST ET DERNIÈRE MISE À JOUR
 # ============================================================================
-st.markdown("---")
-col_w1, col_w2 = st.columns([3, 1])
+# Fréquences propres aux fragments (indépendantes du reste de la page)
+WATCHLIST_REFRESH_SEC = 30
+CLOCK_REFRESH_SEC = 1
 
-with col_w1:
+def render_watchlist_tiles(symbols, quotes, currency_symbol):
+    """Affiche une grille de tuiles prix/variation à partir des cotations groupées"""
+    cols_per_row = 4
+    for i in range(0, len(symbols), cols_per_row):
+        cols = st.columns(min(cols_per_row, len(symbols) - i))
+        for j, sym in enumerate(symbols[i:i+cols_per_row]):
+            with cols[j]:
+                if sym in quotes.index and not np.isnan(quotes.at[sym, 'price']):
+                    st.metric(
+                        sym,
+                        f"{currency_symbol}{quotes.at[sym, 'price']:.2f}",
+                        delta=f"{quotes.at[sym, 'change_pct']:.2f}%"
+                    )
+                else:
+                    st.metric(sym, "N/A")
+
+def market_map_panel():
+    """Carte du marché : un seul instantané de cotations groupées, une seule figure treemap"""
+    col_u, col_s = st.columns(2)
+    with col_u:
+        universe = st.selectbox("יקום המפה / Univers de la carte", ["Watchlist"] + list(UNIVERSES.keys()))
+    with col_s:
+        size_by = st.selectbox(
+            "גודל / Taille des tuiles", list(MAP_SIZES), format_func=MAP_SIZES.get
+        )
+    symbols = tuple(sorted(st.session_state.watchlist if universe == "Watchlist" else UNIVERSES[universe]))
+
+    quotes = load_quotes(symbols + (FX_SYMBOL,))
+    fx_rate = quotes['price'].get(FX_SYMBOL)
+    fx_rate = fx_rate if fx_rate and not np.isnan(fx_rate) else 3.7  # Taux approximatif si indisponible
+    quotes = quotes.drop(FX_SYMBOL, errors='ignore')
+
+    # La figure n'est reconstruite que si l'instantané a changé
+    fig = get_figure_cache().get(
+        ('market_map', universe, size_by),
+        (quotes.to_numpy(dtype=float).tobytes(), fx_rate),
+        lambda: market_map_figure(market_map_frame(quotes, fx_rate, size_by), size_by)
+    )
+    st.plotly_chart(fig, use_container_width=True)
+    quoted = int(quotes['price'].notna().sum())
+    st.caption(
+        f"{quoted}/{len(symbols)} סמלים / symboles | צבע: שינוי יומי / couleur : variation du jour "
+        f"(±3%) | USD/ILS {fx_rate:.3f}"
+    )
+
+@st.fragment(run_every=WATCHLIST_REFRESH_SEC)
+def watchlist_panel():
+    """Fragment watchlist : se relance seul, sans réexécuter le reste de la page"""
     st.subheader("📋 רשימת מעקב / Watchlist")
     
+    view = st.radio(
+        "תצוגה / Affichage", ["🔢 כרטיסים / Tuiles", "🗺️ מפת שוק / Carte du marché"],
+        horizontal=True, label_visibility="collapsed"
+    )
+    if view.startswith("🗺️"):
+        market_map_panel()
+        return
+
     # Organiser la watchlist par marché
     tase_stocks = [s for s in st.session_state.watchlist if s.endswith('.TA')]
     us_stocks = [s for s in st.session_state.watchlist if not s.endswith('.TA')]
     
+    # Une seule recherche en cache pour toute la watchlist
+    quotes = load_quotes(tuple(sorted(st.session_state.watchlist)))
+    
     tabs = st.tabs(["תל אביב / TASE", "ארה\"ב / US"])
     
     with tabs[0]:
         if tase_stocks:
-            cols_per_row = 4
-            for i in range(0, len(tase_stocks), cols_per_row):
-                cols = st.columns(min(cols_per_row, len(tase_stocks) - i))
-                for j, sym in enumerate(tase_stocks[i:i+cols_per_row]):
-                    with cols[j]:
-                        try:
-                            ticker = yf.Ticker(sym)
-                            hist = ticker.history(period='1d')
-                            if not hist.empty:
-                                price = hist['Close'].iloc[-1]
-                                st.metric(sym, f"₪{price:.2f}")
-                            else:
-                                st.metric(sym, "N/A")
-                        except:
-                            st.metric(sym, "N/A")
+            render_watchlist_tiles(tase_stocks, quotes, "₪")
         else:
             st.info("אין מניות תל אביב / Aucune action TASE")
     
     with tabs[1]:
         if us_stocks:
-            cols_per_row = 4
-            for i in range(0, len(us_stocks), cols_per_row):
-                cols = st.columns(min(cols_per_row, len(us_stocks) - i))
-                for j, sym in enumerate(us_stocks[i:i+cols_per_row]):
-                    with cols[j]:
-                        try:
-                            ticker = yf.Ticker(sym)
-                            hist = ticker.history(period='1d')
-                            if not hist.empty:
-                                price = hist['Close'].iloc[-1]
-                                st.metric(sym, f"${price:.2f}")
-                            else:
-                                st.metric(sym, "N/A")
-                        except:
-                            st.metric(sym, "N/A")
+            render_watchlist_tiles(us_stocks, quotes, "$")
         else:
             st.info("אין מניות ארה\"ב / Aucune action US")
 
-with col_w2:
+@st.fragment(run_every=CLOCK_REFRESH_SEC)
+def clock_panel():
+    """Fragment horloge et statut du marché"""
     # Heures actuelles
     utc2_time = datetime.now(USER_TIMEZONE)
     israel_time = datetime.now(ISRAEL_TIMEZONE)
@@ -1279,10 +1953,15 @@ with col_w2:
     st.caption(f"{market_icon} תל אביב / TASE: {market_status}")
     
     st.caption(f"עדכון אחרון / Dernière MAJ: {datetime.now(USER_TIMEZONE).strftime('%H:%M:%S')} UTC+2")
-    
-    if auto_refresh and hist is not None and not hist.empty:
-        time.sleep(refresh_rate)
-        st.rerun()
+
+st.markdown("---")
+col_w1, col_w2 = st.columns([3, 1])
+
+with col_w1:
+    watchlist_panel()
+
+with col_w2:
+    clock_panel()
 
 # Footer
 st.markdown("---")
@@ -0,0 +1,196 @@
+"""Worker d'alertes autonome : évalue les alertes persistées de tous les utilisateurs
+
+Usage :
+    python alert_worker.py                       # boucle toutes les 30 s sur Yahoo
+    python alert_worker.py --once                # un seul cycle
+    python alert_worker.py --source replay:ticks.csv
+    python alert_worker.py --benchmark 1000000   # débit d'évaluation (alertes/s/cœur)
+
+Les alertes sur les écarts de double cotation ('TEVA.TA/TEVA:bp', ':z') sont
+évaluées sur les barres 1 minute du cache d'historiques, sans cotation dédiée.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+import arbitrage
+from alerts import ALERT_WORKER, AlertBook
+from history_cache import HistoryCache
+from market_data import get_data_source, quotes_from_closes
+from notifications import NotificationDispatcher, format_digest_email
+from storage import DEFAULT_DB_PATH, TrackerStore
+
+USER_TIMEZONE = pytz.timezone('Europe/Paris')
+
+logger = logging.getLogger('alert_worker')
+
+def run_cycle(store, source, dispatcher, history=None):
+    """Un cycle complet : chargement, cotations groupées, évaluation, notifications
+
+    history : cache d'historiques pour les écarts de double cotation (créé au besoin).
+    """
+    book = AlertBook(store.get_all_alerts())
+    stats = {'alerts': len(book), 'symbols': len(book.symbols), 'triggered': 0, 'emails': 0, 'alerts_per_sec': 0.0}
+    if not len(book):
+        return stats
+
+    # Une seule requête de cotations pour tous les symboles distincts; les écarts viennent des barres en cache
+    spreads = [s for s in book.symbols if arbitrage.parse_spread_symbol(s)]
+    symbols = [s for s in book.symbols if s not in spreads]
+    quotes = source.get_quotes(symbols) if symbols else None
+    if spreads:
+        history = history or HistoryCache(source)
+        quotes = pd.concat([q for q in (quotes, arbitrage.spread_quotes(history.get_interval, spreads)) if q is not None])
+
+    cpu_start = time.process_time()
+    triggered, prices, changed = book.transition(quotes, time.time())
+    cpu_elapsed = time.process_time() - cpu_start
+
+    # Transitions persistées par comparaison-échange avant toute notification : une alerte
+    # déjà déclenchée par une session du dashboard n'est pas notifiée une seconde fois
+    triggered = book.commit(store, triggered, changed)
+    stats['triggered'] = len(triggered)
+    stats['alerts_per_sec'] = len(book) / cpu_elapsed if cpu_elapsed > 0 else float('inf')
+
+    # Un email récapitulatif par utilisateur, envoyé en arrière-plan
+    configs = store.get_email_configs()
+    timestamp = datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
+    digests = {}
+    for i in triggered:
+        alert = book.alerts[i]
+        digests.setdefault(alert['user_id'], []).append((alert['symbol'], prices[i], alert))
+    for user_id, entries in digests.items():
+        config = configs.get(user_id)
+        if config and config.get('enabled') and config.get('email'):
+            subject, body = format_digest_email(entries, timestamp)
+            dispatcher.submit(config, subject, body, config['email'])
+    stats['emails'] = len(digests)
+    return stats
+
+def benchmark(n_alerts, n_symbols=500, seed=0):
+    """Mesure le débit d'évaluation en alertes par seconde et par cœur"""
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{i}.TA" for i in range(n_symbols)]
+    closes = pd.DataFrame(
+        100 * np.exp(np.cumsum(rng.normal(0, 0.01, (2, n_symbols)), axis=0)),
+        columns=symbols
+    )
+    quotes = quotes_from_closes(closes, symbols)
+    alerts = [
+        {'id': i, 'symbol': symbols[s], 'price': p, 'condition': c, 'one_time': False, 'state': 'armed'}
+        for i, (s, p, c) in enumerate(zip(
+            rng.integers(0, n_symbols, n_alerts),
+            rng.uniform(80, 120, n_alerts),
+            rng.choice(['above', 'below'], n_alerts)
+        ))
+    ]
+    book = AlertBook(alerts)
+
+    runs = 20
+    cpu_start = time.process_time()
+    triggered, _, _ = book.transition(quotes, 0.0)
+    for _ in range(runs):
+        book.transition(quotes, 0.0)
+    cpu_elapsed = (time.process_time() - cpu_start) / runs
+    return {
+        'alerts': n_alerts,
+        'symbols': n_symbols,
+        'triggered': len(triggered),
+        'cpu_ms_per_cycle': cpu_elapsed * 1000,
+        'alerts_per_sec': n_alerts / cpu_elapsed if cpu_elapsed > 0 else float('inf'),
+    }
+
+def storm_benchmark(n_alerts=1000, n_symbols=50, n_users=100, cycles=720, step=5.0, seed=0):
+    """Notifications émises pendant une heure de rafraîchissement à 5 s, prix oscillant autour des seuils
+
+    Compare l'ancien comportement (une notification par alerte vraie à chaque
+    cycle) à la machine à états avec hystérésis, refroidissement et récapitulatif.
+    """
+    rng = np.random.default_rng(seed)
+    symbols = [f"SYM{i}.TA" for i in range(n_symbols)]
+    paths = 100 * np.exp(np.cumsum(rng.normal(0, 0.002, (cycles, n_symbols)), axis=0))
+    alert_symbols = rng.integers(0, n_symbols, n_alerts)
+    alerts = [
+        {'id': i, 'user_id': f"user{i % n_users}", 'symbol': symbols[s], 'price': p, 'condition': c,
+         'one_time': False, 'state': 'armed'}
+        for i, (s, p, c) in enumerate(zip(alert_symbols, rng.uniform(98, 102, n_alerts), rng.choice(['above', 'below'], n_alerts)))
+    ]
+    users = np.array([a['user_id'] for a in alerts])
+    book = AlertBook(alerts)
+
+    legacy = fired_total = emails = 0
+    for t in range(cycles):
+        quotes = quotes_from_closes(pd.DataFrame(paths[t:t + 1], columns=symbols), symbols)
+        hit, _ = book.evaluate(quotes)
+        legacy += len(hit)
+        fired, _, _ = book.transition(quotes, t * step)
+        fired_total += len(fired)
+        emails += len(np.unique(users[fired]))
+    return {'cycles': cycles, 'legacy_notifications': legacy, 'fired': fired_total, 'emails': emails}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Worker d'alertes de prix TASE")
+    parser.add_argument('--db', default=DEFAULT_DB_PATH, help="Base SQLite partagée avec le dashboard")
+    parser.add_argument('--source', default=None, help="'yahoo' ou 'replay:<fichier.csv>'")
+    parser.add_argument('--interval', type=float, default=30, help="Secondes entre deux cycles")
+    parser.add_argument('--once', action='store_true', help="Exécuter un seul cycle")
+    parser.add_argument('--workers', type=int, default=4, help="Threads d'envoi des emails")
+    parser.add_argument('--benchmark', type=int, metavar='N', help="Mesurer le débit sur N alertes synthétiques")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    if args.benchmark:
+        result = benchmark(args.benchmark)
+        logger.info(
+            "%(alerts)d alertes / %(symbols)d symboles : %(cpu_ms_per_cycle).2f ms CPU par cycle, "
+            "%(alerts_per_sec).0f alertes/s/cœur", result
+        )
+        storm = storm_benchmark()
+        logger.info(
+            "Tempête d'alertes sur %(cycles)d cycles : %(legacy_notifications)d notifications sans état, "
+            "%(fired)d déclenchements et %(emails)d emails récapitulatifs avec la machine à états", storm
+        )
+        spreads = arbitrage.benchmark()
+        logger.info(
+            "Écarts de double cotation : %(pairs)d paires, %(input_bars)d barres 1 minute, "
+            "%(observations)d observations alignées en %(ms).0f ms", spreads
+        )
+        return
+
+    store = TrackerStore(args.db)
+    source = get_data_source(args.source)
+    replay = source.name == 'replay'
+    if replay:
+        source.cursor = 0
+    history = HistoryCache(source)
+    dispatcher = NotificationDispatcher(max_workers=args.workers)
+
+    try:
+        while True:
+            # Présence signalée au dashboard, qui n'évalue plus les alertes tant que le worker tourne
+            store.heartbeat(ALERT_WORKER, args.interval)
+            stats = run_cycle(store, source, dispatcher, history)
+            logger.info(
+                "%(alerts)d alertes, %(symbols)d symboles, %(triggered)d déclenchées "
+                "(%(alerts_per_sec).0f alertes/s/cœur)", stats
+            )
+            if args.once:
+                break
+            if replay:
+                if not source.advance():
+                    break
+            else:
+                time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        dispatcher.shutdown(wait=True)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,111 @@
+"""Alertes de prix : machine à états (armée, déclenchée, en refroidissement) évaluée en bloc
+
+Une alerte armée se déclenche quand sa condition est remplie. Elle reste
+déclenchée (sans nouvelle notification) tant que le prix n'est pas revenu
+au-delà de la bande d'hystérésis, puis passe en refroidissement et n'est
+réarmée qu'une fois le délai de refroidissement écoulé depuis le déclenchement.
+"""
+import numpy as np
+import pandas as pd
+
+ARMED, TRIGGERED, COOLDOWN = 'armed', 'triggered', 'cooldown'
+ALERT_STATES = (ARMED, TRIGGERED, COOLDOWN)
+
+# Bande d'hystérésis (fraction du seuil) et refroidissement (secondes) par défaut
+DEFAULT_HYSTERESIS = 0.01
+DEFAULT_COOLDOWN = 3600
+
+# Nom sous lequel le worker d'alertes signale sa présence dans le stockage
+ALERT_WORKER = 'alert_worker'
+
+ALERT_COLUMNS = ['id', 'symbol', 'price', 'condition', 'one_time', 'state', 'triggered_at', 'hysteresis', 'cooldown']
+
+class AlertBook:
+    """Alertes regroupées par symbole, sous forme de tableaux NumPy"""
+
+    def __init__(self, alerts):
+        self.alerts = alerts
+        frame = pd.DataFrame(alerts, columns=ALERT_COLUMNS)
+        codes, uniques = pd.factorize(frame['symbol'])
+        self.symbol_codes = codes
+        self.symbols = list(uniques)
+        self.thresholds = frame['price'].to_numpy(dtype=float)
+        self.above = (frame['condition'] == 'above').to_numpy()
+        self.one_time = frame['one_time'].to_numpy(dtype=bool)
+        self.ids = frame['id'].to_numpy()
+        self.states = pd.Categorical(frame['state'].fillna(ARMED), categories=ALERT_STATES).codes.astype(np.int8)
+        self.states[self.states < 0] = 0
+        self.triggered_at = frame['triggered_at'].to_numpy(dtype=float, na_value=np.nan)
+        self.hysteresis = frame['hysteresis'].fillna(DEFAULT_HYSTERESIS).to_numpy(dtype=float)
+        self.cooldown = frame['cooldown'].fillna(DEFAULT_COOLDOWN).to_numpy(dtype=float)
+        # État lu, attendu en base lors de la persistance (comparaison-échange)
+        self.read_states = self.states.copy()
+        self.read_triggered_at = self.triggered_at.copy()
+
+    def __len__(self):
+        return len(self.alerts)
+
+    def _prices(self, quotes):
+        symbol_prices = quotes['price'].reindex(self.symbols).to_numpy(dtype=float)
+        return symbol_prices[self.symbol_codes]
+
+    def evaluate(self, quotes):
+        """Indices des alertes dont la condition est remplie et prix courant de chaque alerte"""
+        prices = self._prices(quotes)
+        with np.errstate(invalid='ignore'):
+            hit = np.where(self.above, prices >= self.thresholds, prices <= self.thresholds)
+        hit &= ~np.isnan(prices)
+        return np.flatnonzero(hit), prices
+
+    def transition(self, quotes, now):
+        """Applique une étape de la machine à états à toutes les alertes
+
+        Renvoie (indices déclenchés à cette étape, prix, indices dont l'état a changé).
+        """
+        prices = self._prices(quotes)
+        valid = ~np.isnan(prices)
+        # Valeur absolue : seuils négatifs possibles (décote d'un écart de cotation)
+        band = np.abs(self.thresholds) * self.hysteresis
+        with np.errstate(invalid='ignore'):
+            hit = valid & np.where(self.above, prices >= self.thresholds, prices <= self.thresholds)
+            # Prix revenu de l'autre côté du seuil, au-delà de la bande
+            released = valid & np.where(self.above, prices < self.thresholds - band, prices > self.thresholds + band)
+            cooled = ~(now - self.triggered_at < self.cooldown)
+
+        states = self.states
+        new_states = states.copy()
+        fired = (states == 0) & hit
+        new_states[fired] = 1
+        new_states[(states == 1) & released] = 2
+        new_states[(states == 2) & cooled] = 0
+
+        self.triggered_at = np.where(fired, now, self.triggered_at)
+        changed = np.flatnonzero(new_states != states)
+        self.states = new_states
+        return np.flatnonzero(fired), prices, changed
+
+    def state_records(self, indices):
+        """Lignes (état, heure de déclenchement, id, état lu, heure lue) à persister"""
+        return [
+            (ALERT_STATES[self.states[i]], _optional(self.triggered_at[i]), int(self.ids[i]),
+             ALERT_STATES[self.read_states[i]], _optional(self.read_triggered_at[i]))
+            for i in indices
+        ]
+
+    def delete_records(self, indices):
+        """Lignes (id, état lu) des alertes à supprimer"""
+        return [(int(self.ids[i]), ALERT_STATES[self.read_states[i]]) for i in indices]
+
+    def commit(self, store, fired, changed):
+        """Persiste les transitions; renvoie les indices déclenchés dont la transition a été écrite
+
+        Les alertes à usage unique déclenchées sont supprimées. Une transition déjà
+        appliquée par un autre évaluateur n'est ni réécrite ni notifiée.
+        """
+        one_time = fired[self.one_time[fired]]
+        written = store.update_alert_states(self.state_records(np.setdiff1d(changed, one_time)))
+        written |= store.delete_alerts(self.delete_records(one_time))
+        return fired[np.isin(self.ids[fired], list(written))]
+
+def _optional(value):
+    return None if np.isnan(value) else float(value)
@@ -0,0 +1,280 @@
+"""API JSON (ASGI) pour les outils internes, sur la même couche de données que le tableau de bord
+
+Usage :
+    uvicorn api:app --port 8502
+    TRACKER_SHARED_CACHE=/dev/shm/tracker_cache.db uvicorn api:app --port 8502 --workers 4
+
+Routes (GET, plusieurs symboles séparés par des virgules) :
+    /quotes?symbols=TEVA,LUMI.TA
+    /history?symbols=TEVA,NICE&period=1mo&interval=1d
+    /market/status
+    /portfolio                           (en-tête Authorization: Bearer <jeton de identity.py>)
+    /alerts                              (idem)
+    /symbols?q=leumi                     (autocomplétion sur le référentiel local)
+    /quality?symbols=TEVA,LUMI.TA        (compteurs du contrôle qualité des historiques)
+
+Les réponses portent un ETag : un client qui renvoie If-None-Match reçoit
+304 sans corps tant que les données n'ont pas changé. Les appels bloquants
+(Yahoo, SQLite) passent par le pool de threads et sont dédupliqués : des
+requêtes simultanées sur la même clé attendent le même téléchargement.
+"""
+import asyncio
+import hashlib
+import json
+import time
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from starlette.applications import Starlette
+from starlette.concurrency import run_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.responses import Response
+from starlette.routing import Route
+
+from history_cache import HistoryCache
+from identity import verify_token
+from ledger import value_positions
+from market_data import FX_SYMBOL, ISRAEL_TIMEZONE, PERIOD_OFFSETS, get_data_source, market_session
+from resample import INTERVAL_MINUTES
+from storage import TrackerStore
+from symbol_master import get_symbol_master
+
+# Mêmes durées de validité que les caches du tableau de bord (secondes)
+QUOTES_TTL = 60
+HISTORY_TTL = 300
+
+MAX_SYMBOLS = 200
+INTERVALS = list(INTERVAL_MINUTES) + ['1d', '1wk', '1mo']
+
+class ApiError(Exception):
+    """Paramètre de requête invalide (réponse 400)"""
+
+class ResponseCache:
+    """Résultats (ou corps JSON déjà sérialisés) avec expiration; un seul calcul en cours par clé"""
+
+    def __init__(self, max_entries=1000):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._pending = {}
+
+    async def get(self, key, ttl, compute, *args):
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] > time.monotonic():
+            self._entries.move_to_end(key)
+            return entry[1]
+
+        # Requêtes simultanées : toutes attendent le même calcul
+        future = self._pending.get(key)
+        if future is None:
+            future = asyncio.ensure_future(run_in_threadpool(compute, *args))
+            self._pending[key] = future
+            future.add_done_callback(lambda f: self._store(key, ttl, f))
+        return await asyncio.shield(future)
+
+    def _store(self, key, ttl, future):
+        self._pending.pop(key, None)
+        if future.cancelled() or future.exception() is not None:
+            return
+        self._entries[key] = (time.monotonic() + ttl, future.result())
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+def _encode(payload):
+    """Corps JSON compact et son ETag"""
+    body = json.dumps(payload, separators=(',', ':'), ensure_ascii=False, allow_nan=False).encode()
+    return body, '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def _respond(request, encoded, max_age=0, private=False):
+    """Réponse JSON, ou 304 si le client a déjà cette version (private : jamais gardée par un cache partagé)"""
+    body, etag = encoded
+    headers = {
+        'ETag': etag,
+        'Cache-Control': ('private, ' if private else '') + (f'max-age={max_age}' if max_age else 'no-cache'),
+    }
+    if etag in [tag.strip() for tag in request.headers.get('if-none-match', '').split(',')]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type='application/json', headers=headers)
+
+def _error(message, status_code=400):
+    return Response(json.dumps({'error': message}, ensure_ascii=False), status_code=status_code,
+                    media_type='application/json')
+
+def _values(array, decimals=4):
+    """Liste JSON (NaN -> null) d'un tableau numérique"""
+    array = np.round(np.asarray(array, dtype=float), decimals)
+    return np.where(np.isnan(array), None, array).tolist()
+
+def _user(request):
+    """Utilisateur du jeton signé (Authorization: Bearer), None si absent ou invalide"""
+    scheme, _, token = request.headers.get('authorization', '').partition(' ')
+    if scheme.lower() != 'bearer' or not token:
+        return None
+    return verify_token(token.strip())
+
+def _symbols(request):
+    symbols = [s.strip().upper() for s in request.query_params.get('symbols', '').split(',') if s.strip()]
+    symbols = list(dict.fromkeys(symbols))
+    if not symbols:
+        raise ApiError("Paramètre 'symbols' manquant")
+    if len(symbols) > MAX_SYMBOLS:
+        raise ApiError(f"Au plus {MAX_SYMBOLS} symboles par requête")
+    return symbols
+
+class TrackerApi:
+    """Routes de l'API, sur une source de données, un cache d'historiques et un stockage partagés"""
+
+    def __init__(self, source=None, store=None):
+        self.source = source or get_data_source()
+        self.history = HistoryCache(self.source)
+        self.store = store or TrackerStore()
+        self.cache = ResponseCache()
+
+    # ------------------------------------------------------------------
+    # Données (bloquantes, exécutées dans le pool de threads)
+    # ------------------------------------------------------------------
+    def _quotes(self, symbols):
+        """Cotations groupées en un téléchargement, par symbole"""
+        quotes = self.source.get_quotes(list(symbols))
+        return {
+            symbol: dict(zip(quotes.columns, _values(row)))
+            for symbol, row in zip(quotes.index, quotes.to_numpy())
+        }
+
+    def _history(self, symbol, period, interval):
+        bars = self.history.get_interval(symbol, period, interval)
+        index = bars.index
+        if getattr(index, 'tz', None) is not None:
+            index = index.tz_convert('UTC')
+        return _encode({
+            'symbol': symbol,
+            'period': period,
+            'interval': interval,
+            'timestamps': [t.isoformat() for t in index],
+            **{column.lower(): _values(bars[column]) for column in bars.columns},
+        })
+
+    def _portfolio(self, user_id, quotes):
+        state = self.store.get_user_state(user_id)
+        prices = {symbol: quote['price'] for symbol, quote in quotes.items()}
+        fx_rate = prices.get(FX_SYMBOL) or 3.7  # Taux approximatif si indisponible
+        positions = value_positions(state['portfolio'], state['transactions'], pd.Series(prices, dtype=float), fx_rate)
+        ils = positions[positions['currency'] == 'ILS']
+        value_usd, cost_usd = positions['value_usd'].sum(), positions['cost_usd'].sum()
+        return {
+            'user': user_id,
+            'fx_rate': fx_rate,
+            'positions': positions.replace({np.nan: None}).to_dict('records'),
+            'totals': {
+                'value_usd': float(value_usd),
+                'cost_usd': float(cost_usd),
+                'profit_usd': float(value_usd - cost_usd),
+                'profit_pct': float((value_usd - cost_usd) / cost_usd * 100) if cost_usd > 0 else 0.0,
+                'value_ils': float(ils['value'].sum()),
+                'cost_ils': float(ils['cost'].sum()),
+            },
+        }
+
+    # ------------------------------------------------------------------
+    # Routes
+    # ------------------------------------------------------------------
+    async def get_quotes(self, symbols):
+        key = ('quotes', tuple(sorted(symbols)))
+        quotes = await self.cache.get(key, QUOTES_TTL, self._quotes, key[1])
+        return {symbol: quotes.get(symbol) for symbol in symbols}
+
+    async def quotes(self, request):
+        try:
+            symbols = _symbols(request)
+        except ApiError as e:
+            return _error(str(e))
+        return _respond(request, _encode(await self.get_quotes(symbols)), QUOTES_TTL)
+
+    async def history_route(self, request):
+        try:
+            symbols = _symbols(request)
+        except ApiError as e:
+            return _error(str(e))
+        period = request.query_params.get('period', '1mo')
+        interval = request.query_params.get('interval', '1d')
+        if period not in PERIOD_OFFSETS:
+            return _error(f"Période inconnue: {period}")
+        if interval not in INTERVALS:
+            return _error(f"Intervalle inconnu: {interval}")
+
+        # Un téléchargement par symbole absent du cache, en parallèle
+        encoded = await asyncio.gather(*[
+            self.cache.get(('history', symbol, period, interval), HISTORY_TTL, self._history, symbol, period, interval)
+            for symbol in symbols
+        ])
+        # Corps assemblé à partir des fragments déjà sérialisés
+        body = b'{' + b','.join(json.dumps(s).encode() + b':' + e[0] for s, e in zip(symbols, encoded)) + b'}'
+        etag = '"' + hashlib.blake2b(b''.join(e[1].encode() for e in encoded), digest_size=16).hexdigest() + '"'
+        return _respond(request, (body, etag), HISTORY_TTL)
+
+    async def market_status(self, request):
+        is_open, reason = market_session()
+        return _respond(request, _encode({
+            'exchange': 'TASE',
+            'open': is_open,
+            'reason': reason,
+            'timezone': str(ISRAEL_TIMEZONE),
+        }))
+
+    async def portfolio(self, request):
+        user_id = _user(request)
+        if user_id is None:
+            return _error("Jeton d'accès manquant ou invalide", 401)
+        state = await run_in_threadpool(self.store.get_user_state, user_id)
+        symbols = sorted(state['portfolio']) + [FX_SYMBOL]
+        quotes = await self.get_quotes(symbols)
+        try:
+            payload = await run_in_threadpool(self._portfolio, user_id, quotes)
+        except ValueError as e:
+            return _error(str(e), 422)
+        return _respond(request, _encode(payload), private=True)
+
+    async def alerts(self, request):
+        user_id = _user(request)
+        if user_id is None:
+            return _error("Jeton d'accès manquant ou invalide", 401)
+        state = await run_in_threadpool(self.store.get_user_state, user_id)
+        return _respond(request, _encode({'user': user_id, 'alerts': state['price_alerts']}), private=True)
+
+    async def symbols(self, request):
+        query = request.query_params.get('q', '')
+        try:
+            limit = min(int(request.query_params.get('limit', 10)), 50)
+        except ValueError:
+            return _error("Paramètre 'limit' invalide")
+        return _respond(request, _encode({'query': query, 'results': get_symbol_master().search(query, limit)}), 3600)
+
+    async def quality(self, request):
+        frame = self.history.quality.frame()
+        symbols = request.query_params.get('symbols')
+        if symbols:
+            frame = frame[frame['symbol'].isin([s.strip().upper() for s in symbols.split(',')])]
+        frame = frame.assign(checked_at=frame['checked_at'].astype(str))
+        return _respond(request, _encode({'quality': frame.replace({np.nan: None}).to_dict('records')}))
+
+    def routes(self):
+        return [
+            Route('/quotes', self.quotes),
+            Route('/history', self.history_route),
+            Route('/market/status', self.market_status),
+            Route('/portfolio', self.portfolio),
+            Route('/alerts', self.alerts),
+            Route('/symbols', self.symbols),
+            Route('/quality', self.quality),
+        ]
+
+def create_app(source=None, store=None):
+    """Application ASGI (source et stockage injectables pour les tests et le rejeu)"""
+    api = TrackerApi(source, store)
+    app = Starlette(routes=api.routes(), middleware=[Middleware(GZipMiddleware, minimum_size=1024)])
+    app.state.api = api
+    return app
+
+app = create_app()
@@ -0,0 +1,170 @@
+"""Écarts entre doubles cotations TASE / US : prime ou décote en points de base et z-score
+
+Pour chaque paire du référentiel (ex: TEVA.TA / TEVA), les barres des deux
+places et le taux USD/ILS sont alignés par jointures « as-of » vectorisées
+(pd.merge_asof, toutes les paires en un seul appel) : à chaque barre TASE on
+associe la dernière barre US et le dernier taux connus à cet instant, s'ils
+datent de moins de la tolérance. Seule la fenêtre où les deux places cotent
+produit donc des observations.
+
+    prime (pb) = (cours TASE en ₪ / (cours US en $ x USD/ILS) - 1) x 10 000
+
+Les paires sont supposées cotées action pour action (ratio 1:1). Le z-score
+compare la prime à sa moyenne et à son écart-type glissants sur les dernières
+observations de la paire. Les alertes portent sur des symboles synthétiques
+('TEVA.TA/TEVA:bp', 'TEVA.TA/TEVA:z') évalués comme des cours.
+"""
+import numpy as np
+import pandas as pd
+
+from market_data import FX_SYMBOL, empty_quotes
+from symbol_master import get_symbol_master
+
+# Mesure d'un symbole d'écart -> colonne
+SPREAD_METRICS = {'bp': 'premium_bp', 'z': 'zscore'}
+
+# Barres 1 minute sur les dernières séances (profondeur maximale de Yahoo en 1m : 7 jours)
+SPREAD_PERIOD = '5d'
+SPREAD_INTERVAL = '1m'
+DEFAULT_TOLERANCE = pd.Timedelta(minutes=2)
+# Fenêtre du z-score en observations (la fenêtre commune ne dure qu'une heure environ par séance)
+DEFAULT_WINDOW = 240
+MIN_OBSERVATIONS = 30
+
+SPREAD_COLUMNS = ['pair', 'tase', 'us', 'timestamp', 'tase_ils', 'us_usd', 'usd_ils', 'us_ils', 'premium_bp', 'zscore']
+
+def dual_listed_pairs(master=None):
+    """Paires (symbole TASE, symbole US) déclarées dans le référentiel"""
+    master = master or get_symbol_master()
+    pairs = []
+    for symbol in master.symbols:
+        record = master.lookup(symbol)
+        if record['exchange'] == 'TASE' and record['dual_listing']:
+            pairs.append((symbol, record['dual_listing']))
+    return pairs
+
+def pair_name(tase, us):
+    return f"{tase}/{us}"
+
+def spread_symbol(tase, us, metric='bp'):
+    """Symbole synthétique d'alerte sur l'écart d'une paire"""
+    return f"{pair_name(tase, us)}:{metric}"
+
+def parse_spread_symbol(symbol):
+    """(TASE, US, mesure) d'un symbole d'écart, None pour un symbole ordinaire"""
+    pair, sep, metric = symbol.rpartition(':')
+    if not sep or metric not in SPREAD_METRICS or '/' not in pair:
+        return None
+    tase, us = pair.split('/', 1)
+    return tase, us, metric
+
+def _closes(bars):
+    """Clôtures (float64, index UTC trié) d'un historique, ou None"""
+    if bars is None or bars.empty:
+        return None
+    index = pd.DatetimeIndex(bars.index)
+    index = index.tz_localize('UTC') if index.tz is None else index.tz_convert('UTC')
+    closes = pd.Series(bars['Close'].to_numpy(dtype=float), index=index.as_unit('ns'))
+    closes = closes[closes > 0]
+    return closes[~closes.index.duplicated(keep='last')].sort_index()
+
+def _long(series_by_pair, column):
+    """Un seul tableau (horodatage, paire, valeur) trié par horodatage, pour merge_asof"""
+    frames = [
+        pd.DataFrame({'timestamp': s.index, 'pair': pair, column: s.to_numpy()})
+        for pair, s in series_by_pair.items() if s is not None and len(s)
+    ]
+    if not frames:
+        return pd.DataFrame({'timestamp': pd.DatetimeIndex([], tz='UTC').as_unit('ns'), 'pair': [], column: []})
+    return pd.concat(frames, ignore_index=True).sort_values('timestamp', kind='stable', ignore_index=True)
+
+def compute_spreads(bars, pairs, tolerance=DEFAULT_TOLERANCE, window=DEFAULT_WINDOW):
+    """Primes alignées de toutes les paires
+
+    bars : symbole -> barres (colonne Close, en devise), taux USD/ILS compris (FX_SYMBOL).
+    Renvoie un tableau long (une ligne par paire et par barre TASE de la fenêtre commune).
+    """
+    fx = _closes(bars.get(FX_SYMBOL))
+    names = {pair_name(tase, us): (tase, us) for tase, us in pairs}
+    tase = _long({name: _closes(bars.get(t)) for name, (t, _) in names.items()}, 'tase_ils')
+    us = _long({name: _closes(bars.get(u)) for name, (_, u) in names.items()}, 'us_usd')
+    if fx is None or tase.empty or us.empty:
+        return pd.DataFrame(columns=SPREAD_COLUMNS)
+
+    # Dernière barre US de la même paire, puis dernier taux, au plus tolerance avant chaque barre TASE
+    merged = pd.merge_asof(tase, us, on='timestamp', by='pair', tolerance=tolerance, direction='backward')
+    merged = pd.merge_asof(
+        merged, pd.DataFrame({'timestamp': fx.index, 'usd_ils': fx.to_numpy()}),
+        on='timestamp', tolerance=tolerance, direction='backward'
+    )
+    merged = merged.dropna(subset=['us_usd', 'usd_ils'])
+    merged = merged.sort_values(['pair', 'timestamp'], kind='stable', ignore_index=True)
+
+    merged['us_ils'] = merged['us_usd'] * merged['usd_ils']
+    merged['premium_bp'] = (merged['tase_ils'] / merged['us_ils'] - 1.0) * 1e4
+
+    # Moyenne et écart-type glissants par paire (données triées par paire : un seul calcul groupé)
+    rolling = merged.groupby('pair', sort=False)['premium_bp'].rolling(window, min_periods=MIN_OBSERVATIONS)
+    mean = rolling.mean().to_numpy()
+    std = rolling.std().to_numpy()
+    with np.errstate(divide='ignore', invalid='ignore'):
+        merged['zscore'] = np.where(std > 0, (merged['premium_bp'].to_numpy() - mean) / std, np.nan)
+
+    pair_values = merged['pair'].map(names)
+    merged['tase'] = pair_values.str[0]
+    merged['us'] = pair_values.str[1]
+    return merged[SPREAD_COLUMNS]
+
+def latest_spreads(spreads):
+    """Dernière observation de chaque paire (index : nom de la paire)"""
+    if spreads.empty:
+        return spreads.set_index('pair')
+    return spreads.groupby('pair', sort=False).tail(1).set_index('pair')
+
+def load_spreads(load, pairs, period=SPREAD_PERIOD, interval=SPREAD_INTERVAL, **kwargs):
+    """Primes des paires à partir de load(symbole, période, intervalle) (cache d'historiques)"""
+    symbols = sorted({s for pair in pairs for s in pair} | {FX_SYMBOL})
+    return compute_spreads({s: load(s, period, interval) for s in symbols}, pairs, **kwargs)
+
+def spread_quotes(load, symbols, **kwargs):
+    """Cotations des symboles d'écart (price = dernière prime en pb ou dernier z-score), pour les alertes"""
+    quotes = empty_quotes(symbols)
+    parsed = {symbol: parse_spread_symbol(symbol) for symbol in symbols}
+    pairs = sorted({(p[0], p[1]) for p in parsed.values() if p is not None})
+    if not pairs:
+        return quotes
+    latest = latest_spreads(load_spreads(load, pairs, **kwargs))
+    for symbol, p in parsed.items():
+        name = pair_name(p[0], p[1]) if p is not None else None
+        if name in latest.index:
+            quotes.loc[symbol, 'price'] = latest.at[name, SPREAD_METRICS[p[2]]]
+    return quotes
+
+def benchmark(n_pairs=40, days=5, seed=0):
+    """Temps de calcul des primes pour n_pairs paires en barres 1 minute"""
+    import time
+
+    rng = np.random.default_rng(seed)
+    minutes = pd.date_range(end=pd.Timestamp.now(tz='UTC').floor('D'), periods=days * 24 * 60, freq='1min')
+    tase_session = minutes[(minutes.hour >= 7) & (minutes.hour < 15)]
+    us_session = minutes[(minutes.hour >= 13) & (minutes.hour < 20)]
+    fx = 3.7 * np.exp(np.cumsum(rng.normal(0, 1e-4, len(minutes))))
+    bars = {FX_SYMBOL: pd.DataFrame({'Close': fx}, index=minutes)}
+    pairs = []
+    for i in range(n_pairs):
+        tase, us = f"SYM{i}.TA", f"SYM{i}"
+        usd = 20 * np.exp(np.cumsum(rng.normal(0, 5e-4, len(minutes))))
+        ils = usd * fx * (1 + rng.normal(0, 2e-3, len(minutes)))
+        bars[us] = pd.DataFrame({'Close': usd}, index=minutes)[minutes.isin(us_session)]
+        bars[tase] = pd.DataFrame({'Close': ils}, index=minutes)[minutes.isin(tase_session)]
+        pairs.append((tase, us))
+
+    start = time.perf_counter()
+    spreads = compute_spreads(bars, pairs)
+    elapsed = time.perf_counter() - start
+    return {
+        'pairs': n_pairs,
+        'input_bars': sum(len(b) for b in bars.values()),
+        'observations': len(spreads),
+        'ms': elapsed * 1000,
+    }
@@ -0,0 +1,106 @@
+"""Barres OHLCV compactes, servies sans copie depuis un cache de ressources
+
+Prix en float32, volume entier, uniquement les colonnes affichées et un
+index horodaté partagé. Les tableaux sont en lecture seule : une vue peut
+être remise à chaque session sans désérialisation ni copie des données.
+"""
+import argparse
+import pickle
+import time
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+BAR_COLUMNS = PRICE_COLUMNS + ['Volume']
+
+def compact_bars(hist, tz=None):
+    """Convertit un historique yfinance en barres compactes (optionnellement converties dans tz)"""
+    if hist is None:
+        return None
+    index = hist.index
+    if tz is not None and isinstance(index, pd.DatetimeIndex):
+        if index.tz is None:
+            index = index.tz_localize('UTC')
+        index = index.tz_convert(tz)
+
+    # Un bloc float32 (4 x n, colonnes contiguës) et un tableau int64 pour le volume
+    prices = np.ascontiguousarray(hist.reindex(columns=PRICE_COLUMNS).to_numpy(dtype=np.float32).T)
+    if 'Volume' in hist:
+        volume = hist['Volume'].fillna(0).to_numpy(dtype=np.int64)
+    else:
+        volume = np.zeros(len(hist), dtype=np.int64)
+    prices.flags.writeable = False
+    volume.flags.writeable = False
+
+    bars = pd.DataFrame(prices.T, index=index, columns=PRICE_COLUMNS, copy=False)
+    bars['Volume'] = pd.Series(volume, index=index, copy=False)
+    return bars
+
+def bars_view(bars):
+    """Vue sur des barres en cache : nouvel objet (index réassignable), mêmes tableaux"""
+    return None if bars is None else bars.copy(deep=False)
+
+def bars_nbytes(bars):
+    """Mémoire occupée par des barres, index compris (hors table de hachage de l'index)"""
+    return int(bars.memory_usage(index=False, deep=True).sum() + bars.index.nbytes)
+
+def _yfinance_like(n_bars, rng):
+    """Historique synthétique au format yfinance (float64, colonnes inutilisées comprises)"""
+    index = pd.date_range(end='2026-10-15 16:00', periods=n_bars, freq='min', tz='Asia/Jerusalem', name='Datetime')
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.001, n_bars)))
+    return pd.DataFrame({
+        'Open': close * 0.999,
+        'High': close * 1.001,
+        'Low': close * 0.998,
+        'Close': close,
+        'Volume': rng.integers(0, 100_000, n_bars).astype(float),
+        'Dividends': 0.0,
+        'Stock Splits': 0.0,
+    }, index=index)
+
+def benchmark(n_pairs=500, n_bars=1000, seed=0):
+    """Mémoire par paire (symbole, intervalle) et latence d'un accès au cache, avant / après"""
+    rng = np.random.default_rng(seed)
+    raw = [_yfinance_like(n_bars, rng) for _ in range(n_pairs)]
+    compact = [compact_bars(hist) for hist in raw]
+
+    # st.cache_data conserve des octets sérialisés et les désérialise à chaque accès
+    pickled = [pickle.dumps(hist) for hist in raw]
+    start = time.perf_counter()
+    for blob in pickled:
+        pickle.loads(blob)
+    pickle_hit = (time.perf_counter() - start) / n_pairs
+
+    start = time.perf_counter()
+    for bars in compact:
+        bars_view(bars)
+    view_hit = (time.perf_counter() - start) / n_pairs
+
+    raw_bytes = sum(bars_nbytes(hist) for hist in raw) / n_pairs
+    compact_bytes = sum(bars_nbytes(bars) for bars in compact) / n_pairs
+    return {
+        'pairs': n_pairs,
+        'bars': n_bars,
+        'raw_kb': raw_bytes / 1024,
+        'compact_kb': compact_bytes / 1024,
+        'pickled_kb': sum(len(blob) for blob in pickled) / n_pairs / 1024,
+        'pickle_hit_us': pickle_hit * 1e6,
+        'view_hit_us': view_hit * 1e6,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mesure mémoire / latence du cache de barres")
+    parser.add_argument('--pairs', type=int, default=500, help="Paires (symbole, intervalle) en cache")
+    parser.add_argument('--bars', type=int, default=1000, help="Barres par paire")
+    args = parser.parse_args(argv)
+
+    result = benchmark(args.pairs, args.bars)
+    print(
+        "{pairs} paires x {bars} barres\n"
+        "  mémoire par paire : {raw_kb:.1f} Ko (yfinance) -> {compact_kb:.1f} Ko (compact)\n"
+        "  accès au cache    : {pickle_hit_us:.0f} µs (désérialisation {pickled_kb:.1f} Ko) -> {view_hit_us:.0f} µs (vue)".format(**result)
+    )
+
+if __name__ == '__main__':
+    main()
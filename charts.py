@@ -0,0 +1,301 @@
+"""Figures Plotly mémorisées par session et prolongées des nouvelles barres
+
+Streamlit renvoie la spécification complète d'un graphique à chaque rerun,
+mais un message identique octet pour octet à un message déjà reçu par le
+navigateur est remplacé par une référence à son empreinte. Une figure
+resservie telle quelle tant que les barres n'ont pas changé coûte donc
+quelques octets au lieu de plusieurs centaines de Ko, sans reconstruction.
+
+Quand des barres s'ajoutent (ou que la barre en cours change), seuls les
+nouveaux points sont calculés et ajoutés aux traces existantes, à la manière
+d'extendTraces, après vérification que les barres déjà tracées sont
+inchangées; sinon la figure est reconstruite. Streamlit n'offre pas de mise à
+jour partielle côté navigateur : une figure modifiée est renvoyée entière.
+"""
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from market_calendar import session_hours
+from symbol_master import get_symbol_master
+
+# Chandeliers en intraday; zone de séance TASE sur les intervalles courts
+CANDLE_INTERVALS = ("1m", "2m", "5m", "15m", "30m", "1h")
+SESSION_INTERVALS = ("1m", "5m", "15m", "30m", "1h")
+
+MA_WINDOWS = {20: 'orange', 50: 'purple'}
+
+def bars_version(bars):
+    """Version des barres : bornes, longueur et contenu de la dernière barre (barre en cours)"""
+    if bars.empty:
+        return (0,)
+    last = bars.iloc[-1:].to_numpy(dtype=float).tobytes()
+    return (len(bars), bars.index[0], bars.index[-1], last)
+
+# ----------------------------------------------------------------------
+# Graphique principal (prix, moyennes mobiles, volume)
+# ----------------------------------------------------------------------
+def price_traces(bars, interval, start=0):
+    """Colonnes des traces pour bars[start:] : {nom: (colonnes, points d'amorçage)}
+
+    Les moyennes mobiles des nouveaux points sont calculées sur les seules
+    barres nécessaires (fenêtre précédant start).
+    """
+    x = bars.index[start:]
+    close = bars['Close'].to_numpy(dtype=float)
+    traces = {}
+    if interval in CANDLE_INTERVALS:
+        traces['Prix'] = ({
+            'x': x,
+            'open': bars['Open'].to_numpy()[start:],
+            'high': bars['High'].to_numpy()[start:],
+            'low': bars['Low'].to_numpy()[start:],
+            'close': close[start:],
+        }, 0)
+    else:
+        traces['Prix'] = ({'x': x, 'y': close[start:]}, 0)
+
+    for window in MA_WINDOWS:
+        if len(bars) >= window:
+            lookback = max(start - window + 1, 0)
+            windows = np.lib.stride_tricks.sliding_window_view(close[lookback:], window)
+            mean = np.full(len(bars) - lookback, np.nan)
+            mean[window - 1:] = windows.mean(axis=1)
+            traces[f'MA {window}'] = ({'x': x, 'y': mean[start - lookback:]}, window - 1)
+
+    traces['Volume'] = ({'x': x, 'y': bars['Volume'].to_numpy()[start:]}, 0)
+    return traces
+
+def _price_trace(name, columns):
+    if name == 'Prix' and 'open' in columns:
+        return go.Candlestick(**columns, name=name, increasing_line_color='#00cc96', decreasing_line_color='#ef553b')
+    if name == 'Prix':
+        return go.Scatter(**columns, mode='lines', name=name, line=dict(color='#0038b8', width=2))
+    if name == 'Volume':
+        return go.Bar(**columns, name=name, yaxis='y2', marker=dict(color='lightgray', opacity=0.3))
+    window = int(name.split()[1])
+    return go.Scatter(**columns, mode='lines', name=name, line=dict(color=MA_WINDOWS[window], width=1, dash='dash'))
+
+def session_day(bars, interval):
+    """Jour de la zone de séance TASE affichée (None hors intraday) : la mise en page en dépend"""
+    if interval not in SESSION_INTERVALS or bars.empty:
+        return None
+    return bars.index[-1].date()
+
+def price_figure(bars, symbol, period, interval, currency_sign):
+    """Graphique principal : prix (chandeliers en intraday), moyennes mobiles 20/50, volume"""
+    fig = go.Figure()
+    for name, (columns, _) in price_traces(bars, interval).items():
+        fig.add_trace(_price_trace(name, columns))
+
+    day = session_day(bars, interval)
+    hours = session_hours('TASE', day) if day is not None else None
+    if hours is not None:
+        # Zone des heures de séance TASE (calendrier des séances), dans le fuseau des barres
+        tase_open, tase_close = (t.astimezone(bars.index.tz) for t in hours)
+        fig.add_vrect(
+            x0=tase_open,
+            x1=tase_close,
+            fillcolor="blue",
+            opacity=0.1,
+            layer="below",
+            line_width=0,
+            annotation_text="TASE Session"
+        )
+
+    fig.update_layout(
+        title=f"{symbol} - {period} (שעות UTC+2 / heures UTC+2)",
+        yaxis_title=f"מחיר / Prix ({currency_sign})",
+        yaxis2=dict(
+            title="מחזור / Volume",
+            overlaying='y',
+            side='right',
+            showgrid=False
+        ),
+        xaxis_title="תאריך (UTC+2) / Date",
+        height=600,
+        hovermode='x unified',
+        template='plotly_white'
+    )
+    return fig
+
+# ----------------------------------------------------------------------
+# Graphique d'un indice
+# ----------------------------------------------------------------------
+def index_traces(bars, start=0):
+    return {'Close': ({'x': bars.index[start:], 'y': bars['Close'].to_numpy(dtype=float)[start:]}, 0)}
+
+def index_figure(bars, name, period):
+    """Courbe de clôture d'un indice"""
+    columns, _ = index_traces(bars)['Close']
+    fig = go.Figure()
+    fig.add_trace(go.Scatter(**columns, mode='lines', name=name, line=dict(color='#0038b8', width=2)))
+    fig.update_layout(
+        title=f"התפתחות / Évolution - {period} (שעות UTC+2 / heures UTC+2)",
+        xaxis_title="תאריך (UTC+2) / Date",
+        yaxis_title="נקודות / Points",
+        height=400,
+        template='plotly_white'
+    )
+    return fig
+
+# ----------------------------------------------------------------------
+# Carte du marché
+# ----------------------------------------------------------------------
+# Variation (%) saturant l'échelle de couleur
+MAP_COLOR_RANGE = 3.0
+MAP_GROUPS = {'TASE': 'תל אביב / TASE', 'NASDAQ': 'NASDAQ', 'NYSE': 'NYSE', 'INDEX': 'מדדים / Indices'}
+MAP_SIZES = {'value': "Valeur échangée ($)", 'volume': "Volume"}
+
+def market_map_frame(quotes, fx_rate, size_by='value'):
+    """Tuiles de la carte à partir d'un instantané de cotations : groupe, taille, variation, libellés"""
+    quotes = quotes[quotes['price'].notna() & (quotes['price'] > 0)]
+    symbols = quotes.index.to_numpy(dtype=str)
+    fields = get_symbol_master().columns(symbols)
+    price = quotes['price'].to_numpy(dtype=float)
+    volume = quotes['volume'].to_numpy(dtype=float)
+
+    # Valeur échangée en dollars (cours déjà en devise) : shekels -> dollars
+    rate = np.where(fields['currency'] == 'ILS', fx_rate, 1.0)
+    size = price / rate * volume if size_by == 'value' else volume
+    # Tuile minimale pour les symboles sans volume (encore visibles, sans fausser la carte)
+    positive = size[np.isfinite(size) & (size > 0)]
+    size = np.where(np.isfinite(size) & (size > 0), size, positive.min() * 0.5 if len(positive) else 1.0)
+
+    groups = np.vectorize(lambda e: MAP_GROUPS.get(e, 'US/Global'), otypes=[object])(fields['exchange']) \
+        if len(symbols) else np.zeros(0, dtype=object)
+    return pd.DataFrame({
+        'symbol': symbols,
+        'name': np.where(fields['name_en'] != '', fields['name_en'], symbols),
+        'group': groups,
+        'size': size,
+        'price': price,
+        'change_pct': quotes['change_pct'].to_numpy(dtype=float),
+        'currency': fields['currency'],
+    })
+
+def market_map_figure(tiles, size_by='value', height=650):
+    """Carte du marché en une seule trace treemap : surface selon la taille, couleur selon la variation"""
+    groups = tiles.groupby('group', sort=False)
+    group_size = groups['size'].sum()
+    # Variation d'un groupe pondérée par la taille des tuiles
+    group_change = (tiles['change_pct'] * tiles['size']).groupby(tiles['group'], sort=False).sum() / group_size
+
+    signs = np.where(tiles['currency'].to_numpy() == 'ILS', '₪', '$')
+    leaf_text = np.char.add(signs.astype(str), np.char.mod('%.2f', tiles['price'].to_numpy()))
+    ids = np.concatenate([group_size.index.to_numpy(dtype=object), tiles['symbol'].to_numpy(dtype=object)])
+    fig = go.Figure(go.Treemap(
+        ids=ids,
+        labels=np.concatenate([group_size.index.to_numpy(dtype=object), tiles['symbol'].to_numpy(dtype=object)]),
+        parents=np.concatenate([np.full(len(group_size), ''), tiles['group'].to_numpy(dtype=object)]),
+        values=np.concatenate([group_size.to_numpy(), tiles['size'].to_numpy()]),
+        branchvalues='total',
+        customdata=np.column_stack([
+            np.concatenate([group_size.index.to_numpy(dtype=object), tiles['name'].to_numpy(dtype=object)]),
+            np.concatenate([np.full(len(group_size), ''), leaf_text]),
+            np.concatenate([group_change.to_numpy(), tiles['change_pct'].to_numpy()]),
+        ]),
+        marker=dict(
+            colors=np.concatenate([group_change.to_numpy(), tiles['change_pct'].to_numpy()]),
+            colorscale=[[0, '#ef553b'], [0.5, '#f0f0f0'], [1, '#00cc96']],
+            cmin=-MAP_COLOR_RANGE, cmid=0, cmax=MAP_COLOR_RANGE,
+            colorbar=dict(title='%', ticksuffix='%'),
+        ),
+        texttemplate="<b>%{label}</b><br>%{customdata[2]:+.2f}%",
+        hovertemplate="<b>%{label}</b> %{customdata[0]}<br>%{customdata[1]}<br>%{customdata[2]:+.2f}%"
+                      f"<br>{MAP_SIZES[size_by]} : %{{value:,.0f}}<extra></extra>",
+        tiling=dict(pad=1),
+    ))
+    fig.update_layout(height=height, margin=dict(t=10, l=0, r=0, b=0))
+    return fig
+
+# ----------------------------------------------------------------------
+# Cache de figures d'une session
+# ----------------------------------------------------------------------
+class FigureCache:
+    """Figures d'une session par vue : resservies, prolongées des nouvelles barres, ou reconstruites
+
+    Une figure n'est modifiée que par sa session (pas de partage entre threads de script).
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self.stats = {'hits': 0, 'extends': 0, 'builds': 0}
+
+    def _store(self, key, entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry['figure']
+
+    def get(self, key, version, build):
+        """Figure mémorisée tant que version est inchangée, sinon build()"""
+        entry = self._entries.get(key)
+        if entry is not None and entry['version'] == version:
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry['figure']
+        self.stats['builds'] += 1
+        return self._store(key, {'version': version, 'figure': build()})
+
+    def get_bars(self, key, bars, build, traces, layout_version=None):
+        """Figure de barres : build(bars) à la première demande, puis prolongée via traces(bars, start)
+
+        layout_version : ce dont dépend la mise en page hors données (reconstruction s'il change).
+        """
+        version = (bars_version(bars), layout_version)
+        entry = self._entries.get(key)
+        if entry is not None and entry['version'] == version:
+            self._entries.move_to_end(key)
+            self.stats['hits'] += 1
+            return entry['figure']
+        if entry is not None and entry['version'][1] == layout_version and self._extend(entry, bars, traces):
+            entry['version'] = version
+            self._entries.move_to_end(key)
+            self.stats['extends'] += 1
+            return entry['figure']
+        self.stats['builds'] += 1
+        return self._store(key, {
+            'version': version,
+            'figure': build(bars),
+            'index': bars.index,
+            'close': bars['Close'].to_numpy(dtype=float),
+            'traces': list(traces(bars, len(bars) - 1)) if len(bars) else [],
+        })
+
+    @staticmethod
+    def _extend(entry, bars, traces):
+        """Ajoute aux traces les barres postérieures à celles déjà tracées; False si impossible"""
+        if bars.empty:
+            return False
+        old_index, old_close = entry['index'], entry['close']
+        # Barres conservées : celles déjà tracées encore dans la fenêtre, sauf la dernière (barre en cours)
+        drop = int(old_index.searchsorted(bars.index[0]))
+        keep = len(old_index) - 1 - drop
+        if keep <= 0 or keep >= len(bars):
+            return False
+        close = bars['Close'].to_numpy(dtype=float)
+        if not (old_index[drop:drop + keep].equals(bars.index[:keep])
+                and np.array_equal(old_close[drop:drop + keep], close[:keep], equal_nan=True)):
+            return False
+
+        tail = traces(bars, keep)
+        if list(tail) != entry['traces']:
+            # Trace apparue ou disparue (moyenne mobile selon le nombre de barres)
+            return False
+        figure = entry['figure']
+        with figure.batch_update():
+            for trace, (columns, warmup) in zip(figure.data, tail.values()):
+                for column, values in columns.items():
+                    merged = np.concatenate([np.asarray(trace[column])[drop:drop + keep], np.asarray(values)])
+                    if drop and warmup and column != 'x':
+                        # Début de fenêtre décalé : mêmes points d'amorçage vides qu'une figure reconstruite
+                        merged[:warmup] = np.nan
+                    trace[column] = merged
+        entry['index'] = bars.index
+        entry['close'] = close
+        return True
@@ -0,0 +1,132 @@
+"""Opérations sur titres (dividendes, divisions) et ajustement des cours à la lecture
+
+Les historiques sont conservés non ajustés. Les dividendes et divisions lus
+dans les colonnes Dividends / Stock Splits de yfinance alimentent une table
+par symbole, dont on précalcule les facteurs cumulés : pour une barre à
+l'instant t, le facteur est le produit des facteurs des opérations dont la
+date d'effet est postérieure à t. Une nouvelle division ne modifie que cette
+table; les barres déjà en cache sont ajustées à la lecture, sans nouveau
+téléchargement.
+"""
+import threading
+
+import numpy as np
+import pandas as pd
+
+PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close']
+
+ACTION_COLUMNS = ['dividend', 'split', 'dividend_factor']
+
+def _utc_ns(index):
+    """Horodatages en nanosecondes UTC (index sans fuseau supposé en UTC)"""
+    index = pd.DatetimeIndex(index)
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    return index.tz_convert('UTC').as_unit('ns').asi8
+
+def extract_actions(hist):
+    """Opérations présentes dans un historique yfinance (date d'effet = début de séance locale)
+
+    Le facteur de dividende est celui de yfinance : 1 - dividende / clôture
+    précédant la date de détachement (rapport indépendant des divisions).
+    """
+    if hist is None or hist.empty:
+        return pd.DataFrame(columns=ACTION_COLUMNS, index=pd.DatetimeIndex([], tz='UTC'), dtype=float)
+    dividends = hist['Dividends'].to_numpy(dtype=float) if 'Dividends' in hist else np.zeros(len(hist))
+    splits = hist['Stock Splits'].to_numpy(dtype=float) if 'Stock Splits' in hist else np.zeros(len(hist))
+    rows = np.flatnonzero((dividends > 0) | (splits > 0))
+
+    close = hist['Close'].to_numpy(dtype=float)
+    previous = np.where(rows > 0, close[np.maximum(rows - 1, 0)], close[rows] + dividends[rows])
+    with np.errstate(divide='ignore', invalid='ignore'):
+        factor = np.where(dividends[rows] > 0, 1.0 - dividends[rows] / previous, 1.0)
+    factor = np.where(np.isfinite(factor) & (factor > 0), factor, 1.0)
+
+    index = pd.DatetimeIndex(hist.index[rows])
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    actions = pd.DataFrame({
+        'dividend': dividends[rows],
+        'split': np.where(splits[rows] > 0, splits[rows], 1.0),
+        'dividend_factor': factor,
+    }, index=index.normalize().tz_convert('UTC'))
+    return actions.groupby(level=0).agg({'dividend': 'sum', 'split': 'prod', 'dividend_factor': 'prod'})
+
+class CorporateActions:
+    """Table des opérations par symbole et facteurs cumulés, mis à jour à chaque téléchargement"""
+
+    def __init__(self):
+        self._actions = {}
+        # symbole -> (dates ns triées, produit des divisions après chaque date, idem dividendes)
+        self._cumulative = {}
+        self._lock = threading.Lock()
+        self.updates = 0
+
+    def get(self, symbol):
+        """Opérations connues d'un symbole (date d'effet UTC -> dividende tel que reçu, division, facteur)"""
+        with self._lock:
+            actions = self._actions.get(symbol)
+        return actions if actions is not None else extract_actions(None)
+
+    def record(self, symbol, hist):
+        """Intègre les opérations d'un historique téléchargé; renvoie True si la table a changé"""
+        new = extract_actions(hist)
+        if new.empty:
+            return False
+        with self._lock:
+            current = self._actions.get(symbol)
+            if current is not None:
+                merged = pd.concat([current, new])
+                merged = merged[~merged.index.duplicated(keep='last')].sort_index()
+                if merged.equals(current):
+                    return False
+            else:
+                merged = new
+            self._actions[symbol] = merged
+
+            # Produits cumulés depuis la fin : facteur de toute barre antérieure à chaque opération
+            splits = np.r_[np.cumprod(merged['split'].to_numpy()[::-1])[::-1], 1.0]
+            dividends = np.r_[np.cumprod(merged['dividend_factor'].to_numpy()[::-1])[::-1], 1.0]
+            self._cumulative[symbol] = (_utc_ns(merged.index), splits, dividends)
+            self.updates += 1
+        return True
+
+    def factors(self, symbol, index):
+        """(division cumulée, facteur de dividende cumulé) pour chaque horodatage, ou None si aucun effet"""
+        with self._lock:
+            cumulative = self._cumulative.get(symbol)
+        if cumulative is None or len(index) == 0:
+            return None
+        dates, splits, dividends = cumulative
+        # Opérations dont la date d'effet est postérieure à la barre
+        position = np.searchsorted(dates, _utc_ns(index), side='right')
+        if position.min() >= len(dates):
+            return None
+        return splits[position], dividends[position]
+
+    def unadjust(self, symbol, hist):
+        """Cours yfinance (ajustés des divisions connues) -> cours réellement cotés"""
+        factors = self.factors(symbol, hist.index)
+        if factors is None:
+            return hist
+        split, _ = factors
+        columns = [c for c in PRICE_COLUMNS if c in hist]
+        raw = hist.copy()
+        raw[columns] = hist[columns].to_numpy(dtype=float) * split[:, None]
+        if 'Volume' in hist:
+            raw['Volume'] = np.round(hist['Volume'].to_numpy(dtype=float) / split)
+        return raw
+
+    def adjust(self, symbol, bars, dividends=True):
+        """Cours non ajustés -> ajustés des divisions (et des dividendes), vectorisé"""
+        factors = self.factors(symbol, bars.index)
+        if factors is None:
+            return bars
+        split, dividend = factors
+        price_factor = (dividend / split) if dividends else (1.0 / split)
+        columns = [c for c in PRICE_COLUMNS if c in bars]
+        prices = bars[columns].to_numpy(dtype=float) * price_factor[:, None]
+        adjusted = pd.DataFrame(prices.astype(bars[columns[0]].dtype), index=bars.index, columns=columns)
+        if 'Volume' in bars:
+            adjusted['Volume'] = np.round(bars['Volume'].to_numpy(dtype=float) * split).astype(bars['Volume'].dtype)
+        return adjusted
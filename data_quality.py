@@ -0,0 +1,324 @@
+"""Contrôle qualité des barres entre téléchargement et cache
+
+Yahoo renvoie par intermittence des horodatages en double, des barres
+« fantômes » à volume nul, des clôtures NaN et des trous. Chaque
+téléchargement passe par cette étape avant d'entrer dans le cache
+d'historiques; les données sont réparées une fois, à l'ingestion, au lieu
+d'être corrigées (ou non) par chaque vue.
+
+Contrôles, vectorisés sur toute la série :
+    - doublons : un seul enregistrement par horodatage (le dernier reçu);
+    - barres invalides : clôture NaN ou nulle écartée, Open/High/Low
+      manquants remplacés par la clôture, High/Low rendus cohérents;
+    - barres hors séance : volume nul un jour sans séance (week-end, férié);
+    - barres figées : volume nul, OHLC identiques et clôture inchangée
+      (symboles dont les barres ont habituellement du volume);
+    - valeurs aberrantes : saut suivi d'un retour immédiat au niveau
+      précédent, au-delà de OUTLIER_SIGMAS écarts robustes;
+    - barres manquantes : créneaux attendus d'après le calendrier des
+      séances (jours de séance, heures d'ouverture) absents des données.
+
+Seules les plages manquantes (les plus longues, au plus MAX_REFETCH par
+téléchargement) sont redemandées à la source. Les compteurs sont cumulés
+par (symbole, intervalle) dans QualityLog.
+
+Usage :
+    python data_quality.py --symbols TEVA.TA NICE --period 1y --interval 1d
+    python data_quality.py --benchmark
+"""
+import argparse
+import logging
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+
+from market_calendar import CONTINUOUS_OPEN, TIMEZONES, session_close, session_days, session_for_symbol
+from resample import INTERVAL_MINUTES
+
+# Saut minimal (log-rendement) et nombre d'écarts robustes pour une valeur aberrante
+OUTLIER_MIN_MOVE = 0.05
+OUTLIER_SIGMAS = 8.0
+# Retour au niveau précédent : le saut suivant annule au moins 75 % du premier
+OUTLIER_REVERSION = 0.25
+# Part des barres avec volume au-delà de laquelle un volume nul est suspect
+VOLUME_SHARE = 0.5
+# Trou intraday minimal redemandé (les valeurs peu liquides sautent des minutes sans échange)
+MIN_INTRADAY_GAP = pd.Timedelta(minutes=30)
+MAX_REFETCH = 3
+
+COUNTERS = ['received', 'duplicates', 'invalid', 'off_session', 'stale', 'outliers',
+            'expected', 'missing', 'refetched', 'recovered']
+
+logger = logging.getLogger('data_quality')
+
+# ----------------------------------------------------------------------
+# Créneaux attendus
+# ----------------------------------------------------------------------
+def _local(index, session):
+    """Horodatages dans le fuseau de la place (index sans fuseau supposé en UTC)"""
+    index = pd.DatetimeIndex(index)
+    return (index.tz_localize('UTC') if index.tz is None else index).tz_convert(TIMEZONES[session])
+
+def expected_slots(session, interval, first, last):
+    """Créneaux attendus [début, fin) en ns UTC entre deux instants, selon le calendrier de la place"""
+    tz = TIMEZONES[session]
+    first, last = _local([first], session)[0], _local([last], session)[0]
+    days = session_days(session, first.tz_localize(None).normalize(), last.tz_localize(None).normalize())
+    if interval not in INTERVAL_MINUTES:
+        starts = days.tz_localize(tz, nonexistent='shift_forward')
+        ends = (days + pd.Timedelta(days=1)).tz_localize(tz, nonexistent='shift_forward')
+    else:
+        step = pd.Timedelta(minutes=INTERVAL_MINUTES[interval])
+        open_time = CONTINUOUS_OPEN[session]
+        closes = pd.to_timedelta([session_close(session, d) or open_time for d in range(7)]).to_numpy()
+        opens = days + open_time
+        counts = np.maximum(((days + closes[days.weekday] - opens) // step).to_numpy(), 0).astype(np.int64)
+        # Créneaux de toutes les séances à la fois : ouverture + k pas, k < nombre de créneaux du jour
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        local = np.repeat(opens.asi8, counts) + offsets * step.value
+        starts = pd.DatetimeIndex(local).tz_localize(tz, ambiguous='NaT', nonexistent='NaT')
+        ends = starts + step
+    starts, ends = starts.tz_convert('UTC').as_unit('ns').asi8, ends.tz_convert('UTC').as_unit('ns').asi8
+    keep = (ends > first.value) & (starts <= last.value) & (starts != pd.NaT.value)
+    return starts[keep], ends[keep]
+
+def missing_ranges(index, session, interval):
+    """(créneaux attendus, créneaux manquants, plages manquantes [(début, fin)] des plus longues aux plus courtes)
+
+    Seul l'intervalle couvert par les barres reçues est contrôlé : les barres
+    les plus récentes peuvent être simplement en retard chez le fournisseur.
+    """
+    if len(index) == 0 or (interval not in INTERVAL_MINUTES and interval != '1d'):
+        return 0, 0, []
+    times = np.sort(_local(index, session).tz_convert('UTC').as_unit('ns').asi8)
+    starts, ends = expected_slots(session, interval, times[0], times[-1])
+    if not len(starts):
+        return 0, 0, []
+
+    # Un créneau est couvert si une barre débute dans [début, fin)
+    position = np.searchsorted(times, starts)
+    covered = times[np.minimum(position, len(times) - 1)]
+    missing = (position >= len(times)) | (covered >= ends)
+
+    # Séquences de créneaux manquants consécutifs
+    edges = np.diff(np.concatenate([[0], missing.astype(np.int8), [0]]))
+    run_starts, run_ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    lengths = run_ends - run_starts
+    if interval in INTERVAL_MINUTES:
+        min_bars = max(1, -(-MIN_INTRADAY_GAP // pd.Timedelta(minutes=INTERVAL_MINUTES[interval])))
+    else:
+        min_bars = 1
+    order = np.argsort(-lengths, kind='stable')
+    ranges = [
+        (pd.Timestamp(starts[run_starts[i]], tz='UTC'), pd.Timestamp(ends[run_ends[i] - 1], tz='UTC'))
+        for i in order if lengths[i] >= min_bars
+    ]
+    return len(starts), int(missing.sum()), ranges
+
+# ----------------------------------------------------------------------
+# Nettoyage
+# ----------------------------------------------------------------------
+def spike_mask(close):
+    """Barres dont la clôture saute puis revient aussitôt au niveau précédent"""
+    mask = np.zeros(len(close), dtype=bool)
+    if len(close) < 4:
+        return mask
+    returns = np.diff(np.log(close))
+    scale = 1.4826 * np.median(np.abs(returns - np.median(returns)))
+    threshold = max(OUTLIER_SIGMAS * scale, OUTLIER_MIN_MOVE)
+    jump, back = returns[:-1], returns[1:]
+    mask[1:-1] = (
+        (np.abs(jump) > threshold) & (np.abs(back) > threshold)
+        & (np.sign(jump) != np.sign(back)) & (np.abs(jump + back) < OUTLIER_REVERSION * np.abs(jump))
+    )
+    return mask
+
+def clean_bars(hist, session, interval):
+    """Barres validées, compteurs et index des barres reçues exploitables pour le contrôle des trous
+
+    Les colonnes autres que OHLCV (Dividends, Stock Splits) sont conservées.
+    """
+    counts = dict.fromkeys(COUNTERS, 0)
+    if hist is None or hist.empty:
+        return hist, counts, pd.DatetimeIndex([], tz='UTC')
+    counts['received'] = len(hist)
+
+    if not hist.index.is_monotonic_increasing:
+        hist = hist.sort_index(kind='stable')
+    duplicated = hist.index.duplicated(keep='last')
+    counts['duplicates'] = int(duplicated.sum())
+
+    close = hist['Close'].to_numpy(dtype=float)
+    valid = ~duplicated & np.isfinite(close) & (close > 0)
+    counts['invalid'] = int((~duplicated & ~valid).sum())
+    hist = hist[valid].copy()
+    close = close[valid]
+
+    # Open/High/Low manquants remplacés par la clôture, extrêmes cohérents avec l'ouverture et la clôture
+    prices = hist.reindex(columns=['Open', 'High', 'Low']).to_numpy(dtype=float)
+    prices = np.where(np.isfinite(prices) & (prices > 0), prices, close[:, None])
+    hist['Open'] = prices[:, 0]
+    hist['High'] = np.fmax(prices.max(axis=1), close)
+    hist['Low'] = np.fmin(prices.min(axis=1), close)
+    volume = hist['Volume'].fillna(0).to_numpy(dtype=float) if 'Volume' in hist else np.zeros(len(hist))
+    has_volume = len(volume) > 0 and (volume > 0).mean() >= VOLUME_SHARE
+
+    drop = np.zeros(len(hist), dtype=bool)
+    stale = np.zeros(len(hist), dtype=bool)
+    if has_volume and interval != '1wk' and interval != '1mo':
+        # Volume nul un jour sans séance
+        local_days = _local(hist.index, session).tz_localize(None).normalize()
+        open_days = session_days(session, local_days.min(), local_days.max())
+        off_session = (volume == 0) & ~local_days.isin(open_days)
+        # Barre figée : rien échangé, cours identique à la barre précédente
+        flat = (hist['Open'].to_numpy() == close) & (hist['High'].to_numpy() == close) & (hist['Low'].to_numpy() == close)
+        stale[1:] = (volume[1:] == 0) & flat[1:] & (close[1:] == close[:-1])
+        stale &= ~off_session
+        counts['off_session'] = int(off_session.sum())
+        counts['stale'] = int(stale.sum())
+        drop |= off_session | stale
+
+    # Valeurs aberrantes cherchées parmi les barres conservées (une barre figée masquerait le retour)
+    outliers = np.zeros(len(hist), dtype=bool)
+    kept = np.flatnonzero(~drop)
+    outliers[kept] = spike_mask(close[kept])
+    counts['outliers'] = int(outliers.sum())
+
+    # Barres figées : reçues (pas de trou à redemander); aberrantes : redemandées
+    seen = hist.index[(~drop | stale) & ~outliers]
+    return hist[~(drop | outliers)], counts, seen
+
+# ----------------------------------------------------------------------
+# Étape d'ingestion et métriques
+# ----------------------------------------------------------------------
+class QualityLog:
+    """Compteurs de qualité cumulés par (symbole, intervalle)"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def record(self, symbol, interval, counts):
+        with self._lock:
+            metrics = self._metrics.setdefault((symbol, interval), dict.fromkeys(['checks'] + COUNTERS, 0))
+            metrics['checks'] += 1
+            for name in COUNTERS:
+                metrics[name] += counts[name]
+            metrics['checked_at'] = pd.Timestamp.now(tz='UTC')
+
+    def get(self, symbol, interval=None):
+        """Compteurs d'un symbole (tous intervalles confondus si interval est None)"""
+        frame = self.frame()
+        if frame.empty:
+            return None
+        rows = frame[frame['symbol'] == symbol]
+        if interval is not None:
+            rows = rows[rows['interval'] == interval]
+        return rows.reset_index(drop=True) if not rows.empty else None
+
+    def frame(self):
+        """Tableau des compteurs avec le taux de couverture du calendrier"""
+        with self._lock:
+            rows = [{'symbol': s, 'interval': i, **m} for (s, i), m in self._metrics.items()]
+        columns = ['symbol', 'interval', 'checks'] + COUNTERS + ['checked_at', 'coverage']
+        if not rows:
+            return pd.DataFrame(columns=columns)
+        frame = pd.DataFrame(rows)
+        expected = frame['expected'].to_numpy(dtype=float)
+        frame['coverage'] = np.where(expected > 0, 1 - frame['missing'] / np.where(expected > 0, expected, 1), np.nan)
+        return frame[columns].sort_values(['symbol', 'interval'], ignore_index=True)
+
+def ingest(symbol, interval, hist, refetch, log=None):
+    """Barres validées d'un téléchargement; refetch(début, fin) redemande une plage manquante"""
+    session = session_for_symbol(symbol)
+    bars, counts, seen = clean_bars(hist, session, interval)
+    counts['expected'], counts['missing'], ranges = missing_ranges(seen, session, interval)
+
+    parts = [bars]
+    for start, end in ranges[:MAX_REFETCH]:
+        extra, extra_counts, extra_seen = clean_bars(refetch(start, end), session, interval)
+        counts['refetched'] += 1
+        for name in ('received', 'duplicates', 'invalid', 'off_session', 'stale', 'outliers'):
+            counts[name] += extra_counts[name]
+        if extra is not None and not extra.empty:
+            parts.append(extra)
+            seen = seen.append(extra_seen)
+    if len(parts) > 1:
+        bars = pd.concat(parts)
+        bars = bars[~bars.index.duplicated(keep='first')].sort_index()
+        missing = counts['missing']
+        _, counts['missing'], _ = missing_ranges(seen.unique(), session, interval)
+        counts['recovered'] = missing - counts['missing']
+
+    if log is not None:
+        log.record(symbol, interval, counts)
+    issues = {name: counts[name] for name in ('duplicates', 'invalid', 'off_session', 'stale', 'outliers', 'missing')
+              if counts[name]}
+    if issues:
+        logger.debug("%s %s : %s (plages redemandées : %d)", symbol, interval, issues, counts['refetched'])
+    return bars
+
+def benchmark(n_symbols=50, days=5, seed=0):
+    """Temps de contrôle de n_symbols séries 1 minute avec doublons, trous, NaN et valeurs aberrantes"""
+    rng = np.random.default_rng(seed)
+    end = pd.Timestamp.now(tz='UTC').floor('D')
+    starts, _ = expected_slots('US', '1m', end - pd.Timedelta(days=days + 3), end)
+    index = pd.DatetimeIndex(starts, tz='UTC')
+    series = []
+    for _ in range(n_symbols):
+        close = 100 * np.exp(np.cumsum(rng.normal(0, 5e-4, len(index))))
+        hist = pd.DataFrame({'Open': close, 'High': close * 1.001, 'Low': close * 0.999, 'Close': close,
+                             'Volume': rng.integers(1, 10_000, len(index))}, index=index)
+        hist.iloc[rng.integers(0, len(hist), 5), 3] = np.nan
+        hist.iloc[rng.integers(1, len(hist) - 1, 2), 3] *= 1.5
+        gap = rng.integers(0, len(hist) - 60)
+        hist = hist.drop(hist.index[gap:gap + 60])
+        series.append(pd.concat([hist, hist.iloc[:10]]))
+
+    log = QualityLog()
+    start = time.perf_counter()
+    for i, hist in enumerate(series):
+        ingest(f"SYM{i}", '1m', hist, lambda s, e: None, log)
+    elapsed = time.perf_counter() - start
+    totals = log.frame()[COUNTERS].sum()
+    return {
+        'symbols': n_symbols,
+        'bars': int(totals['received']),
+        'duplicates': int(totals['duplicates']),
+        'invalid': int(totals['invalid']),
+        'outliers': int(totals['outliers']),
+        'missing': int(totals['missing']),
+        'ms': elapsed * 1000,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Contrôle qualité des barres")
+    parser.add_argument('--symbols', nargs='+', default=[])
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--source', default=None, help="'yahoo' ou 'replay:<fichier.csv>'")
+    parser.add_argument('--benchmark', action='store_true')
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    if args.benchmark:
+        logger.info(
+            "%(symbols)d symboles, %(bars)d barres contrôlées en %(ms).0f ms : %(duplicates)d doublons, "
+            "%(invalid)d invalides, %(outliers)d aberrantes, %(missing)d créneaux manquants",
+            benchmark()
+        )
+        return
+
+    from history_cache import HistoryCache
+    from market_data import get_data_source
+
+    history = HistoryCache(get_data_source(args.source))
+    for symbol in args.symbols:
+        history.get_period(symbol, args.interval, args.period)
+    print(history.quality.frame().to_string(index=False))
+
+if __name__ == '__main__':
+    main()
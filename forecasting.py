@@ -0,0 +1,230 @@
+"""Prévisions multi-modèles exécutées en parallèle (processus) avec budget de temps par modèle
+
+Chaque modèle est une fonction de module (sérialisable) qui reçoit l'index
+des jours, les clôtures et les jours à prévoir, et renvoie les prix prévus.
+Pour ajouter un modèle, il suffit de l'enregistrer dans MODELS.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+
+import numpy as np
+from sklearn.ensemble import GradientBoostingRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from sklearn.pipeline import make_pipeline
+from sklearn.preprocessing import PolynomialFeatures
+
+# Nombre de rendements passés utilisés comme variables explicatives
+DEFAULT_LAGS = 5
+
+def _lagged_returns(close, lags):
+    """Matrice des rendements logarithmiques retardés et rendement suivant"""
+    returns = np.diff(np.log(close))
+    windows = np.lib.stride_tricks.sliding_window_view(returns, lags)
+    return windows[:-1], returns[lags:], returns
+
+def _recursive_forecast(model, returns, lags, last_price, horizon):
+    """Prévision pas à pas : chaque rendement prévu devient une variable du pas suivant"""
+    window = list(returns[-lags:])
+    predicted = np.empty(horizon)
+    for step in range(horizon):
+        predicted[step] = model.predict(np.asarray(window[-lags:])[None, :])[0]
+        window.append(predicted[step])
+    return last_price * np.exp(np.cumsum(predicted))
+
+def naive_drift(days, close, future_days):
+    """Référence : dernier prix prolongé de la dérive moyenne des rendements"""
+    drift = np.mean(np.diff(np.log(close))) if len(close) > 1 else 0.0
+    steps = np.arange(1, len(future_days) + 1)
+    return close[-1] * np.exp(drift * steps)
+
+def polynomial(days, close, future_days, degree=2):
+    """Régression polynomiale sur l'index des jours (modèle historique de la page)"""
+    model = make_pipeline(PolynomialFeatures(degree=degree), LinearRegression())
+    model.fit(days.reshape(-1, 1), close)
+    return model.predict(future_days.reshape(-1, 1))
+
+def ridge_lagged(days, close, future_days, lags=DEFAULT_LAGS, alpha=1.0):
+    """Régression ridge des rendements sur les rendements retardés"""
+    X, y, returns = _lagged_returns(close, lags)
+    model = Ridge(alpha=alpha).fit(X, y)
+    return _recursive_forecast(model, returns, lags, close[-1], len(future_days))
+
+def gradient_boosting(days, close, future_days, lags=DEFAULT_LAGS, n_estimators=200):
+    """Gradient boosting sur les rendements retardés"""
+    X, y, returns = _lagged_returns(close, lags)
+    model = GradientBoostingRegressor(n_estimators=n_estimators, max_depth=3, learning_rate=0.05, subsample=0.8, random_state=0)
+    model.fit(X, y)
+    return _recursive_forecast(model, returns, lags, close[-1], len(future_days))
+
+# Modèles disponibles : nom -> (fonction, libellé, budget en secondes)
+MODELS = {
+    'drift': (naive_drift, 'Dérive naïve / Naive drift', 2.0),
+    'polynomial': (polynomial, 'Régression polynomiale', 5.0),
+    'ridge': (ridge_lagged, 'Ridge (rendements retardés)', 5.0),
+    'gbr': (gradient_boosting, 'Gradient boosting', 20.0),
+}
+
+def evaluate_model(name, days, close, future_days, holdout, params=None):
+    """Ajuste un modèle sur l'échantillon d'apprentissage, le note sur la période réservée puis prévoit
+
+    Exécutée dans un processus de calcul; renvoie un dictionnaire sérialisable.
+    """
+    func = MODELS[name][0]
+    params = params or {}
+    start = time.perf_counter()
+
+    metrics = {}
+    if 0 < holdout < len(close) - 2 * DEFAULT_LAGS:
+        fitted = func(days[:-holdout], close[:-holdout], days[-holdout:], **params)
+        errors = fitted - close[-holdout:]
+        metrics = {
+            'rmse': float(np.sqrt(np.mean(errors ** 2))),
+            'mae': float(np.mean(np.abs(errors))),
+            'mape': float(np.mean(np.abs(errors / close[-holdout:])) * 100),
+        }
+
+    forecast = func(days, close, future_days, **params)
+    return {
+        'forecast': np.asarray(forecast, dtype=float),
+        'holdout': fitted if metrics else None,
+        'metrics': metrics,
+        'seconds': time.perf_counter() - start,
+    }
+
+def _run_model(conn, name, days, close, future_days, holdout, params):
+    """Point d'entrée du processus d'un modèle : signale son démarrage puis renvoie son résultat"""
+    # Horloge monotone du système, commune aux processus de l'hôte
+    conn.send(('started', time.monotonic()))
+    try:
+        conn.send(('done', evaluate_model(name, days, close, future_days, holdout, params)))
+    except Exception as e:
+        conn.send(('error', str(e)))
+    finally:
+        conn.close()
+
+class ForecastRunner:
+    """Un processus par modèle, arrêté au-delà de son budget; résultats mis en cache par version des données
+
+    Les tâches sont soumises sans attendre : l'interface interroge
+    results() jusqu'à ce que tous les modèles soient terminés ou hors budget.
+    Au plus max_workers modèles calculent en même temps, les suivants
+    attendent leur tour. Un modèle hors budget est interrompu (terminate) :
+    il ne garde ni CPU ni place de calcul.
+    """
+
+    def __init__(self, max_workers=None, max_entries=32):
+        self.max_workers = max_workers or max(2, min(4, os.cpu_count() or 1))
+        self.max_entries = max_entries
+        # Pas de fork du serveur multi-thread. Streamlit installe le script comme __main__, qu'un
+        # processus 'spawn' réexécuterait : les modèles partent d'un serveur de fork qui n'a importé
+        # que ce module (et scikit-learn), une fois pour toutes
+        if 'forkserver' in multiprocessing.get_all_start_methods():
+            self._context = multiprocessing.get_context('forkserver')
+            self._context.set_forkserver_preload([__name__])
+        else:
+            self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._jobs = {}
+        self._queue = deque()
+
+    def submit(self, key, days, close, future_days, holdout, models=None, params=None):
+        """Lance les modèles pour une version des données (sans effet si déjà lancés)"""
+        params = params or {}
+        days = np.asarray(days, dtype=float)
+        close = np.asarray(close, dtype=float)
+        future_days = np.asarray(future_days, dtype=float)
+        with self._lock:
+            jobs = self._jobs.setdefault(key, {})
+            for name in models or MODELS:
+                if name in jobs:
+                    continue
+                jobs[name] = {
+                    'args': (name, days, close, future_days, holdout, params.get(name)),
+                    'process': None, 'conn': None, 'started': None, 'result': {'status': 'pending'},
+                }
+                self._queue.append((key, name))
+            # Éviction des versions les plus anciennes (processus encore actifs arrêtés)
+            while len(self._jobs) > self.max_entries:
+                for job in self._jobs.pop(next(iter(self._jobs))).values():
+                    self._stop(job)
+            self._schedule()
+        return self
+
+    def _schedule(self):
+        """Démarre les modèles en file dans la limite de max_workers processus"""
+        running = sum(
+            job['process'] is not None and job['result']['status'] == 'pending'
+            for jobs in self._jobs.values() for job in jobs.values()
+        )
+        while self._queue and running < self.max_workers:
+            key, name = self._queue.popleft()
+            job = self._jobs.get(key, {}).get(name)
+            if job is None or job['process'] is not None:
+                continue
+            receiver, sender = self._context.Pipe(duplex=False)
+            job['process'] = self._context.Process(target=_run_model, args=(sender, *job['args']), daemon=True)
+            job['process'].start()
+            sender.close()
+            job['conn'] = receiver
+            running += 1
+
+    def _poll(self, job, now):
+        """Lit les messages du processus d'un modèle, puis l'arrête s'il a fini ou dépassé son budget"""
+        if job['process'] is None or job['result']['status'] != 'pending':
+            return
+        try:
+            while job['result']['status'] == 'pending' and job['conn'].poll():
+                kind, payload = job['conn'].recv()
+                if kind == 'started':
+                    # Le budget court à partir du démarrage effectif (pas de l'attente ni des imports)
+                    job['started'] = payload
+                elif kind == 'done':
+                    job['result'] = {'status': 'done', **payload}
+                else:
+                    job['result'] = {'status': 'error', 'error': payload}
+        except EOFError:
+            job['result'] = {'status': 'error', 'error': f"processus interrompu (code {job['process'].exitcode})"}
+        budget = MODELS[job['args'][0]][2]
+        if job['result']['status'] == 'pending' and job['started'] is not None and now - job['started'] > budget:
+            job['result'] = {'status': 'timeout'}
+        if job['result']['status'] != 'pending':
+            self._stop(job)
+
+    @staticmethod
+    def _stop(job):
+        """Attend la fin d'un modèle qui a répondu, interrompt les autres, et ferme son canal"""
+        process = job['process']
+        if process is None:
+            return
+        if job['result']['status'] in ('done', 'error'):
+            process.join(timeout=1)
+        if process.is_alive():
+            process.terminate()
+            process.join(timeout=1)
+        job['conn'].close()
+
+    def results(self, key):
+        """État de chaque modèle : {'status': done|pending|timeout|error, ...}"""
+        with self._lock:
+            now = time.monotonic()
+            # Tous les processus : ceux qui ont fini libèrent leur place pour la file
+            for jobs in self._jobs.values():
+                for job in jobs.values():
+                    self._poll(job, now)
+            self._schedule()
+            return {name: dict(job['result']) for name, job in self._jobs.get(key, {}).items()}
+
+    def pending(self, key):
+        """Vrai si au moins un modèle est encore en cours dans son budget"""
+        return any(r['status'] == 'pending' for r in self.results(key).values())
+
+    def shutdown(self):
+        with self._lock:
+            for jobs in self._jobs.values():
+                for job in jobs.values():
+                    self._stop(job)
+            self._jobs.clear()
+            self._queue.clear()
@@ -0,0 +1,191 @@
+"""Cache d'historiques par plages de temps contiguës, par (symbole, intervalle)
+
+Une demande de période est servie en découpant une plage déjà en mémoire;
+seules les portions manquantes sont téléchargées, puis fusionnées avec les
+plages qui les chevauchent ou les touchent. Éviction LRU par octets.
+
+Les barres sont conservées non ajustées; dividendes et divisions sont
+appliqués à la lecture depuis la table des opérations sur titres. Chaque
+téléchargement passe d'abord par le contrôle qualité (data_quality) :
+doublons, barres invalides, figées ou aberrantes écartées, trous du
+calendrier redemandés une fois.
+"""
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+from bars import bars_nbytes, bars_view, compact_bars
+from corporate_actions import CorporateActions
+from data_quality import QualityLog, ingest
+from market_calendar import session_for_symbol
+from market_data import PERIOD_OFFSETS
+from resample import MAX_HISTORY_DAYS, base_interval, resample_bars
+
+# Périodes exprimées en séances (Yahoo renvoie les N dernières séances, week-end compris)
+SESSION_PERIODS = {'1d': 1, '5d': 5}
+
+class Span:
+    """Plage [start, end] entièrement couverte par les barres qu'elle contient"""
+
+    __slots__ = ('start', 'end', 'bars', 'nbytes')
+
+    def __init__(self, start, end, bars):
+        self.start = start
+        self.end = end
+        self.bars = bars
+        self.nbytes = bars_nbytes(bars)
+
+class HistoryCache:
+    """Plages d'historique partagées entre sessions, complétées au fil des demandes"""
+
+    def __init__(self, source, max_bytes=256 * 2**20, refresh=pd.Timedelta(minutes=5), adjust='dividends'):
+        self.source = source
+        self.max_bytes = max_bytes
+        # Ajustement à la lecture : 'dividends' (divisions et dividendes, comme yfinance), 'splits' ou None
+        self.adjust = adjust
+        self.actions = CorporateActions()
+        self.quality = QualityLog()
+        # Écart maximal toléré entre la fin d'une plage et l'instant présent
+        self.refresh = refresh
+        self._spans = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.fetches = 0
+
+    @property
+    def nbytes(self):
+        return self._bytes
+
+    def now(self):
+        """Instant présent (horloge de rejeu si la source en a une)"""
+        now = getattr(self.source, 'now', None)
+        return pd.Timestamp(now) if now is not None else pd.Timestamp.now(tz='UTC')
+
+    @staticmethod
+    def _gaps(spans, start, end):
+        """Portions de [start, end] non couvertes par les plages (triées)"""
+        gaps = []
+        cursor = start
+        for span in spans:
+            if span.end <= cursor:
+                continue
+            if span.start >= end:
+                break
+            if span.start > cursor:
+                gaps.append((cursor, span.start))
+            cursor = max(cursor, span.end)
+        if cursor < end:
+            gaps.append((cursor, end))
+        return gaps
+
+    def _fetch(self, symbol, interval, spans, gap_start, gap_end):
+        """Télécharge une portion; la dernière barre de la plage précédente (provisoire) est rechargée"""
+        fetch_start = gap_start
+        previous = [s for s in spans if s.end == gap_start and not s.bars.empty]
+        if previous:
+            fetch_start = min(fetch_start, previous[0].bars.index[-1])
+        hist = self._download(symbol, interval, fetch_start, gap_end)
+        if hist is None or hist.empty:
+            return None
+        hist = ingest(symbol, interval, hist, lambda start, end: self._download(symbol, interval, start, end), self.quality)
+        return Span(fetch_start, gap_end, compact_bars(self.actions.unadjust(symbol, hist)))
+
+    def _download(self, symbol, interval, start, end):
+        """Requête à la source; les opérations sur titres sont relevées avant tout nettoyage"""
+        hist = self.source.get_history_range(symbol, start, end, interval)
+        self.fetches += 1
+        if hist is not None and not hist.empty:
+            # Nouvelles opérations d'abord : les cours reçus sont déjà ajustés des divisions connues de Yahoo
+            self.actions.record(symbol, hist)
+        return hist
+
+    def _merge(self, key, new):
+        """Insère une plage en fusionnant celles qui la chevauchent ou la touchent"""
+        spans = self._spans.get(key, [])
+        kept, merged = [], []
+        for span in spans:
+            if span.start <= new.end and span.end >= new.start:
+                merged.append(span)
+            else:
+                kept.append(span)
+        if merged:
+            # Les nouvelles barres remplacent les anciennes aux mêmes horodatages
+            bars = pd.concat([s.bars for s in merged] + [new.bars])
+            bars = bars[~bars.index.duplicated(keep='last')].sort_index()
+            new = Span(min(s.start for s in merged + [new]), max(s.end for s in merged + [new]), compact_bars(bars))
+        self._bytes += new.nbytes - sum(s.nbytes for s in merged)
+        self._spans[key] = sorted(kept + [new], key=lambda s: s.start)
+
+    def _evict(self, keep):
+        """Retire les (symbole, intervalle) les moins récemment utilisés au-delà du budget"""
+        while self._bytes > self.max_bytes and len(self._spans) > 1:
+            key = next(iter(self._spans))
+            if key == keep:
+                self._spans.move_to_end(key)
+                continue
+            self._bytes -= sum(s.nbytes for s in self._spans.pop(key))
+
+    def get(self, symbol, interval, start, end=None):
+        """Barres de [start, end], en ne téléchargeant que les portions manquantes"""
+        now = self.now()
+        end = min(pd.Timestamp(end), now) if end is not None else now
+        start = pd.Timestamp(start)
+        key = (symbol, interval)
+
+        with self._lock:
+            spans = list(self._spans.get(key, []))
+        gaps = self._gaps(spans, start, end)
+        # Fin de plage assez récente : pas de requête pour quelques minutes manquantes
+        if gaps and gaps[-1][1] == end and gaps[-1][0] > start and end - gaps[-1][0] < self.refresh:
+            gaps.pop()
+
+        fetched = [self._fetch(symbol, interval, spans, *gap) for gap in gaps]
+
+        with self._lock:
+            for span in fetched:
+                if span is not None:
+                    self._merge(key, span)
+            spans = self._spans.get(key, [])
+            if key in self._spans:
+                self._spans.move_to_end(key)
+                self._evict(keep=key)
+            parts = [s.bars.loc[start:end] for s in spans if s.start <= end and s.end >= start]
+
+        if not parts:
+            return compact_bars(pd.DataFrame(index=pd.DatetimeIndex([], tz='UTC')))
+        bars = bars_view(parts[0]) if len(parts) == 1 else pd.concat(parts)
+        if self.adjust:
+            bars = self.actions.adjust(symbol, bars, dividends=self.adjust == 'dividends')
+        return bars
+
+    def get_period(self, symbol, interval, period):
+        """Barres d'une période yfinance ('1mo', '1y', ...) servies depuis le cache"""
+        now = self.now()
+        if period in SESSION_PERIODS:
+            # N dernières séances : marge pour les week-ends et jours fériés
+            start = now - pd.Timedelta(days=2 * SESSION_PERIODS[period] + 4)
+        elif period in PERIOD_OFFSETS:
+            start = now - PERIOD_OFFSETS[period]
+        else:
+            # Période sans plage équivalente ('max', 'ytd') : contrôlée, sans redemande (cours déjà ajustés)
+            hist = self.source.get_history(symbol, period, interval)
+            return compact_bars(ingest(symbol, interval, hist, lambda start, end: None, self.quality))
+        if interval in MAX_HISTORY_DAYS:
+            start = max(start, now - pd.Timedelta(days=MAX_HISTORY_DAYS[interval]))
+
+        bars = self.get(symbol, interval, start, now)
+        if period in SESSION_PERIODS and not bars.empty:
+            sessions = bars.index.normalize()
+            first = sessions.unique()[-SESSION_PERIODS[period]:][0]
+            bars = bars[sessions >= first]
+        return bars
+
+    def get_interval(self, symbol, period, interval):
+        """Barres d'un intervalle quelconque, agrégées depuis la granularité de base mise en cache"""
+        # Une seule requête fine par (symbole, période); les intervalles plus larges sont agrégés localement
+        base = base_interval(period, interval)
+        bars = self.get_period(symbol, base, period)
+        if base != interval:
+            bars = resample_bars(bars, interval, session_for_symbol(symbol))
+        return bars
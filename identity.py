@@ -0,0 +1,78 @@
+"""Identité des utilisateurs : jetons signés (HMAC-SHA256) remplaçant le paramètre ?user=
+
+Un jeton porte l'identifiant de l'utilisateur et sa date d'expiration, signés
+avec le secret du serveur (TRACKER_SECRET, sinon fichier tracker.secret créé
+à côté de la base avec des droits 0600). Le dashboard le lit dans ?token=,
+l'API dans l'en-tête Authorization: Bearer.
+
+Usage :
+    python identity.py --user alice              # jeton valable 365 jours
+    python identity.py --user alice --days 30
+"""
+import argparse
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import time
+
+from storage import DEFAULT_DB_PATH
+
+DEFAULT_SECRET_PATH = os.environ.get(
+    'TRACKER_SECRET_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(DEFAULT_DB_PATH)), 'tracker.secret')
+)
+DEFAULT_TOKEN_DAYS = 365
+
+def _b64encode(data):
+    return base64.urlsafe_b64encode(data).rstrip(b'=').decode()
+
+def _b64decode(text):
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+def load_secret(path=DEFAULT_SECRET_PATH):
+    """Secret de signature : variable d'environnement, sinon fichier (créé au premier appel)"""
+    secret = os.environ.get('TRACKER_SECRET')
+    if secret:
+        return secret.encode()
+    try:
+        with open(path, 'rb') as f:
+            return f.read().strip()
+    except FileNotFoundError:
+        pass
+    secret = secrets.token_hex(32).encode()
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+    with os.fdopen(fd, 'wb') as f:
+        f.write(secret)
+    return secret
+
+def sign_user(user_id, days=DEFAULT_TOKEN_DAYS, secret=None):
+    """Jeton signé pour un utilisateur, valable days jours"""
+    payload = _b64encode(f"{user_id}\n{int(time.time() + days * 86400)}".encode())
+    signature = hmac.new(secret or load_secret(), payload.encode(), hashlib.sha256).digest()
+    return f"{payload}.{_b64encode(signature)}"
+
+def verify_token(token, secret=None):
+    """Identifiant de l'utilisateur d'un jeton valide et non expiré, None sinon"""
+    try:
+        payload, signature = token.split('.')
+        expected = hmac.new(secret or load_secret(), payload.encode(), hashlib.sha256).digest()
+        if not hmac.compare_digest(_b64decode(signature), expected):
+            return None
+        user_id, expires = _b64decode(payload).decode().rsplit('\n', 1)
+    except (ValueError, UnicodeDecodeError):
+        return None
+    if not user_id or int(expires) < time.time():
+        return None
+    return user_id
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Jeton d'accès signé pour un utilisateur")
+    parser.add_argument('--user', required=True)
+    parser.add_argument('--days', type=int, default=DEFAULT_TOKEN_DAYS)
+    args = parser.parse_args(argv)
+    print(sign_user(args.user, args.days))
+
+if __name__ == '__main__':
+    main()
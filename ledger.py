@@ -0,0 +1,247 @@
+"""Registre des transactions : achats, ventes, dividendes, frais et résultat réalisé (FIFO / coût moyen)
+
+Les achats sont les lots du portefeuille; les ventes, dividendes et frais sont
+des transactions. Tous les calculs portent sur des tableaux NumPy triés par
+(symbole, date) :
+
+- FIFO : le coût d'une vente est l'intégrale du prix d'achat sur l'axe des
+  quantités cumulées, soit une interpolation linéaire du coût cumulé des achats;
+- coût moyen : le coût détenu suit une récurrence linéaire, parcourue en une
+  passe et remise à zéro à chaque changement de symbole ou clôture.
+"""
+import csv
+import io
+
+import numpy as np
+import pandas as pd
+
+from symbol_master import get_symbol_master
+
+TRANSACTION_TYPES = ('buy', 'sell', 'dividend', 'fee')
+
+# Libellés acceptés dans les relevés de courtiers
+TYPE_ALIASES = {
+    'buy': 'buy', 'achat': 'buy', 'b': 'buy',
+    'sell': 'sell', 'vente': 'sell', 's': 'sell',
+    'dividend': 'dividend', 'div': 'dividend', 'dividende': 'dividend',
+    'fee': 'fee', 'fees': 'fee', 'frais': 'fee', 'commission': 'fee',
+}
+
+COLUMN_ALIASES = {
+    'symbol': ('symbol', 'symbole', 'ticker'),
+    'type': ('type', 'action', 'side'),
+    'date': ('date', 'trade_date', 'datetime'),
+    'quantity': ('quantity', 'qty', 'shares', 'quantite'),
+    'price': ('price', 'prix', 'buy_price', 'amount'),
+    'fees': ('fees', 'fee', 'commission', 'frais'),
+}
+
+def parse_transactions_csv(data):
+    """Lit un relevé CSV de courtier en liste de transactions normalisées"""
+    if isinstance(data, bytes):
+        data = data.decode('utf-8-sig')
+    reader = csv.DictReader(io.StringIO(data))
+    header = {name.strip().lower(): name for name in (reader.fieldnames or [])}
+    columns = {}
+    for key, aliases in COLUMN_ALIASES.items():
+        columns[key] = next((header[a] for a in aliases if a in header), None)
+    missing = [k for k in ('symbol', 'type', 'date', 'quantity') if columns[k] is None]
+    if missing:
+        raise ValueError(f"Colonnes manquantes: {', '.join(missing)}")
+
+    transactions = []
+    for line, row in enumerate(reader, start=2):
+        kind = TYPE_ALIASES.get(row[columns['type']].strip().lower())
+        if kind is None:
+            raise ValueError(f"Ligne {line}: type inconnu '{row[columns['type']]}'")
+        transactions.append({
+            'symbol': row[columns['symbol']].strip().upper(),
+            'type': kind,
+            'date': row[columns['date']].strip(),
+            'quantity': abs(float(row[columns['quantity']] or 0)),
+            'price': float(row[columns['price']] or 0) if columns['price'] else 0.0,
+            'fees': float(row[columns['fees']] or 0) if columns['fees'] else 0.0,
+        })
+    return transactions
+
+def build_ledger(portfolio, transactions):
+    """Registre unique trié par (symbole, date) à partir des lots et des transactions"""
+    rows = [
+        (symbol, 'buy', lot['date'], lot['shares'], lot['buy_price'], 0.0, lot.get('id'))
+        for symbol, lots in portfolio.items()
+        for lot in lots
+    ]
+    rows += [
+        (t['symbol'], t['type'], t['date'], t['quantity'], t['price'], t.get('fees', 0.0), t.get('id'))
+        for t in transactions
+    ]
+    ledger = pd.DataFrame(rows, columns=['symbol', 'type', 'date', 'quantity', 'price', 'fees', 'id'])
+    ledger['date'] = pd.to_datetime(ledger['date'], errors='coerce', format='ISO8601')
+    # À date égale, les achats passent avant les ventes
+    ledger['order'] = ledger['type'].map({'buy': 0, 'dividend': 1, 'fee': 1, 'sell': 2})
+    ledger = ledger.sort_values(['symbol', 'date', 'order'], kind='stable').reset_index(drop=True)
+    return ledger.drop(columns='order')
+
+class Ledger:
+    """Appariement des ventes aux achats et résultat réalisé par symbole"""
+
+    def __init__(self, ledger):
+        self.ledger = ledger
+        # Registre trié par symbole : codes contigus, sans tri supplémentaire
+        self._codes, symbols = pd.factorize(ledger['symbol'])
+        self.symbols = np.asarray(symbols)
+        self._starts = np.flatnonzero(np.r_[True, self._codes[1:] != self._codes[:-1]])
+        self._cache = {}
+        kind = ledger['type'].to_numpy(dtype=object)
+        self._buy = kind == 'buy'
+        self._sell = kind == 'sell'
+        self._dividend = kind == 'dividend'
+        self._fee = kind == 'fee'
+        self._qty = ledger['quantity'].to_numpy(dtype=float)
+        self._price = ledger['price'].to_numpy(dtype=float)
+        self._fees = ledger['fees'].to_numpy(dtype=float)
+
+        # Quantité détenue après chaque transaction (cumul par symbole)
+        signed = np.where(self._buy, self._qty, np.where(self._sell, -self._qty, 0.0))
+        self._held = self._group_cumsum(signed)
+        short = self._held < -1e-9
+        if short.any():
+            row = ledger.iloc[np.flatnonzero(short)[0]]
+            raise ValueError(f"Vente à découvert: {row['symbol']} le {row['date']:%Y-%m-%d}")
+
+    def _group_cumsum(self, values):
+        """Somme cumulée remise à zéro à chaque changement de symbole"""
+        total = np.cumsum(values)
+        offsets = np.r_[0.0, total][self._starts]
+        return total - np.repeat(offsets, np.diff(np.r_[self._starts, len(values)]))
+
+    def _fifo_cost(self):
+        """Coût FIFO de chaque vente, par interpolation du coût cumulé des achats"""
+        if 'fifo' in self._cache:
+            return self._cache['fifo']
+        buy_qty = np.where(self._buy, self._qty, 0.0)
+        sell_qty = np.where(self._sell, self._qty, 0.0)
+
+        # Axe global des quantités : les symboles se suivent, chacun décalé du total acheté avant lui
+        cum_buy_qty = np.cumsum(buy_qty)
+        cum_buy_cost = np.cumsum(buy_qty * self._price)
+        group_base = np.repeat(np.r_[0.0, cum_buy_qty][self._starts], np.diff(np.r_[self._starts, len(buy_qty)]))
+        sold_after = group_base + self._group_cumsum(sell_qty)
+
+        axis_qty = np.r_[0.0, cum_buy_qty[self._buy]]
+        axis_cost = np.r_[0.0, cum_buy_cost[self._buy]]
+        cost_after = np.interp(sold_after, axis_qty, axis_cost)
+        cost_before = np.interp(sold_after - sell_qty, axis_qty, axis_cost)
+        self._cache['fifo'] = np.where(self._sell, cost_after - cost_before, 0.0)
+        return self._cache['fifo']
+
+    def _average_cost(self):
+        """Coût moyen de chaque vente et coût détenu après chaque transaction
+
+        Récurrence C_i = (1 - vendu_i / détenu_i) * C_(i-1) + achat_i parcourue
+        une fois, remise à zéro à chaque symbole et à chaque position soldée : un
+        produit cumulé des fractions conservées déborde sur de longues séries de
+        ventes partielles.
+        """
+        if 'average' in self._cache:
+            return self._cache['average']
+        sold_cost = np.zeros(len(self._qty))
+        cost_held = np.zeros(len(self._qty))
+        new_symbol = np.zeros(len(self._qty), dtype=bool)
+        new_symbol[self._starts] = True
+        cost = 0.0
+        rows = zip(new_symbol.tolist(), self._buy.tolist(), self._sell.tolist(),
+                   self._qty.tolist(), self._price.tolist(), np.r_[0.0, self._held[:-1]].tolist())
+        for i, (start, buy, sell, qty, price, held_before) in enumerate(rows):
+            if start:
+                cost, held_before = 0.0, 0.0
+            if buy:
+                cost += qty * price
+            elif sell and held_before > 0:
+                sold_cost[i] = cost * min(qty / held_before, 1.0)
+                cost = cost - sold_cost[i] if held_before - qty > 1e-9 else 0.0
+            cost_held[i] = cost
+        self._cache['average'] = (sold_cost, cost_held)
+        return self._cache['average']
+
+    def realized(self, method='fifo'):
+        """Résultat réalisé de chaque vente (method = 'fifo' ou 'average')"""
+        if method == 'fifo':
+            cost = self._fifo_cost()
+        else:
+            cost, _ = self._average_cost()
+        sells = self._sell
+        proceeds = self._qty * self._price - self._fees
+        result = self.ledger.loc[sells, ['symbol', 'date', 'quantity', 'price', 'fees', 'id']].copy()
+        result['cost'] = cost[sells]
+        result['pnl'] = proceeds[sells] - cost[sells]
+        return result
+
+    def summary(self, method='fifo'):
+        """Position, coût restant, résultat réalisé, dividendes et frais par symbole"""
+        n = len(self.symbols)
+        codes = self._codes
+
+        cost = self._fifo_cost() if method == 'fifo' else self._average_cost()[0]
+        pnl = np.where(self._sell, self._qty * self._price - self._fees - cost, 0.0)
+        realized = np.bincount(codes, weights=pnl, minlength=n)
+
+        # Dividende : quantité x montant unitaire, ou montant total si la quantité est nulle
+        dividend_amount = np.where(self._qty > 0, self._qty * self._price, self._price)
+        dividends = np.bincount(codes, weights=np.where(self._dividend, dividend_amount, 0.0), minlength=n)
+        fees = np.bincount(codes, weights=np.where(self._fee, self._price + self._fees, np.where(self._buy, self._fees, 0.0)), minlength=n)
+
+        last = np.r_[self._starts[1:], len(codes)] - 1
+        held = self._held[last]
+        bought_cost = np.bincount(codes, weights=np.where(self._buy, self._qty * self._price, 0.0), minlength=n)
+        if method == 'fifo':
+            sold_cost = np.bincount(codes, weights=cost, minlength=n)
+            open_cost = bought_cost - sold_cost
+        else:
+            _, cost_held = self._average_cost()
+            open_cost = cost_held[last]
+
+        summary = pd.DataFrame({
+            'shares': held,
+            'cost_basis': np.where(held > 1e-9, open_cost, 0.0),
+            'realized': realized,
+            'dividends': dividends,
+            'fees': fees,
+        }, index=pd.Index(self.symbols, name='symbol'))
+        summary['net'] = summary['realized'] + summary['dividends'] - summary['fees']
+        return summary
+
+    def open_lots(self):
+        """Quantité restante de chaque lot d'achat après appariement FIFO {id: quantité}"""
+        buy_qty = np.where(self._buy, self._qty, 0.0)
+        sold_total = np.bincount(self._codes, weights=np.where(self._sell, self._qty, 0.0), minlength=len(self.symbols))
+        bought_before = self._group_cumsum(buy_qty) - buy_qty
+        remaining = np.clip(buy_qty - np.maximum(sold_total[self._codes] - bought_before, 0.0), 0.0, None)
+        ids = self.ledger['id'].to_numpy()
+        return {ids[i]: remaining[i] for i in np.flatnonzero(self._buy)}
+
+def value_positions(portfolio, transactions, prices, fx_rate):
+    """Valorisation des lots ouverts aux prix courants (ventes appariées en FIFO)
+
+    prices : prix courant par symbole (Series); fx_rate : shekels par dollar.
+    Les colonnes *_usd convertissent les lots en dollars pour les totaux.
+    """
+    open_lots = Ledger(build_ledger(portfolio, transactions)).open_lots() if portfolio else {}
+    rows = []
+    for symbol, lots in portfolio.items():
+        price = prices.get(symbol, np.nan)
+        for lot in lots:
+            shares = open_lots.get(lot.get('id'), lot['shares'])
+            if shares > 0:
+                rows.append((symbol, lot.get('id'), shares, lot['buy_price'], price))
+    positions = pd.DataFrame(rows, columns=['symbol', 'id', 'shares', 'buy_price', 'price'])
+    positions['price'] = positions['price'].astype(float).fillna(0.0)
+    positions['currency'] = get_symbol_master().columns(positions['symbol'].to_numpy(dtype=str), ('currency',))['currency']
+    positions['cost'] = positions['shares'] * positions['buy_price']
+    positions['value'] = positions['shares'] * positions['price']
+    positions['profit'] = positions['value'] - positions['cost']
+    positions['profit_pct'] = (positions['profit'] / positions['cost'].where(positions['cost'] > 0) * 100).fillna(0.0)
+    rate = np.where(positions['currency'] == 'ILS', fx_rate, 1.0)
+    positions['cost_usd'] = positions['cost'] / rate
+    positions['value_usd'] = positions['value'] / rate
+    return positions
@@ -0,0 +1,350 @@
+"""Test de charge du tableau de bord : sessions simultanées sur un serveur Streamlit réel, source de rejeu locale
+
+Le script lance `streamlit run Dashboard.py` (rejeu et base SQLite
+temporaires), puis ouvre des sessions headless : chacune parle le protocole
+websocket du navigateur (BackMsg / ForwardMsg) et enchaîne des actions
+aléatoires (section, symbole, période, auto-refresh, rafraîchissement). Les
+minuteries des fragments (run_every) sont rejouées comme dans le navigateur.
+
+Pour chaque palier de sessions : latence des réexécutions complètes
+(p50/p95/p99) et des fragments, débit, octets reçus par réexécution, CPU et
+mémoire résidente du serveur (processus et enfants vivants, lus dans /proc).
+Comme le navigateur, chaque session annonce les messages déjà en cache.
+
+Usage :
+    python loadtest.py                                   # paliers 1, 2, 4, 8 sessions, 20 s chacun
+    python loadtest.py --sessions 1 4 16 32 --duration 60
+    python loadtest.py --source ticks.csv --think 0.5 --json resultats.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+import pandas as pd
+import websockets
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+
+SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'Dashboard.py')
+
+# Libellés (partiels) des contrôles de la barre latérale
+MENU_LABEL = 'Choisir une section'
+SYMBOL_LABEL = 'Symbole principal'
+PERIOD_LABEL = 'Période'
+AUTO_REFRESH_LABEL = 'Auto-refresh'
+OTHER_SYMBOL = 'Autre'
+
+# Action -> poids dans le scénario aléatoire ('refresh' : réexécution sans changement)
+ACTIONS = {'menu': 3, 'symbol': 3, 'period': 2, 'auto_refresh': 1, 'refresh': 2}
+
+# Statut de fin d'exécution signalant une erreur de compilation (ScriptFinishedStatus)
+FINISHED_WITH_COMPILE_ERROR = 1
+
+def make_replay(path, symbols, days=60, freq='15min', seed=0):
+    """Fichier de rejeu synthétique : marche aléatoire par symbole sur les heures de séance"""
+    rng = np.random.default_rng(seed)
+    sessions = pd.bdate_range(end=pd.Timestamp.now(tz='UTC').normalize(), periods=days)
+    timestamps = pd.DatetimeIndex(np.concatenate([
+        pd.date_range(day + pd.Timedelta(hours=7), day + pd.Timedelta(hours=14, minutes=15), freq=freq).to_numpy()
+        for day in sessions
+    ]), tz='UTC')
+    frames = []
+    for symbol in symbols:
+        base = 1000.0 if symbol.endswith('.TA') or symbol.startswith('^') else 50.0
+        close = base * np.exp(np.cumsum(rng.normal(0, 0.003, len(timestamps))))
+        spread = close * np.abs(rng.normal(0, 0.001, len(timestamps)))
+        frames.append(pd.DataFrame({
+            'timestamp': timestamps,
+            'symbol': symbol,
+            'open': np.r_[close[0], close[:-1]],
+            'high': close + spread,
+            'low': close - spread,
+            'close': close,
+            'volume': rng.integers(1_000, 100_000, len(timestamps)),
+        }))
+    pd.concat(frames).to_csv(path, index=False)
+    return path
+
+# ----------------------------------------------------------------------
+# Processus serveur
+# ----------------------------------------------------------------------
+def start_server(port, env, log_path, timeout=60):
+    """Lance le tableau de bord en mode headless et attend qu'il réponde"""
+    log = open(log_path, 'w')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'streamlit', 'run', SCRIPT, '--server.headless', 'true',
+         '--server.port', str(port), '--browser.gatherUsageStats', 'false'],
+        env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"Le serveur s'est arrêté (voir {log_path})")
+        try:
+            with urllib.request.urlopen(f"http://localhost:{port}/_stcore/health", timeout=1):
+                return server
+        except OSError:
+            time.sleep(0.2)
+    server.terminate()
+    raise RuntimeError(f"Le serveur ne répond pas après {timeout} s (voir {log_path})")
+
+def _process_tree(pid):
+    pids, i = [pid], 0
+    while i < len(pids):
+        try:
+            for task in os.listdir(f"/proc/{pids[i]}/task"):
+                with open(f"/proc/{pids[i]}/task/{task}/children") as f:
+                    pids += [int(p) for p in f.read().split()]
+        except OSError:
+            pass
+        i += 1
+    return pids
+
+def process_usage(pid):
+    """(secondes CPU, octets résidents) du processus et de ses enfants vivants; (nan, nan) sans /proc"""
+    cpu = rss = 0
+    ticks, page = os.sysconf('SC_CLK_TCK'), os.sysconf('SC_PAGE_SIZE')
+    try:
+        for p in _process_tree(pid):
+            with open(f"/proc/{p}/stat") as f:
+                fields = f.read().rsplit(')', 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            with open(f"/proc/{p}/statm") as f:
+                rss += int(f.read().split()[1]) * page
+    except (OSError, ValueError, IndexError):
+        if cpu == 0:
+            return float('nan'), float('nan')
+    return cpu, rss
+
+# ----------------------------------------------------------------------
+# Session simulée (client websocket headless)
+# ----------------------------------------------------------------------
+class Session:
+    """Une session navigateur : état des widgets, minuteries des fragments, réexécutions chronométrées"""
+
+    def __init__(self, url, rng, timeout):
+        self.url = url
+        self.rng = rng
+        self.timeout = timeout
+        self.widgets = {}     # libellé -> (type, proto) du dernier rendu
+        self.states = {}      # id -> WidgetState envoyé à chaque réexécution
+        self.timers = {}      # fragment -> [intervalle, prochaine échéance]
+        self.cached = set()   # empreintes des messages gardés en cache, annoncées au serveur comme le navigateur
+        self.samples = []     # (type, latence s, succès, octets reçus)
+
+    async def run(self, deadline, think):
+        async with websockets.connect(self.url, subprotocols=['streamlit'], max_size=None) as ws:
+            self.ws = ws
+            await self.rerun('start')
+            names, weights = list(ACTIONS), list(ACTIONS.values())
+            next_action = time.monotonic() + (self.rng.expovariate(1.0 / think) if think > 0 else 0)
+            while time.monotonic() < deadline:
+                # Prochain événement : action de l'utilisateur ou échéance d'un fragment
+                due = min([next_action] + [timer[1] for timer in self.timers.values()])
+                if due > time.monotonic():
+                    await asyncio.sleep(min(due, deadline) - time.monotonic())
+                    continue
+                fragment = next((f for f, timer in self.timers.items() if timer[1] <= time.monotonic()), None)
+                if fragment is not None:
+                    self.timers[fragment][1] = time.monotonic() + self.timers[fragment][0]
+                    await self.rerun('fragment', fragment)
+                    continue
+                action = self.rng.choices(names, weights)[0]
+                if self.apply(action):
+                    await self.rerun(action)
+                next_action = time.monotonic() + (self.rng.expovariate(1.0 / think) if think > 0 else 0)
+        return self.samples
+
+    def _set(self, label, **value):
+        widget = self.widgets[label][1]
+        self.states[widget.id] = WidgetState(id=widget.id, **value)
+
+    def _find(self, label):
+        return next((l for l in self.widgets if label in l), None)
+
+    def apply(self, action):
+        """Modifie l'état des widgets; False si l'action n'est pas possible dans l'état courant"""
+        if action == 'refresh':
+            return True
+        label = self._find({'menu': MENU_LABEL, 'symbol': SYMBOL_LABEL, 'period': PERIOD_LABEL,
+                            'auto_refresh': AUTO_REFRESH_LABEL}[action])
+        if label is None:
+            return False
+        kind, widget = self.widgets[label]
+        if kind == 'checkbox':
+            if widget.disabled:
+                return False
+            current = self.states.get(widget.id)
+            self._set(label, bool_value=not (current.bool_value if current else widget.default))
+            return True
+        current = self.states.get(widget.id)
+        if current is not None:
+            current = current.string_value
+        elif widget.HasField('default'):
+            current = widget.options[widget.default]
+        options = [o for o in widget.options if OTHER_SYMBOL not in o and o != current]
+        if not options:
+            return False
+        self._set(label, string_value=self.rng.choice(options))
+        return True
+
+    async def rerun(self, kind, fragment_id=None):
+        back = BackMsg()
+        back.rerun_script.widget_states.widgets.extend(self.states.values())
+        back.rerun_script.cached_message_hashes.extend(self.cached)
+        if fragment_id:
+            back.rerun_script.fragment_id = fragment_id
+            back.rerun_script.is_auto_rerun = True
+        else:
+            # Exécution complète : le navigateur oublie les minuteries, réenregistrées pendant le rendu
+            self.timers.clear()
+        start = time.monotonic()
+        self.received = 0
+        try:
+            ok = await asyncio.wait_for(self._receive(back), self.timeout)
+        except asyncio.TimeoutError:
+            ok = False
+        self.samples.append((kind, time.monotonic() - start, ok, self.received))
+
+    async def _receive(self, back):
+        await self.ws.send(back.SerializeToString())
+        ok = True
+        while True:
+            data = await self.ws.recv()
+            self.received += len(data)
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            if msg.metadata.cacheable:
+                self.cached.add(msg.hash)
+            kind = msg.WhichOneof('type')
+            if kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type == 'exception':
+                    ok = False
+                elif element_type in ('radio', 'selectbox', 'checkbox'):
+                    widget = getattr(element, element_type)
+                    self.widgets[widget.label] = (element_type, widget)
+            elif kind == 'auto_rerun':
+                interval = msg.auto_rerun.interval
+                self.timers.setdefault(msg.auto_rerun.fragment_id, [interval, time.monotonic() + interval])
+            elif kind == 'stop_auto_rerun':
+                for fragment in msg.stop_auto_rerun.fragment_ids:
+                    self.timers.pop(fragment, None)
+            elif kind == 'script_finished':
+                return ok and msg.script_finished != FINISHED_WITH_COMPILE_ERROR
+
+async def run_sessions(url, sessions, duration, think, timeout, seed):
+    deadline = time.monotonic() + duration
+    clients = [Session(url, random.Random(seed * 1000 + i), timeout) for i in range(sessions)]
+    results = await asyncio.gather(*[c.run(deadline, think) for c in clients], return_exceptions=True)
+    # Connexion refusée ou fermée : session comptée en erreur
+    return [s for r in results for s in (r if isinstance(r, list) else [('start', float('nan'), False, 0)])]
+
+def _percentiles(latencies):
+    latencies = np.asarray([l for l in latencies if np.isfinite(l)])
+    if not len(latencies):
+        return [float('nan')] * 3
+    return [float(v) * 1000 for v in np.percentile(latencies, [50, 95, 99])]
+
+def run_level(url, pid, sessions, duration, think, timeout, seed=0):
+    """Un palier : sessions simultanées pendant duration secondes"""
+    peak_rss = [process_usage(pid)[1]]
+    stop = threading.Event()
+
+    def sample_rss():
+        while not stop.wait(0.2):
+            peak_rss.append(process_usage(pid)[1])
+
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sampler.start()
+    cpu_start, wall_start = process_usage(pid)[0], time.monotonic()
+    samples = asyncio.run(run_sessions(url, sessions, duration, think, timeout, seed))
+    wall = time.monotonic() - wall_start
+    cpu = process_usage(pid)[0] - cpu_start
+    stop.set()
+    sampler.join()
+
+    full = [l for kind, l, _, _ in samples if kind != 'fragment']
+    fragments = [l for kind, l, _, _ in samples if kind == 'fragment']
+    # Octets reçus par réexécution complète, hors première (page entière)
+    received = [n for kind, _, _, n in samples if kind not in ('start', 'fragment')]
+    p50, p95, p99 = _percentiles(full)
+    return {
+        'sessions': sessions,
+        'reruns': len(full),
+        'fragment_reruns': len(fragments),
+        'errors': sum(not ok for _, _, ok, _ in samples),
+        'throughput': len(samples) / wall,
+        'p50_ms': p50,
+        'p95_ms': p95,
+        'p99_ms': p99,
+        'fragment_p95_ms': _percentiles(fragments)[1],
+        'kb_per_rerun': float(np.mean(received)) / 1024 if received else float('nan'),
+        'cpu_pct': cpu / wall * 100,
+        'peak_rss_mb': max(peak_rss) / 2**20,
+        'kb_by_action': {
+            action: float(np.mean([n for kind, _, _, n in samples if kind == action])) / 1024
+            for action in sorted({kind for kind, _, _, _ in samples})
+        },
+        'p95_ms_by_action': {
+            action: _percentiles([l for kind, l, _, _ in samples if kind == action])[1]
+            for action in sorted({kind for kind, _, _, _ in samples})
+        },
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Test de charge du tableau de bord (sessions websocket simultanées)")
+    parser.add_argument('--sessions', type=int, nargs='+', default=[1, 2, 4, 8], help="Paliers de sessions simultanées")
+    parser.add_argument('--duration', type=float, default=20.0, help="Durée de chaque palier (secondes)")
+    parser.add_argument('--think', type=float, default=1.0, help="Temps de réflexion moyen entre deux actions (secondes)")
+    parser.add_argument('--timeout', type=float, default=60.0, help="Délai maximal d'une réexécution (secondes)")
+    parser.add_argument('--source', help="Fichier de rejeu CSV (généré si absent)")
+    parser.add_argument('--port', type=int, default=8599)
+    parser.add_argument('--json', help="Écrit les résultats dans ce fichier")
+    args = parser.parse_args(argv)
+
+    # Environnement isolé : rejeu et base temporaires
+    workdir = tempfile.mkdtemp(prefix='loadtest-')
+    if not args.source:
+        from market_data import FX_SYMBOL, ISRAEL_INDICES
+        from storage import DEFAULT_WATCHLIST
+        args.source = make_replay(
+            os.path.join(workdir, 'replay.csv'), DEFAULT_WATCHLIST + list(ISRAEL_INDICES) + [FX_SYMBOL]
+        )
+    env = dict(os.environ, TRACKER_DATA_SOURCE=f"replay:{os.path.abspath(args.source)}",
+               TRACKER_DB_PATH=os.path.join(workdir, 'tracker.db'))
+    server = start_server(args.port, env, os.path.join(workdir, 'server.log'))
+    url = f"ws://localhost:{args.port}/_stcore/stream"
+
+    print(f"{'sessions':>8} {'réexéc.':>8} {'fragm.':>7} {'erreurs':>7} {'débit/s':>8} {'p50 ms':>7} "
+          f"{'p95 ms':>7} {'p99 ms':>7} {'fr. p95':>7} {'Ko/réex.':>8} {'CPU %':>6} {'RSS Mo':>7}")
+    results = []
+    try:
+        for level, sessions in enumerate(args.sessions):
+            result = run_level(url, server.pid, sessions, args.duration, args.think, args.timeout, seed=level)
+            results.append(result)
+            print("{sessions:>8} {reruns:>8} {fragment_reruns:>7} {errors:>7} {throughput:>8.1f} {p50_ms:>7.0f} "
+                  "{p95_ms:>7.0f} {p99_ms:>7.0f} {fragment_p95_ms:>7.0f} {kb_per_rerun:>8.1f} {cpu_pct:>6.0f} {peak_rss_mb:>7.0f}".format(**result),
+                  flush=True)
+    finally:
+        server.terminate()
+        server.wait(10)
+
+    print(f"Journal du serveur : {os.path.join(workdir, 'server.log')}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+"""Calendrier des séances TASE / NYSE : fuseaux, horaires, semaines de cotation et jours fériés
+
+Référence unique pour le statut du marché (market_data.market_session),
+l'alignement des barres agrégées (resample), la zone de séance des graphiques
+(charts), les agrégats intraday et le contrôle qualité des historiques.
+
+Les fêtes juives fermant la TASE sont calculées pour toute année à partir
+du calendrier hébraïque (date de Roch Hachana par le molad et les règles de
+report), puis placées relativement à Roch Hachana (fêtes d'automne) ou à
+Pessah (fêtes de printemps).
+"""
+import datetime
+import functools
+
+import pandas as pd
+import pytz
+from pandas.tseries.holiday import (
+    AbstractHolidayCalendar, GoodFriday, Holiday, USLaborDay, USMartinLutherKingJr, USMemorialDay,
+    USPresidentsDay, USThanksgivingDay, nearest_workday, sunday_to_monday,
+)
+
+TIMEZONES = {
+    'TASE': pytz.timezone('Asia/Jerusalem'),
+    'US': pytz.timezone('America/New_York'),
+}
+
+# Ouverture de séance (enchère d'ouverture comprise) : statut du marché et alignement des barres
+SESSION_OPEN = {
+    'TASE': pd.Timedelta(hours=9, minutes=45),
+    'US': pd.Timedelta(hours=9, minutes=30),
+}
+SESSIONS = {session: (TIMEZONES[session], SESSION_OPEN[session]) for session in TIMEZONES}
+
+# Début de la négociation continue : premières barres attendues
+CONTINUOUS_OPEN = {
+    'TASE': pd.Timedelta(hours=10),
+    'US': pd.Timedelta(hours=9, minutes=30),
+}
+
+# Fin de la négociation continue selon le jour (lundi = 0)
+SESSION_CLOSES = {
+    'TASE': {0: '17:15', 1: '17:15', 2: '17:15', 3: '17:15', 4: '13:50', 6: '15:40'},
+    'US': {0: '16:00', 1: '16:00', 2: '16:00', 3: '16:00', 4: '16:00'},
+}
+
+# Semaines de cotation (depuis, jours ouverts) : la TASE est passée du dimanche-jeudi au lundi-vendredi
+# le 5 janvier 2026
+WEEKMASKS = {
+    'TASE': [
+        (pd.Timestamp('1990-01-01'), 'Sun Mon Tue Wed Thu'),
+        (pd.Timestamp('2026-01-05'), 'Mon Tue Wed Thu Fri'),
+    ],
+    'US': [(pd.Timestamp('1990-01-01'), 'Mon Tue Wed Thu Fri')],
+}
+_WEEKDAYS = {'Mon': 0, 'Tue': 1, 'Wed': 2, 'Thu': 3, 'Fri': 4, 'Sat': 5, 'Sun': 6}
+
+def session_for_symbol(symbol):
+    """Place de cotation d'un symbole"""
+    if symbol.endswith('.TA') or symbol.startswith('^TA'):
+        return 'TASE'
+    return 'US'
+
+# ----------------------------------------------------------------------
+# Jours fériés
+# ----------------------------------------------------------------------
+class NyseHolidays(AbstractHolidayCalendar):
+    """Jours fériés du NYSE (hors fermetures exceptionnelles)"""
+
+    rules = [
+        Holiday('NewYearsDay', month=1, day=1, observance=sunday_to_monday),
+        USMartinLutherKingJr,
+        USPresidentsDay,
+        GoodFriday,
+        USMemorialDay,
+        Holiday('Juneteenth', month=6, day=19, start_date='2022-01-01', observance=nearest_workday),
+        Holiday('IndependenceDay', month=7, day=4, observance=nearest_workday),
+        USLaborDay,
+        USThanksgivingDay,
+        Holiday('Christmas', month=12, day=25, observance=nearest_workday),
+    ]
+
+def _hebrew_leap(year):
+    return (7 * year + 1) % 19 < 7
+
+def _hebrew_elapsed_days(year):
+    """Jours écoulés depuis l'origine du calendrier hébraïque jusqu'à Roch Hachana de l'année"""
+    months = (235 * year - 234) // 19
+    parts = 12084 + 13753 * months
+    day = months * 29 + parts // 25920
+    # Report d'un jour pour que Yom Kippour et Hochaana Rabba ne tombent ni un vendredi ni un dimanche
+    if (3 * (day + 1)) % 7 < 3:
+        day += 1
+    return day
+
+def _hebrew_new_year_delay(year):
+    """Reports supplémentaires (années de 356 ou 382 jours interdites)"""
+    ny0, ny1, ny2 = (_hebrew_elapsed_days(year + k) for k in (-1, 0, 1))
+    if ny2 - ny1 == 356:
+        return 2
+    if ny1 - ny0 == 382:
+        return 1
+    return 0
+
+# Roch Hachana 5785 : 3 octobre 2024 (calage des jours écoulés sur le calendrier grégorien)
+_HEBREW_ORIGIN = datetime.date(2024, 10, 3).toordinal() - _hebrew_elapsed_days(5785) - _hebrew_new_year_delay(5785)
+
+def rosh_hashana(hebrew_year):
+    """Date grégorienne du 1er Tichri d'une année hébraïque"""
+    return datetime.date.fromordinal(
+        _HEBREW_ORIGIN + _hebrew_elapsed_days(hebrew_year) + _hebrew_new_year_delay(hebrew_year)
+    )
+
+def israeli_holidays(year):
+    """Jours de fermeture de la TASE pour les fêtes d'une année grégorienne"""
+    days = []
+    # Printemps : année hébraïque commencée l'automne précédent; 15 Nissan = 1er Tichri suivant - 163 jours
+    pesach = rosh_hashana(year + 3761) - datetime.timedelta(days=163)
+    independence = pesach + datetime.timedelta(days=20)
+    # Yom Ha'atzmaut avancé au jeudi (vendredi, samedi) ou repoussé au mardi (lundi)
+    independence += datetime.timedelta(days={4: -1, 5: -2, 0: 1}.get(independence.weekday(), 0))
+    days += [
+        pesach - datetime.timedelta(days=30),                                         # Pourim
+        pesach - datetime.timedelta(days=1), pesach,                                  # Pessah
+        pesach + datetime.timedelta(days=5), pesach + datetime.timedelta(days=6),     # 7e jour de Pessah
+        independence,                                                                  # Yom Ha'atzmaut
+        pesach + datetime.timedelta(days=49), pesach + datetime.timedelta(days=50),   # Chavouot
+    ]
+    # Automne : année hébraïque commençant cette année
+    new_year = rosh_hashana(year + 3761)
+    days += [
+        new_year, new_year + datetime.timedelta(days=1),                              # Roch Hachana
+        new_year + datetime.timedelta(days=9),                                        # Yom Kippour
+        new_year + datetime.timedelta(days=14),                                       # Souccot
+        new_year + datetime.timedelta(days=21),                                       # Sim'hat Torah
+    ]
+    return days
+
+@functools.lru_cache(maxsize=None)
+def holidays(session, year):
+    """Jours fériés (dates locales) d'une année"""
+    if session == 'US':
+        return NyseHolidays().holidays(f'{year}-01-01', f'{year}-12-31').as_unit('ns')
+    return pd.DatetimeIndex(sorted(israeli_holidays(year))).as_unit('ns')
+
+# ----------------------------------------------------------------------
+# Jours et horaires de séance
+# ----------------------------------------------------------------------
+def _weekmask(session, day):
+    """Jours ouverts de la semaine en vigueur à une date"""
+    return [mask for since, mask in WEEKMASKS[session] if since <= day][-1]
+
+@functools.lru_cache(maxsize=1024)
+def session_days(session, start, end):
+    """Jours de séance (dates locales sans fuseau) entre deux dates incluses"""
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    closed = [day for year in range(start.year, end.year + 1) for day in holidays(session, year)]
+    sinces = [since for since, _ in WEEKMASKS[session]] + [pd.Timestamp.max.normalize()]
+    days = [
+        pd.bdate_range(max(start, since), min(end, until - pd.Timedelta(days=1)), freq='C',
+                       weekmask=mask, holidays=closed)
+        for (since, mask), until in zip(WEEKMASKS[session], sinces[1:])
+        if max(start, since) <= min(end, until - pd.Timedelta(days=1))
+    ]
+    if not days:
+        return pd.DatetimeIndex([]).as_unit('ns')
+    return days[0].append(days[1:]).as_unit('ns')
+
+def is_session_day(session, day):
+    """Jour de cotation (ni week-end de la place, ni férié)"""
+    day = pd.Timestamp(day).normalize()
+    if day.weekday() not in [_WEEKDAYS[d] for d in _weekmask(session, day).split()]:
+        return False
+    return day not in holidays(session, day.year)
+
+def session_close(session, weekday):
+    """Fin de la négociation continue (décalage depuis minuit) d'un jour de la semaine, None si fermé"""
+    close = SESSION_CLOSES[session].get(weekday)
+    return pd.Timedelta(close + ':00') if close else None
+
+def session_hours(session, day):
+    """(ouverture, clôture) en heure locale d'un jour de séance, None si la place est fermée"""
+    day = pd.Timestamp(day).normalize()
+    close = session_close(session, day.weekday())
+    if close is None or not is_session_day(session, day):
+        return None
+    tz = TIMEZONES[session]
+    return (tz.localize((day + SESSION_OPEN[session]).to_pydatetime()),
+            tz.localize((day + close).to_pydatetime()))
+
+def session_status(session, now=None):
+    """Statut de la place : (ouvert, raison) avec raison parmi 'open', 'weekend', 'holiday', 'closed'"""
+    tz = TIMEZONES[session]
+    local = now.astimezone(tz) if now is not None else pd.Timestamp.now(tz=tz)
+    day = pd.Timestamp(local.replace(tzinfo=None)).normalize()
+    if day.weekday() not in [_WEEKDAYS[d] for d in _weekmask(session, day).split()]:
+        return False, 'weekend'
+    if day in holidays(session, day.year):
+        return False, 'holiday'
+    hours = session_hours(session, day)
+    if hours is not None and hours[0] <= local <= hours[1]:
+        return True, 'open'
+    return False, 'closed'
+
+def weekly_hours(session, day=None):
+    """Horaires 'HH:MM' (ouverture, clôture) des jours ouverts de la semaine en vigueur, lundi = 0"""
+    tz = TIMEZONES[session]
+    day = pd.Timestamp.now(tz=tz).tz_localize(None) if day is None else pd.Timestamp(day)
+    minutes = SESSION_OPEN[session] // pd.Timedelta(minutes=1)
+    open_time = f"{minutes // 60:02d}:{minutes % 60:02d}"
+    weekdays = sorted(_WEEKDAYS[d] for d in _weekmask(session, day.normalize()).split())
+    return {weekday: (open_time, SESSION_CLOSES[session][weekday]) for weekday in weekdays}
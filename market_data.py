@@ -0,0 +1,264 @@
+"""Couche d'accès aux données de marché, indépendante de Streamlit"""
+import os
+
+import numpy as np
+import pandas as pd
+import yfinance as yf
+
+from market_calendar import TIMEZONES, session_status
+from symbol_master import UNIT_SCALE, get_symbol_master
+
+QUOTE_COLUMNS = ['price', 'prev_close', 'change', 'change_pct', 'volume']
+
+# Taux USD/ILS (shekels par dollar)
+FX_SYMBOL = 'ILS=X'
+
+# Indices TASE suivis (et deux valeurs de référence)
+ISRAEL_INDICES = {
+    '^TA125': 'TA-125',
+    '^TA35': 'TA-35',
+    '^TA90': 'TA-90',
+    '^TA_BANKS': 'TA-Banks',
+    '^TA_OILGAS': 'TA-Oil&Gas',
+    '^TA_TECH': 'TA-Technology',
+    '^TA_REAL_ESTATE': 'TA-Real Estate',
+    '^TA_BIO_SCIENCE': 'TA-Biomed',
+    'TEVA': 'Teva (référence)',
+    'LUMI.TA': 'Bank Leumi (référence)'
+}
+
+ISRAEL_TIMEZONE = TIMEZONES['TASE']
+
+# Profondeur d'historique correspondant aux périodes yfinance
+PERIOD_OFFSETS = {
+    '1d': pd.Timedelta(days=1),
+    '5d': pd.Timedelta(days=5),
+    '1mo': pd.DateOffset(months=1),
+    '3mo': pd.DateOffset(months=3),
+    '6mo': pd.DateOffset(months=6),
+    '1y': pd.DateOffset(years=1),
+    '2y': pd.DateOffset(years=2),
+    '5y': pd.DateOffset(years=5),
+}
+
+# Colonnes de prix d'un historique converties de l'unité de cotation vers la devise
+HISTORY_PRICE_COLUMNS = ['Open', 'High', 'Low', 'Close', 'Adj Close', 'Dividends']
+
+def unit_scales(symbols):
+    """Facteur unité de cotation -> devise de chaque symbole (agorot -> shekels pour les actions TASE)"""
+    units = get_symbol_master().columns(symbols, ('unit',))['unit']
+    return np.array([UNIT_SCALE.get(unit, 1.0) for unit in units], dtype=float)
+
+def history_to_currency(hist, symbol):
+    """Historique OHLCV d'un symbole en devise (volumes et divisions inchangés)"""
+    scale = unit_scales([symbol])[0]
+    if hist is None or hist.empty or scale == 1.0:
+        return hist
+    hist = hist.copy()
+    columns = hist.columns.intersection(HISTORY_PRICE_COLUMNS)
+    hist[columns] = hist[columns] * scale
+    return hist
+
+def closes_to_currency(closes):
+    """Matrice de clôtures (dates x symboles) en devise"""
+    if closes.empty:
+        return closes
+    return closes * unit_scales(closes.columns.astype(str))
+
+def empty_quotes(symbols):
+    """Tableau de cotations vide (NaN) pour une liste de symboles"""
+    return pd.DataFrame(
+        index=pd.Index(list(symbols), name='symbol'),
+        columns=QUOTE_COLUMNS,
+        dtype=float
+    )
+
+def quotes_from_closes(closes, symbols, volumes=None):
+    """Calcule prix et variations à partir d'une matrice de clôtures (dates x symboles)
+
+    volumes : matrice des volumes de mêmes dimensions (volume de la dernière barre), optionnelle.
+    """
+    quotes = empty_quotes(symbols)
+    closes = closes.reindex(columns=list(symbols)).ffill()
+    if closes.empty:
+        return quotes
+
+    # Calcul vectorisé sur tous les symboles
+    quotes['price'] = closes.iloc[-1]
+    quotes['prev_close'] = closes.iloc[-2] if len(closes) > 1 else closes.iloc[-1]
+    quotes['change'] = quotes['price'] - quotes['prev_close']
+    quotes['change_pct'] = (quotes['change'] / quotes['prev_close'].replace(0, np.nan) * 100).fillna(0)
+    if volumes is not None and not volumes.empty:
+        quotes['volume'] = volumes.reindex(columns=list(symbols)).iloc[-1]
+    return quotes
+
+def market_session(now=None):
+    """Statut de la TASE : (ouvert, raison) avec raison parmi 'open', 'weekend', 'holiday', 'closed'"""
+    return session_status('TASE', now)
+
+class YahooSource:
+    """Source de données yfinance
+
+    Yahoo cote les actions TASE en agorot : tous les cours sont convertis en
+    devise (unité du référentiel des symboles) avant de sortir de la source.
+    """
+
+    name = 'yahoo'
+
+    def get_quotes(self, symbols):
+        """Cotations groupées en un seul téléchargement"""
+        symbols = list(symbols)
+        if not symbols:
+            return empty_quotes(symbols)
+        try:
+            data = yf.download(
+                symbols, period='5d', interval='1d',
+                group_by='ticker', auto_adjust=False, progress=False, threads=True
+            )
+        except Exception:
+            return empty_quotes(symbols)
+        if data is None or data.empty:
+            return empty_quotes(symbols)
+
+        if isinstance(data.columns, pd.MultiIndex):
+            closes = data.xs('Close', axis=1, level=-1)
+            volumes = data.xs('Volume', axis=1, level=-1)
+        else:
+            closes = data[['Close']].set_axis([symbols[0]], axis=1)
+            volumes = data[['Volume']].set_axis([symbols[0]], axis=1)
+        # Volume de la dernière séance cotée de chaque symbole (les jours sans cotation sont vides)
+        return quotes_from_closes(closes_to_currency(closes), symbols, volumes.where(closes.notna()).ffill())
+
+    def get_history(self, symbol, period, interval):
+        """Historique OHLCV d'un symbole"""
+        return history_to_currency(yf.Ticker(symbol).history(period=period, interval=interval), symbol)
+
+    def get_history_range(self, symbol, start, end, interval):
+        """Historique OHLCV d'un symbole entre deux instants (fin exclue)
+
+        Cours non ajustés des dividendes (Yahoo les ajuste toujours des divisions),
+        avec les colonnes Dividends et Stock Splits pour la table des opérations.
+        """
+        hist = yf.Ticker(symbol).history(start=start, end=end, interval=interval, auto_adjust=False, actions=True)
+        return history_to_currency(hist, symbol)
+
+    def get_closes(self, symbols, start, interval='1d'):
+        """Panneau de clôtures aligné (dates x symboles) depuis une date, en un téléchargement"""
+        symbols = list(symbols)
+        data = yf.download(
+            symbols, start=start, interval=interval,
+            group_by='ticker', auto_adjust=False, progress=False, threads=True
+        )
+        if data is None or data.empty:
+            return pd.DataFrame(columns=symbols, dtype=float)
+        if isinstance(data.columns, pd.MultiIndex):
+            closes = data.xs('Close', axis=1, level=-1)
+        else:
+            closes = data[['Close']].set_axis([symbols[0]], axis=1)
+        return closes_to_currency(closes.reindex(columns=symbols))
+
+    def get_info(self, symbol):
+        """Informations sur l'entreprise"""
+        return yf.Ticker(symbol).info
+
+class ReplaySource:
+    """Source locale rejouant des barres enregistrées (tests, charge, hors ligne)
+
+    Le fichier CSV contient les colonnes timestamp, symbol, close et
+    optionnellement open, high, low, volume, dans l'unité de cotation de
+    Yahoo (agorot pour les actions TASE). Chaque appel à advance() fait
+    avancer l'horloge de rejeu d'un horodatage.
+    """
+
+    name = 'replay'
+
+    def __init__(self, path_or_frame, start=None):
+        if isinstance(path_or_frame, pd.DataFrame):
+            bars = path_or_frame.copy()
+        else:
+            bars = pd.read_csv(path_or_frame)
+        bars.columns = [c.lower() for c in bars.columns]
+        bars['timestamp'] = pd.to_datetime(bars['timestamp'], utc=True)
+        for col in ('open', 'high', 'low'):
+            if col not in bars:
+                bars[col] = bars['close']
+        if 'volume' not in bars:
+            bars['volume'] = 0
+        # Cours enregistrés dans l'unité de cotation, convertis une fois en devise
+        symbols = bars['symbol'].astype(str).unique()
+        scale = bars['symbol'].astype(str).map(dict(zip(symbols, unit_scales(symbols))))
+        bars[['open', 'high', 'low', 'close']] = bars[['open', 'high', 'low', 'close']].mul(scale, axis=0)
+        self.bars = bars.sort_values(['timestamp', 'symbol'], kind='stable').reset_index(drop=True)
+        self.timestamps = self.bars['timestamp'].drop_duplicates().to_numpy()
+        # Matrice des clôtures, calculée une fois pour toutes les cotations
+        self.closes = self.bars.pivot_table(index='timestamp', columns='symbol', values='close', aggfunc='last')
+        self.volumes = self.bars.pivot_table(index='timestamp', columns='symbol', values='volume', aggfunc='last')
+        self.cursor = len(self.timestamps) - 1 if start is None else start
+
+    @property
+    def now(self):
+        """Horodatage courant du rejeu"""
+        return pd.Timestamp(self.timestamps[self.cursor])
+
+    def advance(self, steps=1):
+        """Avance l'horloge de rejeu; renvoie False en fin de fichier"""
+        if self.cursor + steps >= len(self.timestamps):
+            self.cursor = len(self.timestamps) - 1
+            return False
+        self.cursor += steps
+        return True
+
+    def get_quotes(self, symbols):
+        """Cotations à l'instant courant du rejeu"""
+        closes = self.closes.loc[:self.now]
+        return quotes_from_closes(closes, symbols, self.volumes.loc[:self.now].ffill())
+
+    def get_history(self, symbol, period, interval=None):
+        """Barres enregistrées d'un symbole jusqu'à l'instant courant"""
+        bars = self.bars[(self.bars['symbol'] == symbol) & (self.bars['timestamp'] <= self.now)]
+        if period in PERIOD_OFFSETS:
+            bars = bars[bars['timestamp'] > self.now - PERIOD_OFFSETS[period]]
+        return self._to_history(bars)
+
+    def get_history_range(self, symbol, start, end, interval=None):
+        """Barres enregistrées d'un symbole entre deux instants (fin exclue), jusqu'à l'instant courant"""
+        timestamps = self.bars['timestamp']
+        bars = self.bars[
+            (self.bars['symbol'] == symbol) & (timestamps >= start)
+            & (timestamps < end) & (timestamps <= self.now)
+        ]
+        return self._to_history(bars)
+
+    @staticmethod
+    def _to_history(bars):
+        """Barres au format yfinance (index horodaté, colonnes OHLCV)"""
+        hist = bars.set_index('timestamp')[['open', 'high', 'low', 'close', 'volume']]
+        hist.columns = ['Open', 'High', 'Low', 'Close', 'Volume']
+        hist.index.name = 'Datetime'
+        return hist
+
+    def get_closes(self, symbols, start, interval=None):
+        """Panneau de clôtures enregistrées depuis une date"""
+        closes = self.closes.loc[pd.Timestamp(start, tz='UTC'):self.now]
+        return closes.reindex(columns=list(symbols))
+
+    def get_info(self, symbol):
+        """Pas d'informations entreprise en rejeu"""
+        return {}
+
+def get_data_source(spec=None, shared_cache=None):
+    """Source de données selon TRACKER_DATA_SOURCE ('yahoo' ou 'replay:<fichier.csv>')
+
+    Si TRACKER_SHARED_CACHE désigne un fichier (ex: /dev/shm/tracker_cache.db),
+    la source passe par le cache partagé entre les processus de l'hôte.
+    """
+    spec = spec or os.environ.get('TRACKER_DATA_SOURCE', 'yahoo')
+    if spec.startswith('replay:'):
+        source = ReplaySource(spec.split(':', 1)[1])
+    else:
+        source = YahooSource()
+    shared_cache = shared_cache or os.environ.get('TRACKER_SHARED_CACHE')
+    if shared_cache:
+        from shared_cache import SharedCache, SharedSource
+        source = SharedSource(source, SharedCache(shared_cache))
+    return source
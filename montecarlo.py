@@ -0,0 +1,79 @@
+"""Bandes de prévision par simulation Monte Carlo (bootstrap des rendements ou mouvement brownien géométrique)"""
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILES = (0.025, 0.25, 0.5, 0.75, 0.975)
+
+def fit_log_returns(close):
+    """Rendements logarithmiques, dérive et volatilité par pas"""
+    close = np.asarray(close, dtype=float)
+    close = close[np.isfinite(close) & (close > 0)]
+    returns = np.diff(np.log(close))
+    if len(returns) == 0:
+        return returns, 0.0, 0.0
+    return returns, float(returns.mean()), float(returns.std(ddof=1)) if len(returns) > 1 else 0.0
+
+def step_returns(returns, bars_per_step):
+    """Rendements sur bars_per_step barres consécutives (ex. une séance de barres 5 minutes)
+
+    Sommes glissantes des rendements par barre (forme et autocorrélation de la
+    séance conservées); historique plus court qu'un pas : moyenne et écart
+    à la moyenne mis à l'échelle (k x mu, racine(k) x sigma).
+    """
+    k = int(bars_per_step)
+    if k <= 1 or len(returns) == 0:
+        return returns
+    if len(returns) >= k:
+        cumulative = np.r_[0.0, np.cumsum(returns)]
+        return cumulative[k:] - cumulative[:-k]
+    mu = returns.mean()
+    return k * mu + (returns - mu) * np.sqrt(k)
+
+def simulate_log_paths(close, horizon, n_paths=100_000, method='bootstrap', chunk_size=25_000,
+                       dtype=np.float32, seed=None, bars_per_step=1):
+    """Rendements logarithmiques cumulés simulés, tableau (horizon x n_paths)
+
+    Les trajectoires sont générées par blocs de chunk_size : seuls le résultat
+    et les tirages d'un bloc sont en mémoire (float32 par défaut). Chaque pas
+    couvre bars_per_step barres de l'historique.
+    """
+    returns, _, _ = fit_log_returns(close)
+    returns = step_returns(returns, bars_per_step)
+    mu = float(returns.mean()) if len(returns) else 0.0
+    sigma = float(returns.std(ddof=1)) if len(returns) > 1 else 0.0
+    rng = np.random.default_rng(seed)
+    paths = np.empty((horizon, n_paths), dtype=dtype)
+    if len(returns) == 0:
+        paths.fill(0)
+        return paths
+    sample = returns.astype(dtype)
+
+    for start in range(0, n_paths, chunk_size):
+        size = (min(chunk_size, n_paths - start), horizon)
+        if method == 'bootstrap':
+            steps = sample[rng.integers(0, len(sample), size=size)]
+        elif method == 'gbm':
+            # Rendements log ~ N(mu, sigma) : la correction -sigma²/2 est déjà dans mu
+            steps = rng.standard_normal(size=size, dtype=dtype)
+            steps *= dtype(sigma)
+            steps += dtype(mu)
+        else:
+            raise ValueError(f"Méthode inconnue: {method}")
+        np.cumsum(steps, axis=1, out=steps)
+        paths[:, start:start + size[0]] = steps.T
+    return paths
+
+def forecast_bands(close, horizon, n_paths=100_000, method='bootstrap', quantiles=DEFAULT_QUANTILES,
+                   chunk_size=25_000, dtype=np.float32, seed=None, bars_per_step=1):
+    """Quantiles de prix simulés pour chaque pas de l'horizon (lignes = pas 1..horizon)
+
+    bars_per_step : barres de l'historique par pas (barres intraday par séance pour un horizon en jours).
+    """
+    close = np.asarray(close, dtype=float)
+    # Départ de la dernière clôture valide (la dernière barre peut être vide ou NaN)
+    close = close[np.isfinite(close) & (close > 0)]
+    paths = simulate_log_paths(close, horizon, n_paths, method, chunk_size, dtype, seed, bars_per_step)
+    # Quantiles sur les rendements cumulés, puis passage aux prix (transformation monotone)
+    log_bands = np.quantile(paths, quantiles, axis=1)
+    bands = (close[-1] if len(close) else np.nan) * np.exp(log_bands.T.astype(float))
+    return pd.DataFrame(bands, index=pd.RangeIndex(1, horizon + 1, name='step'), columns=list(quantiles))
@@ -0,0 +1,92 @@
+"""Envoi des notifications email (depuis le dashboard ou le worker d'alertes)"""
+import logging
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+from symbol_master import CURRENCY_SIGNS, get_symbol_master
+
+logger = logging.getLogger(__name__)
+
+def send_email(config, subject, body, to_email):
+    """Envoie un email HTML avec la configuration SMTP donnée (lève en cas d'échec)"""
+    msg = MIMEMultipart()
+    msg['From'] = config['email']
+    msg['To'] = to_email
+    msg['Subject'] = subject
+    msg.attach(MIMEText(body, 'html'))
+
+    server = smtplib.SMTP(config['smtp_server'], config['smtp_port'])
+    try:
+        server.starttls()
+        server.login(config['email'], config['password'])
+        server.send_message(msg)
+    finally:
+        server.quit()
+
+def currency_prefix(symbol):
+    """Symbole monétaire selon la devise du référentiel (aucun pour un écart de double cotation)"""
+    if '/' in symbol:
+        return ""
+    return CURRENCY_SIGNS.get(get_symbol_master().currency(symbol), "$")
+
+def format_alert_email(symbol, current_price, alert, timestamp):
+    """Sujet et corps HTML d'une alerte de prix déclenchée"""
+    currency_symbol = currency_prefix(symbol)
+    subject = f"🚨 התראת מחיר / Alerte prix - {symbol}"
+    body = f"""
+            <h2>התראת מחיר הופעלה / Alerte de prix déclenchée</h2>
+            <p><b>סימן / Symbole:</b> {symbol}</p>
+            <p><b>מחיר נוכחי / Prix actuel:</b> {currency_symbol}{current_price:.2f}</p>
+            <p><b>תנאי / Condition:</b> {alert['condition']} {currency_symbol}{alert['price']:.2f}</p>
+            <p><b>תאריך (UTC+2) / Date:</b> {timestamp}</p>
+            """
+    return subject, body
+
+def format_digest_email(triggered, timestamp):
+    """Un seul email pour toutes les alertes déclenchées d'un utilisateur [(symbole, prix, alerte)]"""
+    if len(triggered) == 1:
+        symbol, current_price, alert = triggered[0]
+        return format_alert_email(symbol, current_price, alert, timestamp)
+    symbols = sorted({symbol for symbol, _, _ in triggered})
+    subject = f"🚨 {len(triggered)} התראות מחיר / Alertes prix - {', '.join(symbols)}"
+    rows = "".join(
+        f"<tr><td>{symbol}</td><td>{currency_prefix(symbol)}{current_price:.2f}</td>"
+        f"<td>{alert['condition']} {currency_prefix(symbol)}{alert['price']:.2f}</td></tr>"
+        for symbol, current_price, alert in triggered
+    )
+    body = f"""
+            <h2>התראות מחיר הופעלו / Alertes de prix déclenchées</h2>
+            <table>
+                <tr><th>סימן / Symbole</th><th>מחיר נוכחי / Prix actuel</th><th>תנאי / Condition</th></tr>
+                {rows}
+            </table>
+            <p><b>תאריך (UTC+2) / Date:</b> {timestamp}</p>
+            """
+    return subject, body
+
+class NotificationDispatcher:
+    """Envoi asynchrone des emails, hors du chemin critique d'évaluation"""
+
+    def __init__(self, max_workers=4, send=send_email):
+        self._send = send
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='notify')
+        self.sent = 0
+        self.failed = 0
+
+    def _deliver(self, config, subject, body, to_email):
+        try:
+            self._send(config, subject, body, to_email)
+            self.sent += 1
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Échec d'envoi à %s: %s", to_email, e)
+
+    def submit(self, config, subject, body, to_email):
+        """Met un email en file d'envoi et rend la main immédiatement"""
+        return self._executor.submit(self._deliver, config, subject, body, to_email)
+
+    def shutdown(self, wait=True):
+        """Attend la fin des envois en cours"""
+        self._executor.shutdown(wait=wait)
@@ -0,0 +1,208 @@
+"""Courbe de valeur historique du portefeuille : rendements pondérés (temps / capitaux), drawdown, contributions"""
+import numpy as np
+import pandas as pd
+
+from symbol_master import get_symbol_master
+
+def lots_frame(portfolio):
+    """Aplatit le portefeuille {symbole: [lots]} en DataFrame (symbol, shares, buy_price, date)"""
+    rows = [
+        (symbol, lot['shares'], lot['buy_price'], lot['date'])
+        for symbol, lots in portfolio.items()
+        for lot in lots
+    ]
+    lots = pd.DataFrame(rows, columns=['symbol', 'shares', 'buy_price', 'date'])
+    lots['date'] = pd.to_datetime(lots['date'], errors='coerce')
+    return lots.dropna(subset=['date']).sort_values('date', kind='stable').reset_index(drop=True)
+
+def xirr(dates, amounts, low=-0.9999, high=10.0, tol=1e-10, max_iter=200):
+    """Taux de rendement interne annualisé de flux datés (bissection)"""
+    amounts = np.asarray(amounts, dtype=float)
+    if len(amounts) < 2 or not (amounts < 0).any() or not (amounts > 0).any():
+        return np.nan
+    dates = pd.DatetimeIndex(dates)
+    years = ((dates - dates.min()) / pd.Timedelta(days=365.25)).to_numpy()
+
+    def npv(rate):
+        return np.sum(amounts / np.power(1.0 + rate, years))
+
+    f_low, f_high = npv(low), npv(high)
+    if np.sign(f_low) == np.sign(f_high):
+        return np.nan
+    for _ in range(max_iter):
+        mid = (low + high) / 2
+        f_mid = npv(mid)
+        if abs(f_mid) < tol or (high - low) / 2 < tol:
+            return mid
+        if np.sign(f_mid) == np.sign(f_low):
+            low, f_low = mid, f_mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+class EquityCurve:
+    """Courbe de valeur du portefeuille, en USD, maintenue de façon incrémentale
+
+    Chaque lot entre dans la courbe à sa date d'achat, pour son coût d'achat
+    (flux externe). La dernière barre reçue est provisoire : elle est
+    recalculée à chaque mise à jour jusqu'à l'arrivée de la barre suivante.
+    """
+
+    def __init__(self, lots, symbols=None):
+        self.lots = lots.reset_index(drop=True)
+        self.symbols = list(symbols) if symbols is not None else sorted(self.lots['symbol'].unique())
+        self._symbol_pos = {s: i for i, s in enumerate(self.symbols)}
+        self._ils = get_symbol_master().columns(self.symbols, ('currency',))['currency'] == 'ILS'
+        self._lot_symbol = self.lots['symbol'].map(self._symbol_pos).to_numpy()
+        self._lot_dates = self.lots['date'].to_numpy(dtype='datetime64[ns]')
+        self._lot_shares = self.lots['shares'].to_numpy(dtype=float)
+        self._lot_price = self.lots['buy_price'].to_numpy(dtype=float)
+
+        n = len(self.symbols)
+        self._state = {
+            'last_date': None,
+            'next_lot': 0,
+            'positions': np.zeros(n),
+            'last_prices': np.full(n, np.nan),
+            'cost_by_symbol': np.zeros(n),
+            'last_value': 0.0,
+            'twr_index': 1.0,
+            'peak': 1.0,
+        }
+        self._committed = dict(self._state)
+        self._chunks = []
+        self._provisional = None
+        self._frame = None
+
+    @property
+    def last_date(self):
+        return self._state['last_date']
+
+    def _process(self, dates, prices, fx, state):
+        """Passe vectorisée sur un bloc de barres; renvoie le bloc d'historique et le nouvel état"""
+        n_dates = len(dates)
+        n_symbols = len(self.symbols)
+        date_values = dates.to_numpy(dtype='datetime64[ns]')
+
+        # Lots entrant dans ce bloc (triés par date) : première barre >= date d'achat
+        first = state['next_lot']
+        last = np.searchsorted(self._lot_dates, date_values[-1], side='right')
+        lot_slice = slice(first, last)
+        lot_rows = np.searchsorted(date_values, self._lot_dates[lot_slice], side='left')
+        lot_cols = self._lot_symbol[lot_slice]
+
+        # Conversion en USD (fx = ILS par USD)
+        conv = np.where(self._ils[None, :], 1.0 / fx[:, None], 1.0)
+
+        share_deltas = np.zeros((n_dates, n_symbols))
+        np.add.at(share_deltas, (lot_rows, lot_cols), self._lot_shares[lot_slice])
+        shares = state['positions'] + np.cumsum(share_deltas, axis=0)
+
+        lot_costs = self._lot_shares[lot_slice] * self._lot_price[lot_slice] * conv[lot_rows, lot_cols]
+        flows = np.zeros(n_dates)
+        np.add.at(flows, lot_rows, lot_costs)
+        cost_by_symbol = state['cost_by_symbol'].copy()
+        np.add.at(cost_by_symbol, lot_cols, lot_costs)
+
+        # Prix manquants : dernier prix connu
+        filled = pd.DataFrame(np.vstack([state['last_prices'], prices])).ffill().to_numpy()[1:]
+        values = np.nan_to_num(shares * filled * conv)
+        value = values.sum(axis=1)
+
+        # Rendement journalier, flux investis en début de barre
+        previous = np.r_[state['last_value'], value[:-1]]
+        base = previous + flows
+        returns = np.divide(value, base, out=np.ones(n_dates), where=base > 0) - 1.0
+        twr_index = state['twr_index'] * np.cumprod(1.0 + returns)
+        peak = np.maximum.accumulate(np.r_[state['peak'], twr_index])[1:]
+
+        chunk = pd.DataFrame({
+            'value': value,
+            'flows': flows,
+            'invested': state['cost_by_symbol'].sum() + np.cumsum(flows),
+            'return': returns,
+            'twr_index': twr_index,
+            'drawdown': twr_index / peak - 1.0,
+        }, index=dates)
+
+        new_state = {
+            'last_date': dates[-1],
+            'next_lot': last,
+            'positions': shares[-1],
+            'last_prices': filled[-1],
+            'cost_by_symbol': cost_by_symbol,
+            'last_value': value[-1],
+            'twr_index': twr_index[-1],
+            'peak': peak[-1],
+            'symbol_values': values[-1],
+        }
+        return chunk, new_state
+
+    def update(self, prices, fx):
+        """Intègre de nouvelles barres (prix: dates x symboles, fx: ILS par USD aligné)"""
+        prices = prices.reindex(columns=self.symbols)
+        fx = fx.reindex(prices.index).ffill().bfill().to_numpy(dtype=float)
+
+        # La barre provisoire précédente est remplacée par les données reçues
+        state = self._committed
+        if state['last_date'] is not None:
+            keep = prices.index > state['last_date']
+            prices, fx = prices[keep], fx[keep]
+        if prices.empty:
+            return self
+
+        dates = prices.index
+        values = prices.to_numpy(dtype=float)
+        if len(dates) > 1:
+            chunk, state = self._process(dates[:-1], values[:-1], fx[:-1], state)
+            self._chunks.append(chunk)
+            self._committed = state
+
+        # Dernière barre provisoire (peut encore évoluer)
+        self._provisional, self._state = self._process(dates[-1:], values[-1:], fx[-1:], state)
+        self._frame = None
+        return self
+
+    @property
+    def curve(self):
+        """Historique complet (value, flows, invested, return, twr_index, drawdown)"""
+        if self._frame is None:
+            chunks = self._chunks + ([self._provisional] if self._provisional is not None else [])
+            self._frame = pd.concat(chunks) if chunks else pd.DataFrame(
+                columns=['value', 'flows', 'invested', 'return', 'twr_index', 'drawdown']
+            )
+            # Compacte les blocs pour les mises à jour suivantes
+            if len(self._chunks) > 1:
+                self._chunks = [pd.concat(self._chunks)]
+        return self._frame
+
+    def summary(self):
+        """Rendements pondérés par le temps et par les capitaux, drawdown maximal"""
+        curve = self.curve
+        if curve.empty:
+            return {'value': 0.0, 'invested': 0.0, 'twr': np.nan, 'mwr': np.nan, 'max_drawdown': np.nan}
+        flows = curve.loc[curve['flows'] != 0, 'flows']
+        mwr = xirr(
+            flows.index.append(pd.DatetimeIndex([curve.index[-1]])),
+            np.r_[-flows.to_numpy(), curve['value'].iloc[-1]]
+        )
+        return {
+            'value': float(curve['value'].iloc[-1]),
+            'invested': float(curve['invested'].iloc[-1]),
+            'twr': float(curve['twr_index'].iloc[-1] - 1.0),
+            'mwr': float(mwr),
+            'max_drawdown': float(curve['drawdown'].min()),
+        }
+
+    def contributions(self):
+        """Contribution de chaque symbole au résultat (valeur - coût, en USD)"""
+        if 'symbol_values' not in self._state:
+            return pd.DataFrame(columns=['value', 'cost', 'pnl', 'share'])
+        result = pd.DataFrame({
+            'value': self._state['symbol_values'],
+            'cost': self._state['cost_by_symbol'],
+        }, index=pd.Index(self.symbols, name='symbol'))
+        result['pnl'] = result['value'] - result['cost']
+        total = result['pnl'].abs().sum()
+        result['share'] = result['pnl'] / total if total else 0.0
+        return result.sort_values('pnl', ascending=False)
@@ -0,0 +1,149 @@
+"""Préchargement des caches : chauffe au démarrage et anticipation des prochaines vues
+
+Au démarrage, la watchlist par défaut, les indices TASE et le taux de change
+sont chargés en arrière-plan. Ensuite, à chaque affichage, les choix voisins
+(période et intervalle adjacents, symboles suivants de la watchlist) sont
+préchargés dans un pool borné, tant que le budget d'octets non consommés le
+permet. Le taux de succès (préchargements ensuite affichés) sert au réglage.
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from bars import bars_nbytes
+from resample import INTERVAL_MINUTES, MAX_HISTORY_DAYS, PERIOD_DAYS
+
+logger = logging.getLogger('prefetch')
+
+# Ordre des choix proposés dans la barre latérale
+PERIODS = ['1d', '5d', '1mo', '3mo', '6mo', '1y', '2y', '5y']
+INTERVALS = ['1m', '2m', '5m', '15m', '30m', '1h', '1d', '1wk', '1mo']
+
+def _neighbours(options, value):
+    if value not in options:
+        return []
+    i = options.index(value)
+    return [options[j] for j in (i - 1, i + 1) if 0 <= j < len(options)]
+
+def _available(period, interval):
+    """Combinaison servie par Yahoo (profondeur limitée en intraday)"""
+    if interval not in INTERVAL_MINUTES:
+        return True
+    return PERIOD_DAYS.get(period, 0) <= MAX_HISTORY_DAYS[interval]
+
+def predict_views(symbol, period, interval, watchlist, next_symbols=2):
+    """Vues probables après (symbole, période, intervalle), de la plus à la moins probable"""
+    views = [(symbol, p, interval) for p in _neighbours(PERIODS, period)]
+    views += [(symbol, period, i) for i in _neighbours(INTERVALS, interval)]
+    if symbol in watchlist:
+        start = watchlist.index(symbol) + 1
+        following = (watchlist[start:] + watchlist[:start - 1])[:next_symbols]
+    else:
+        following = watchlist[:next_symbols]
+    views += [(s, period, interval) for s in following if s != symbol]
+    return [view for view in views if _available(view[1], view[2])]
+
+class Prefetcher:
+    """Pool de préchargement borné en concurrence et en octets préchargés non consultés"""
+
+    def __init__(self, load, ttl=300, max_workers=2, max_pending=16, max_bytes=64 * 2**20, max_tracked=2000):
+        # load(symbol, period, interval) -> barres (fonction en cache côté appelant, durée de validité ttl)
+        self.load = load
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self.max_bytes = max_bytes
+        self.max_tracked = max_tracked
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='prefetch')
+        self._lock = threading.Lock()
+        self._pending = set()
+        # Vue préchargée -> (instant, octets), tant qu'elle n'a pas été affichée ni expirée
+        self._unused = OrderedDict()
+        self._unused_bytes = 0
+        self._seen = OrderedDict()
+        self.stats = {'scheduled': 0, 'completed': 0, 'failed': 0, 'skipped': 0, 'hits': 0, 'misses': 0}
+
+    def warm(self, tasks):
+        """Chauffe au démarrage : tâches (fonction, arguments) exécutées dans le pool"""
+        for func, *args in tasks:
+            self._pool.submit(self._run_warm, func, args)
+
+    @staticmethod
+    def _run_warm(func, args):
+        try:
+            func(*args)
+        except Exception:
+            logger.exception("Échec de la chauffe %s%s", getattr(func, '__name__', func), args)
+
+    def _expire(self, now):
+        """Oublie les vues sorties du cache (durée de validité écoulée)"""
+        while self._unused and next(iter(self._unused.values()))[0] < now - self.ttl:
+            self._unused_bytes -= self._unused.popitem(last=False)[1][1]
+        while self._seen and next(iter(self._seen.values())) < now - self.ttl:
+            self._seen.popitem(last=False)
+
+    def record(self, view):
+        """Vue affichée : compte un succès si elle avait été préchargée"""
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            if view in self._unused:
+                self._unused_bytes -= self._unused.pop(view)[1]
+                self.stats['hits'] += 1
+            elif view not in self._seen:
+                self.stats['misses'] += 1
+            self._seen.pop(view, None)
+            self._seen[view] = now
+            while len(self._seen) > self.max_tracked:
+                self._seen.popitem(last=False)
+
+    def schedule(self, views):
+        """Précharge les vues ni affichées, ni déjà préchargées, dans la limite des budgets"""
+        now = time.monotonic()
+        for view in views:
+            with self._lock:
+                self._expire(now)
+                if view in self._seen or view in self._unused or view in self._pending:
+                    continue
+                if len(self._pending) >= self.max_pending or self._unused_bytes >= self.max_bytes:
+                    self.stats['skipped'] += 1
+                    continue
+                self._pending.add(view)
+                self.stats['scheduled'] += 1
+            self._pool.submit(self._run, view)
+
+    def _run(self, view):
+        try:
+            bars = self.load(*view)
+            nbytes = bars_nbytes(bars) if bars is not None else 0
+        except Exception:
+            logger.debug("Échec du préchargement %s", view, exc_info=True)
+            with self._lock:
+                self._pending.discard(view)
+                self.stats['failed'] += 1
+            return
+        with self._lock:
+            self._pending.discard(view)
+            self.stats['completed'] += 1
+            if view in self._seen:
+                return
+            self._unused[view] = (time.monotonic(), nbytes)
+            self._unused_bytes += nbytes
+            while len(self._unused) > self.max_tracked:
+                self._unused_bytes -= self._unused.popitem(last=False)[1][1]
+
+    def report(self):
+        """Statistiques et taux de succès (vues affichées déjà préchargées / préchargements terminés)"""
+        with self._lock:
+            report = dict(self.stats)
+            report['pending'] = len(self._pending)
+            report['unused_bytes'] = self._unused_bytes
+        completed = report['completed']
+        report['hit_rate'] = report['hits'] / completed if completed else 0.0
+        demand = report['hits'] + report['misses']
+        report['demand_hit_rate'] = report['hits'] / demand if demand else 0.0
+        return report
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
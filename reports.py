@@ -0,0 +1,610 @@
+"""Rapports HTML / PDF (graphique, statistiques, indicateurs, portefeuille) par symbole ou pour la watchlist
+
+Usage :
+    python reports.py --symbols TEVA NICE.TA --out reports/
+    python reports.py --user default --out reports/          # watchlist et portefeuille de l'utilisateur
+    python reports.py --user default --format pdf --workers 8
+
+    # Fin de séance, du dimanche au jeudi (cron) :
+    30 17 * * 0-4  cd /app && python reports.py --user default --out /srv/reports/$(date +\\%F)
+
+Les historiques passent par le cache d'historiques (et par le cache partagé
+si TRACKER_SHARED_CACHE est défini) : un seul passage de téléchargement en
+parallèle, puis les indicateurs de tous les symboles en un calcul sur le
+panneau aligné. Le rendu de chaque symbole est réparti sur un pool de
+processus. Les graphiques sont des tracés vectoriels (SVG pour le HTML,
+chemins PDF) mis en cache sur disque par empreinte des données : un
+graphique dont les barres n'ont pas changé n'est pas recalculé.
+
+Le PDF est écrit directement avec les polices standard (aucune dépendance) :
+son texte est en Latin-1, les libellés hébreux ne figurent que dans le HTML.
+"""
+import argparse
+import hashlib
+import html
+import json
+import logging
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytz
+
+from history_cache import HistoryCache
+from ledger import value_positions
+from market_data import FX_SYMBOL, get_data_source
+from screener import align_panel, compute_indicators
+from storage import DEFAULT_USER, TrackerStore
+from symbol_master import CURRENCY_SIGNS, get_symbol_master
+
+USER_TIMEZONE = pytz.timezone('Europe/Paris')
+
+FORMATS = ('html', 'pdf')
+DEFAULT_CHART_CACHE = os.path.join(tempfile.gettempdir(), 'tracker_report_charts')
+# À incrémenter si le tracé change (invalide les graphiques en cache)
+CHART_VERSION = 1
+
+# Barres par an selon l'intervalle (volatilité annualisée)
+BARS_PER_YEAR = {'1d': 252, '1wk': 52, '1mo': 12}
+
+MA_WINDOWS = {20: '#ff9900', 50: '#8e44ad'}
+
+logger = logging.getLogger('reports')
+
+# ----------------------------------------------------------------------
+# Statistiques
+# ----------------------------------------------------------------------
+def symbol_stats(bars, interval='1d'):
+    """Statistiques de la période : cours, variation, dispersion, volatilité, drawdown maximal"""
+    close = bars['Close'].to_numpy(dtype=float)
+    close = close[np.isfinite(close) & (close > 0)]
+    if not len(close):
+        return {}
+    returns = np.diff(np.log(close))
+    peak = np.maximum.accumulate(close)
+    stats = {
+        'last': close[-1],
+        'change_pct': (close[-1] / close[0] - 1) * 100,
+        'mean': close.mean(),
+        'std': close.std(ddof=1) if len(close) > 1 else np.nan,
+        'min': close.min(),
+        'max': close.max(),
+        'max_drawdown_pct': ((close / peak).min() - 1) * 100,
+        'volatility_pct': np.nan,
+    }
+    if len(returns) > 1:
+        stats['volatility_pct'] = returns.std(ddof=1) * np.sqrt(BARS_PER_YEAR.get(interval, 252)) * 100
+    return {key: float(value) for key, value in stats.items()}
+
+STAT_LABELS = {
+    'last': ("מחיר אחרון", "Dernier cours", True),
+    'change_pct': ("שינוי כולל", "Variation totale (%)", False),
+    'mean': ("ממוצע", "Moyenne", True),
+    'std': ("סטיית תקן", "Écart-type", True),
+    'min': ("מינימום", "Min", True),
+    'max': ("מקסימום", "Max", True),
+    'volatility_pct': ("תנודתיות שנתית", "Volatilité annualisée (%)", False),
+    'max_drawdown_pct': ("ירידה מקסימלית", "Drawdown maximal (%)", False),
+}
+
+INDICATOR_LABELS = {
+    'sma_fast': "MM 20",
+    'sma_slow': "MM 50",
+    'rsi': "RSI 14",
+    'volume_ratio': "Volume relatif 20j",
+    'pct_from_52w_high': "Écart plus haut 52s (%)",
+}
+
+# ----------------------------------------------------------------------
+# Graphique vectoriel (géométrie commune au SVG et au PDF)
+# ----------------------------------------------------------------------
+def _unit(values, lo, hi):
+    """Valeurs ramenées dans [0, 1] (NaN conservés)"""
+    return (values - lo) / (hi - lo) if hi > lo else np.full(len(values), 0.5)
+
+def chart_geometry(bars):
+    """Courbes (cours, moyennes mobiles) et barres de volume en coordonnées unitaires, y vers le haut"""
+    close = bars['Close'].to_numpy(dtype=float)
+    volume = bars['Volume'].to_numpy(dtype=float) if 'Volume' in bars else np.zeros(len(close))
+    n = len(close)
+    x = np.linspace(0.0, 1.0, n) if n > 1 else np.full(n, 0.5)
+    series = {'Close': close}
+    for window in MA_WINDOWS:
+        if n >= window:
+            ma = np.full(n, np.nan)
+            ma[window - 1:] = np.lib.stride_tricks.sliding_window_view(close, window).mean(axis=1)
+            series[f'MA {window}'] = ma
+    finite = close[np.isfinite(close)]
+    lo, hi = (finite.min(), finite.max()) if len(finite) else (0.0, 1.0)
+    top = np.nanmax(volume) if n and np.nanmax(volume) > 0 else 1.0
+    return {
+        'x': x,
+        'lines': {name: _unit(values, lo, hi) for name, values in series.items()},
+        'volume': np.nan_to_num(volume / top),
+        'bar_width': 1.0 / max(n, 1),
+        'labels': {
+            'min': float(lo), 'max': float(hi),
+            'start': bars.index[0].strftime('%d/%m/%Y') if n else '',
+            'end': bars.index[-1].strftime('%d/%m/%Y') if n else '',
+        },
+    }
+
+LINE_STYLES = {'Close': ('#0038b8', 1.5)}
+LINE_STYLES.update({f'MA {w}': (color, 1.0) for w, color in MA_WINDOWS.items()})
+
+def _segments(x, y):
+    """Portions continues (sans NaN) d'une courbe"""
+    valid = np.isfinite(y)
+    edges = np.flatnonzero(np.diff(np.r_[0, valid.astype(np.int8), 0]))
+    return [(x[a:b], y[a:b]) for a, b in zip(edges[::2], edges[1::2])]
+
+def _points(values):
+    return ' '.join(np.char.mod('%.1f', values).tolist())
+
+def svg_chart(geometry, width=720, height=320):
+    """Graphique SVG : cours et moyennes mobiles (trois quarts de la hauteur), volume en dessous"""
+    price_h, volume_h = height * 0.75, height * 0.2
+    parts = [f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" width="100%">']
+    bar_w = max(geometry['bar_width'] * width * 0.8, 0.5)
+    bars_x = geometry['x'] * (width - bar_w)
+    bars_h = geometry['volume'] * volume_h
+    rects = np.column_stack([bars_x, height - bars_h, bars_h])
+    parts.append('<g fill="#d3d3d3">' + ''.join(
+        f'<rect x="{x:.1f}" y="{y:.1f}" width="{bar_w:.1f}" height="{h:.1f}"/>' for x, y, h in rects if h > 0
+    ) + '</g>')
+    for name, values in geometry['lines'].items():
+        color, stroke = LINE_STYLES[name]
+        for xs, ys in _segments(geometry['x'] * width, (1 - values) * price_h + 5):
+            coords = np.column_stack([xs, ys]).ravel()
+            parts.append(
+                f'<polyline fill="none" stroke="{color}" stroke-width="{stroke}" points="{_points(coords)}"/>'
+            )
+    labels = geometry['labels']
+    parts.append(
+        f'<g font-size="11" fill="#555"><text x="2" y="14">{labels["max"]:.2f}</text>'
+        f'<text x="2" y="{price_h:.0f}">{labels["min"]:.2f}</text>'
+        f'<text x="2" y="{height - volume_h - 4:.0f}">{labels["start"]}</text>'
+        f'<text x="{width - 2}" y="{height - volume_h - 4:.0f}" text-anchor="end">{labels["end"]}</text></g>'
+    )
+    parts.append('</svg>')
+    return ''.join(parts)
+
+def _hex_rgb(color):
+    return ' '.join(f'{int(color[i:i + 2], 16) / 255:.3f}' for i in (1, 3, 5))
+
+def pdf_chart(geometry, x0, y0, width, height):
+    """Opérateurs PDF du même graphique, dans le rectangle (x0, y0, width, height) de la page"""
+    price_h, volume_h = height * 0.75, height * 0.2
+    ops = ['0.827 0.827 0.827 rg']
+    bar_w = max(geometry['bar_width'] * width * 0.8, 0.3)
+    bars_x = x0 + geometry['x'] * (width - bar_w)
+    bars_h = geometry['volume'] * volume_h
+    ops.extend(f'{x:.2f} {y0:.2f} {bar_w:.2f} {h:.2f} re' for x, h in zip(bars_x, bars_h) if h > 0)
+    ops.append('f')
+    base = y0 + height - price_h - 5
+    for name, values in geometry['lines'].items():
+        color, stroke = LINE_STYLES[name]
+        ops.append(f'{_hex_rgb(color)} RG {stroke * 0.75:.2f} w')
+        for xs, ys in _segments(x0 + geometry['x'] * width, base + values * price_h):
+            coords = np.char.mod('%.2f', np.column_stack([xs, ys])).tolist()
+            ops.append(f'{coords[0][0]} {coords[0][1]} m ' + ' '.join(f'{a} {b} l' for a, b in coords[1:]) + ' S')
+    return '\n'.join(ops)
+
+class ChartCache:
+    """Graphiques rendus (SVG et PDF) sur disque, par empreinte des barres : partagés entre processus et exécutions"""
+
+    def __init__(self, directory=DEFAULT_CHART_CACHE):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(bars):
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(str(CHART_VERSION).encode())
+        digest.update(np.ascontiguousarray(bars.index.asi8).tobytes())
+        for column in ('Close', 'Volume'):
+            if column in bars:
+                digest.update(bars[column].to_numpy(dtype=float).tobytes())
+        return digest.hexdigest()
+
+    def get(self, bars):
+        """(graphique rendu, trouvé en cache)"""
+        path = os.path.join(self.directory, self.key(bars) + '.json')
+        try:
+            with open(path, encoding='utf-8') as f:
+                return json.load(f), True
+        except (OSError, ValueError):
+            pass
+        geometry = chart_geometry(bars)
+        chart = {'svg': svg_chart(geometry), 'pdf': pdf_chart(geometry, 40, 430, 515, 250)}
+        # Écriture atomique : plusieurs processus peuvent produire le même graphique
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(chart, f)
+        os.replace(tmp, path)
+        return chart, False
+
+# ----------------------------------------------------------------------
+# PDF minimal (polices standard, texte Latin-1)
+# ----------------------------------------------------------------------
+def _pdf_text(text):
+    text = str(text).replace('₪', 'ILS ')
+    encoded = text.encode('cp1252', errors='replace').decode('latin-1')
+    return encoded.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+class PdfDocument:
+    """Pages A4 de texte et de tracés, sérialisées en PDF 1.4"""
+
+    WIDTH, HEIGHT = 595, 842
+
+    def __init__(self):
+        self.pages = []
+
+    def new_page(self):
+        self.pages.append([])
+        return self.pages[-1]
+
+    @staticmethod
+    def text(page, x, y, text, size=10, bold=False, color='0 0 0'):
+        font = 'F2' if bold else 'F1'
+        page.append(f'BT {color} rg /{font} {size} Tf {x:.1f} {y:.1f} Td ({_pdf_text(text)}) Tj ET')
+
+    @staticmethod
+    def line(page, x1, y1, x2, y2, color='0.8 0.8 0.8', width=0.5):
+        page.append(f'{color} RG {width} w {x1:.1f} {y1:.1f} m {x2:.1f} {y2:.1f} l S')
+
+    def to_bytes(self):
+        objects = [
+            b'<< /Type /Catalog /Pages 2 0 R >>',
+            None,  # Pages, une fois les pages numérotées
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+            b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+        ]
+        kids = []
+        for page in self.pages:
+            stream = '\n'.join(page).encode('latin-1')
+            objects.append(b'<< /Length %d >>\nstream\n' % len(stream) + stream + b'\nendstream')
+            objects.append((
+                f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {self.WIDTH} {self.HEIGHT}] '
+                f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objects)} 0 R >>'
+            ).encode())
+            kids.append(f'{len(objects)} 0 R')
+        objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode()
+
+        out = bytearray(b'%PDF-1.4\n')
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(len(out))
+            out += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+        xref = len(out)
+        out += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+        out += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+        out += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+        return bytes(out)
+
+# ----------------------------------------------------------------------
+# Contenu et rendu
+# ----------------------------------------------------------------------
+def _number(value, decimals=2):
+    return '—' if value is None or not np.isfinite(value) else f"{value:,.{decimals}f}"
+
+def symbol_indicators(symbol, bars, interval='1d'):
+    """Indicateurs du screener (moyennes mobiles, RSI, volume relatif) d'un seul symbole"""
+    row = compute_indicators(align_panel({symbol: bars}, [symbol], interval)).loc[symbol]
+    return {k: float(v) for k, v in row.items() if isinstance(v, (int, float, np.number))}
+
+def symbol_report(symbol, bars, period, interval, indicators=None, positions=None, chart=None, generated=None):
+    """Contenu du rapport d'un symbole (dictionnaire sérialisable)"""
+    master = get_symbol_master()
+    if indicators is None:
+        indicators = symbol_indicators(symbol, bars, interval)
+    return {
+        'symbol': symbol,
+        'label': master.label(symbol),
+        'sign': CURRENCY_SIGNS.get(master.currency(symbol), '$'),
+        'period': period,
+        'interval': interval,
+        'generated': generated or datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M'),
+        'stats': symbol_stats(bars, interval),
+        'indicators': indicators,
+        'positions': positions if positions is not None else [],
+        'chart': chart or ChartCache().get(bars)[0],
+    }
+
+def _stat_rows(report):
+    for key, (he, fr, money) in STAT_LABELS.items():
+        value = report['stats'].get(key)
+        yield he, fr, (report['sign'] if money else '') + _number(value)
+
+def _indicator_rows(report):
+    for key, label in INDICATOR_LABELS.items():
+        yield label, _number(report['indicators'].get(key))
+
+HTML_STYLE = """
+body { font-family: Arial, 'Arial Hebrew', sans-serif; margin: 2rem; color: #222; }
+h1 { color: #0038b8; } table { border-collapse: collapse; margin: 0.5rem 0 1.5rem; }
+td, th { border-bottom: 1px solid #ddd; padding: 0.3rem 0.8rem; text-align: left; }
+.pos { color: #00cc96; } .neg { color: #ef553b; } small { color: #777; }
+"""
+
+def _html_page(title, body):
+    return (
+        f'<!DOCTYPE html><html lang="fr"><head><meta charset="utf-8"><title>{html.escape(title)}</title>'
+        f'<style>{HTML_STYLE}</style></head><body>{body}</body></html>'
+    )
+
+def render_html(report):
+    """Rapport d'un symbole en page HTML autonome (graphique SVG intégré)"""
+    e = html.escape
+    rows = ''.join(f'<tr><td>{e(he)} / {e(fr)}</td><td>{e(v)}</td></tr>' for he, fr, v in _stat_rows(report))
+    indicators = ''.join(f'<tr><td>{e(label)}</td><td>{e(v)}</td></tr>' for label, v in _indicator_rows(report))
+    body = [
+        f'<h1>{e(report["label"])}</h1>',
+        f'<p>{e(report["period"])} / {e(report["interval"])} — <small>נוצר / Généré : {e(report["generated"])} (UTC+2)</small></p>',
+        report['chart']['svg'],
+        '<h2>סטטיסטיקות / Statistiques</h2>', f'<table>{rows}</table>',
+        '<h2>אינדיקטורים / Indicateurs</h2>', f'<table>{indicators}</table>',
+    ]
+    if report['positions']:
+        lines = ''.join(
+            f'<tr><td>{_number(p["shares"], 0)}</td><td>{report["sign"]}{_number(p["buy_price"])}</td>'
+            f'<td>{report["sign"]}{_number(p["value"])}</td>'
+            f'<td class="{"pos" if p["profit"] >= 0 else "neg"}">{_number(p["profit_pct"])}%</td></tr>'
+            for p in report['positions']
+        )
+        body += [
+            '<h2>תיק השקעות / Positions</h2>',
+            f'<table><tr><th>Quantité</th><th>Prix d\'achat</th><th>Valeur</th><th>P&amp;L</th></tr>{lines}</table>',
+        ]
+    return _html_page(report['symbol'], ''.join(body))
+
+def render_pdf(report):
+    """Rapport d'un symbole en PDF d'une page (même graphique, tracé vectoriel)"""
+    doc = PdfDocument()
+    page = doc.new_page()
+    doc.text(page, 40, 790, report['symbol'], size=20, bold=True, color='0 0.22 0.72')
+    doc.text(page, 40, 770, f"{report['period']} / {report['interval']} - genere le {report['generated']} (UTC+2)", size=9)
+    page.append(report['chart']['pdf'])
+    y = 400
+    doc.text(page, 40, y, "Statistiques", size=13, bold=True)
+    for _, fr, value in _stat_rows(report):
+        y -= 16
+        doc.text(page, 40, y, fr)
+        doc.text(page, 220, y, value)
+    y_ind = 400
+    doc.text(page, 320, y_ind, "Indicateurs", size=13, bold=True)
+    for label, value in _indicator_rows(report):
+        y_ind -= 16
+        doc.text(page, 320, y_ind, label)
+        doc.text(page, 480, y_ind, value)
+    if report['positions']:
+        y -= 30
+        doc.text(page, 40, y, "Positions", size=13, bold=True)
+        for p in report['positions'][:10]:
+            y -= 16
+            doc.text(page, 40, y, (
+                f"{_number(p['shares'], 0)} x {report['sign']}{_number(p['buy_price'])} -> "
+                f"{report['sign']}{_number(p['value'])} ({_number(p['profit_pct'])}%)"
+            ))
+    return doc.to_bytes()
+
+def render_summary_html(summary):
+    """Page d'index : tableau de la watchlist (liens vers les rapports) et synthèse du portefeuille"""
+    e = html.escape
+    rows = ''.join(
+        f'<tr><td><a href="{e(r["file"])}">{e(r["symbol"])}</a></td><td>{e(r["price"])}</td>'
+        f'<td class="{"pos" if r["change"] >= 0 else "neg"}">{_number(r["change"])}%</td>'
+        f'<td>{e(r["rsi"])}</td><td>{e(r["volatility"])}</td></tr>'
+        for r in summary['rows']
+    )
+    body = [
+        '<h1>🇮🇱 דוח סוף יום / Rapport de fin de séance</h1>',
+        f'<p><small>נוצר / Généré : {e(summary["generated"])} (UTC+2) — {e(summary["period"])} / {e(summary["interval"])}</small></p>',
+        '<table><tr><th>Symbole</th><th>Cours</th><th>Variation période</th><th>RSI 14</th>'
+        f'<th>Volatilité (%)</th></tr>{rows}</table>',
+    ]
+    totals = summary.get('portfolio')
+    if totals:
+        body += [
+            '<h2>תיק השקעות / Portefeuille</h2><table>',
+            f'<tr><td>Valeur ($)</td><td>{_number(totals["value_usd"])}</td></tr>',
+            f'<tr><td>Coût ($)</td><td>{_number(totals["cost_usd"])}</td></tr>',
+            f'<tr><td>P&amp;L ($)</td><td class="{"pos" if totals["profit_usd"] >= 0 else "neg"}">'
+            f'{_number(totals["profit_usd"])} ({_number(totals["profit_pct"])}%)</td></tr>',
+            f'<tr><td>USD/ILS</td><td>{_number(totals["fx_rate"], 3)}</td></tr></table>',
+        ]
+    return _html_page("Rapport watchlist", ''.join(body))
+
+def render_summary_pdf(summary):
+    doc = PdfDocument()
+    page = doc.new_page()
+    doc.text(page, 40, 790, "Rapport de fin de seance", size=18, bold=True, color='0 0.22 0.72')
+    doc.text(page, 40, 772, f"{summary['period']} / {summary['interval']} - genere le {summary['generated']} (UTC+2)", size=9)
+    y = 740
+    totals = summary.get('portfolio')
+    if totals:
+        doc.text(page, 40, y, (
+            f"Portefeuille : ${_number(totals['value_usd'])} (cout ${_number(totals['cost_usd'])}, "
+            f"P&L {_number(totals['profit_pct'])}%) - USD/ILS {_number(totals['fx_rate'], 3)}"
+        ), bold=True)
+        y -= 28
+    columns = [(40, "Symbole"), (160, "Cours"), (270, "Variation (%)"), (380, "RSI 14"), (460, "Volatilite (%)")]
+    for row in summary['rows']:
+        if y < 60 or row is summary['rows'][0]:
+            if y < 60:
+                page = doc.new_page()
+                y = 800
+            for x, title in columns:
+                doc.text(page, x, y, title, bold=True)
+            doc.line(page, 40, y - 5, 555, y - 5)
+            y -= 20
+        for (x, _), value in zip(columns, (row['symbol'], row['price'], _number(row['change']), row['rsi'], row['volatility'])):
+            doc.text(page, x, y, value, size=9)
+        y -= 15
+    return doc.to_bytes()
+
+# ----------------------------------------------------------------------
+# Génération en lot
+# ----------------------------------------------------------------------
+def _report_file(symbol, extension):
+    return symbol.replace('^', '_').replace('/', '_') + '.' + extension
+
+def render_job(job):
+    """Rendu d'un symbole (exécuté dans un processus du pool) : graphique en cache, fichiers écrits"""
+    start = time.perf_counter()
+    chart, cached = ChartCache(job['chart_cache']).get(job['bars'])
+    report = symbol_report(
+        job['symbol'], job['bars'], job['period'], job['interval'],
+        indicators=job['indicators'], positions=job['positions'], chart=chart, generated=job['generated']
+    )
+    files = []
+    for extension in job['formats']:
+        path = os.path.join(job['out_dir'], _report_file(job['symbol'], extension))
+        if extension == 'html':
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(render_html(report))
+        else:
+            with open(path, 'wb') as f:
+                f.write(render_pdf(report))
+        files.append(path)
+    return {
+        'symbol': job['symbol'], 'files': files, 'chart_cached': cached, 'stats': report['stats'],
+        'ms': (time.perf_counter() - start) * 1000,
+    }
+
+def _portfolio_positions(state, prices, fx_rate):
+    positions = value_positions(state['portfolio'], state['transactions'], prices, fx_rate)
+    value_usd, cost_usd = positions['value_usd'].sum(), positions['cost_usd'].sum()
+    totals = {
+        'value_usd': float(value_usd),
+        'cost_usd': float(cost_usd),
+        'profit_usd': float(value_usd - cost_usd),
+        'profit_pct': float((value_usd - cost_usd) / cost_usd * 100) if cost_usd > 0 else 0.0,
+        'fx_rate': float(fx_rate),
+    }
+    return positions, totals
+
+def generate_reports(symbols, out_dir, period='1y', interval='1d', formats=FORMATS, history=None, store=None,
+                     user_id=None, max_workers=None, chart_cache=DEFAULT_CHART_CACHE):
+    """Rapports de chaque symbole et page de synthèse dans out_dir; renvoie fichiers et mesures
+
+    history : cache d'historiques (celui du tableau de bord pour réutiliser ses barres).
+    user_id : ajoute les positions et la synthèse du portefeuille de cet utilisateur.
+    """
+    start = time.perf_counter()
+    os.makedirs(out_dir, exist_ok=True)
+    history = history or HistoryCache(get_data_source())
+    symbols = list(dict.fromkeys(symbols))
+    state = (store or TrackerStore()).get_user_state(user_id) if user_id else None
+    fetch_symbols = symbols + [FX_SYMBOL] if state else symbols
+
+    def load(symbol):
+        try:
+            return history.get_interval(symbol, period, interval)
+        except Exception as e:
+            logger.warning("%s : historique indisponible (%s)", symbol, e)
+            return None
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        bars = dict(zip(fetch_symbols, pool.map(load, fetch_symbols)))
+    fetched = time.perf_counter()
+
+    # Indicateurs de tous les symboles en un calcul sur le panneau aligné
+    indicators = compute_indicators(align_panel(bars, symbols, interval))
+    positions, totals = pd.DataFrame(columns=['symbol']), None
+    if state:
+        fx = bars.get(FX_SYMBOL)
+        fx_rate = float(fx['Close'].iloc[-1]) if fx is not None and not fx.empty else 3.7
+        positions, totals = _portfolio_positions(state, indicators['price'], fx_rate)
+        totals = totals if len(positions) else None
+
+    generated = datetime.now(USER_TIMEZONE).strftime('%Y-%m-%d %H:%M')
+    jobs = [
+        {
+            'symbol': symbol, 'bars': bars[symbol], 'period': period, 'interval': interval,
+            'indicators': {k: float(v) for k, v in indicators.loc[symbol].items() if isinstance(v, (int, float, np.number))},
+            'positions': positions[positions['symbol'] == symbol].to_dict('records'),
+            'generated': generated, 'formats': list(formats), 'out_dir': out_dir, 'chart_cache': chart_cache,
+        }
+        for symbol in symbols if bars.get(symbol) is not None and not bars[symbol].empty
+    ]
+    missing = [s for s in symbols if bars.get(s) is None or bars[s].empty]
+
+    max_workers = max_workers or max(1, min(8, os.cpu_count() or 1))
+    if max_workers > 1 and len(jobs) > 1:
+        # 'spawn' : pas de fork d'un processus multi-thread (serveur Streamlit, téléchargements)
+        with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            results = list(pool.map(render_job, jobs, chunksize=max(1, len(jobs) // (max_workers * 4))))
+    else:
+        results = [render_job(job) for job in jobs]
+
+    summary = {
+        'generated': generated, 'period': period, 'interval': interval, 'portfolio': totals,
+        'rows': [
+            {
+                'symbol': r['symbol'],
+                'file': _report_file(r['symbol'], 'html' if 'html' in formats else 'pdf'),
+                'price': _number(r['stats'].get('last')),
+                'change': r['stats'].get('change_pct', np.nan),
+                'rsi': _number(indicators.at[r['symbol'], 'rsi'], 1),
+                'volatility': _number(r['stats'].get('volatility_pct'), 1),
+            }
+            for r in results
+        ],
+    }
+    files = [f for r in results for f in r['files']]
+    if 'html' in formats:
+        files.append(os.path.join(out_dir, 'index.html'))
+        with open(files[-1], 'w', encoding='utf-8') as f:
+            f.write(render_summary_html(summary))
+    if 'pdf' in formats:
+        files.append(os.path.join(out_dir, 'summary.pdf'))
+        with open(files[-1], 'wb') as f:
+            f.write(render_summary_pdf(summary))
+
+    return {
+        'symbols': len(results),
+        'missing': missing,
+        'files': files,
+        'charts_cached': sum(r['chart_cached'] for r in results),
+        'fetch_s': fetched - start,
+        'total_s': time.perf_counter() - start,
+    }
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rapports HTML / PDF de fin de séance")
+    parser.add_argument('--symbols', nargs='+', help="Symboles (par défaut : watchlist de l'utilisateur)")
+    parser.add_argument('--user', default=None, help="Utilisateur : watchlist et portefeuille")
+    parser.add_argument('--out', default='reports', help="Répertoire de sortie")
+    parser.add_argument('--period', default='1y')
+    parser.add_argument('--interval', default='1d')
+    parser.add_argument('--format', nargs='+', choices=FORMATS, default=list(FORMATS))
+    parser.add_argument('--workers', type=int, default=None, help="Processus de rendu")
+    parser.add_argument('--source', default=None, help="'yahoo' ou 'replay:<fichier.csv>'")
+    parser.add_argument('--chart-cache', default=DEFAULT_CHART_CACHE, help="Répertoire des graphiques en cache")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(name)s %(levelname)s %(message)s')
+
+    store = TrackerStore()
+    user_id = args.user or (None if args.symbols else DEFAULT_USER)
+    symbols = args.symbols or store.get_user_state(user_id)['watchlist']
+    result = generate_reports(
+        [s.upper() for s in symbols], args.out, args.period, args.interval, args.format,
+        history=HistoryCache(get_data_source(args.source)), store=store, user_id=user_id,
+        max_workers=args.workers, chart_cache=args.chart_cache
+    )
+    logger.info(
+        "%(symbols)d rapports (%(charts_cached)d graphiques en cache) en %(total_s).1f s "
+        "dont %(fetch_s).1f s de chargement", result
+    )
+    if result['missing']:
+        logger.warning("Sans données : %s", ', '.join(result['missing']))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Agrégation locale des barres intraday alignée sur les séances TASE / US"""
+import numpy as np
+import pandas as pd
+
+from market_calendar import SESSIONS
+
+# Durée des intervalles intraday en minutes
+INTERVAL_MINUTES = {
+    '1m': 1,
+    '2m': 2,
+    '5m': 5,
+    '15m': 15,
+    '30m': 30,
+    '1h': 60,
+}
+
+# Profondeur maximale servie par Yahoo pour chaque granularité (jours)
+MAX_HISTORY_DAYS = {
+    '1m': 7,
+    '2m': 60,
+    '5m': 60,
+    '15m': 60,
+    '30m': 60,
+    '1h': 730,
+}
+
+PERIOD_DAYS = {
+    '1d': 1,
+    '5d': 5,
+    '1mo': 31,
+    '3mo': 92,
+    '6mo': 183,
+    '1y': 366,
+    '2y': 731,
+    '5y': 1827,
+}
+
+def base_interval(period, interval):
+    """Granularité de base d'une période, partagée par tous ses intervalles
+
+    La plus fine dont l'historique couvre la période et dont les intervalles
+    plus larges sont des multiples : une seule requête par (symbole, période),
+    agrégée localement (1d, 5d : 1m; 1mo : 5m; 3mo à 2y : 1h). Un intervalle
+    qui n'en est pas un multiple (2m sur 1mo) est demandé tel quel.
+    """
+    if interval not in INTERVAL_MINUTES or period not in PERIOD_DAYS:
+        return interval
+    days = PERIOD_DAYS[period]
+    covering = [base for base in INTERVAL_MINUTES if days <= MAX_HISTORY_DAYS[base]]
+    for base in covering:
+        minutes = INTERVAL_MINUTES[base]
+        if all(INTERVAL_MINUTES[other] % minutes == 0 for other in covering if INTERVAL_MINUTES[other] > minutes):
+            return base if INTERVAL_MINUTES[interval] % minutes == 0 else interval
+    return interval
+
+def resample_bars(hist, interval, session='TASE'):
+    """Agrège des barres fines en barres plus larges, alignées sur l'ouverture de séance
+
+    Open = première ouverture, High = max, Low = min, Close = dernière clôture,
+    Volume (et colonnes additionnelles) = somme. Les barres vides ne sont pas créées.
+    """
+    if hist is None or hist.empty:
+        return hist
+    step = pd.Timedelta(minutes=INTERVAL_MINUTES[interval])
+    tz, open_offset = SESSIONS[session]
+
+    index = hist.index
+    if index.tz is None:
+        index = index.tz_localize('UTC')
+    local = index.tz_convert(tz)
+
+    # Début de barre = ouverture de séance + k pas, calculé en heure locale de la place
+    session_open = local.normalize() + open_offset
+    buckets = session_open + ((local - session_open) // step) * step
+
+    # Frontières des groupes (l'index est trié, les groupes sont contigus)
+    bucket_values = buckets.asi8
+    starts = np.flatnonzero(np.r_[True, bucket_values[1:] != bucket_values[:-1]])
+    ends = np.r_[starts[1:], len(bucket_values)] - 1
+
+    columns = {}
+    for col in hist.columns:
+        values = hist[col].to_numpy()
+        if col == 'Open':
+            columns[col] = values[starts]
+        elif col == 'Close':
+            columns[col] = values[ends]
+        elif col == 'High':
+            columns[col] = np.fmax.reduceat(values, starts)
+        elif col == 'Low':
+            columns[col] = np.fmin.reduceat(values, starts)
+        else:
+            columns[col] = np.add.reduceat(np.nan_to_num(values), starts)
+
+    result = pd.DataFrame(columns, index=buckets[starts].tz_convert(index.tz))
+    result.index.name = hist.index.name
+    return result
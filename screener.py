@@ -0,0 +1,217 @@
+"""Filtre d'univers (screener) : panneau de cours aligné et conditions vectorisées"""
+import ast
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from data_quality import ingest
+
+# Membres du TA-125 (liste partielle, symboles Yahoo)
+TA125_SYMBOLS = [
+    'LUMI.TA', 'POLI.TA', 'DSCT.TA', 'MZTF.TA', 'FIBI.TA',          # Banques
+    'PHOE.TA', 'HARL.TA', 'CLIS.TA', 'MGDL.TA',                     # Assurances
+    'TEVA.TA', 'ICL.TA', 'NICE.TA', 'ESLT.TA', 'TSEM.TA',           # Grandes capitalisations
+    'NVMI.TA', 'CAMT.TA', 'ORA.TA', 'ENLT.TA', 'KEN.TA',
+    'BEZQ.TA', 'PTNR.TA', 'CEL.TA', 'HLAN.TA', 'FORTY.TA',          # Télécom / logiciel
+    'MTRX.TA', 'ONE.TA',
+    'AZRG.TA', 'MLSR.TA', 'AMOT.TA', 'ALHE.TA', 'BIG.TA',           # Immobilier
+    'SPEN.TA', 'ASHG.TA', 'SKBN.TA', 'ELTR.TA', 'AURA.TA',
+    'DLEKG.TA', 'NWMD.TA', 'ENRG.TA', 'OPCE.TA', 'PZOL.TA',         # Énergie
+    'ORL.TA',
+    'ELAL.TA', 'SAE.TA', 'STRS.TA', 'FOX.TA', 'DELT.TA',            # Consommation / transport
+    'ELCO.TA', 'ILCO.TA',
+]
+
+# Doubles cotations US des sociétés israéliennes
+US_DUAL_LISTINGS = ['TEVA', 'NICE', 'ESLT', 'ICL', 'TSEM', 'NVMI', 'CAMT', 'ORA', 'ENLT', 'KEN']
+
+UNIVERSES = {
+    'TA-125 + US': TA125_SYMBOLS + US_DUAL_LISTINGS,
+    'TA-125': TA125_SYMBOLS,
+    'US (double cotation)': US_DUAL_LISTINGS,
+}
+
+PANEL_FIELDS = ['Open', 'High', 'Low', 'Close', 'Volume']
+
+# Conditions prédéfinies (expressions sur la table d'indicateurs, cf. scan)
+PRESET_CONDITIONS = {
+    'Gap > 2%': 'abs(gap_pct) > 2',
+    'Volume > 2x moy. 20j': 'volume_ratio > 2',
+    'Croisement MM 20/50 haussier': 'ma_cross_up',
+    'Croisement MM 20/50 baissier': 'ma_cross_down',
+    'RSI < 30': 'rsi < 30',
+    'RSI > 70': 'rsi > 70',
+    'Plus haut 52 semaines': 'at_52w_high',
+}
+
+def _daily_index(index):
+    """Date de séance locale, sans fuseau, pour aligner TASE et US"""
+    if index.tz is not None:
+        index = index.tz_localize(None)
+    return index.normalize()
+
+def fetch_panel(source, symbols, period='1y', interval='1d', max_workers=8):
+    """Télécharge l'historique de chaque symbole en parallèle et aligne le tout
+
+    Renvoie {champ: DataFrame dates x symboles}. Les symboles sans données
+    sont présents avec des NaN (aucune exception ne remonte d'un symbole).
+    """
+    symbols = list(dict.fromkeys(symbols))
+
+    def fetch(symbol):
+        try:
+            # Contrôle qualité sans redemande : les historiques de période sont déjà ajustés
+            return ingest(symbol, interval, source.get_history(symbol, period, interval), lambda start, end: None)
+        except Exception:
+            return None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        frames = dict(zip(symbols, pool.map(fetch, symbols)))
+    return align_panel(frames, symbols, interval)
+
+def align_panel(frames, symbols, interval='1d'):
+    """Aligne des historiques {symbole: DataFrame} en {champ: DataFrame dates x symboles}"""
+    symbols = list(dict.fromkeys(symbols))
+    aligned = {}
+    for symbol in symbols:
+        hist = frames.get(symbol)
+        if hist is None or hist.empty:
+            continue
+        hist = hist.reindex(columns=PANEL_FIELDS)
+        if interval == '1d':
+            hist = hist.set_axis(_daily_index(hist.index))
+            hist = hist[~hist.index.duplicated(keep='last')]
+        aligned[symbol] = hist
+    if not aligned:
+        empty = pd.DataFrame(columns=symbols, dtype=float)
+        return {field: empty for field in PANEL_FIELDS}
+
+    panel = pd.concat(aligned, axis=1, names=['symbol', 'field']).sort_index()
+    return {
+        field: panel.xs(field, axis=1, level='field').reindex(columns=symbols).astype(float)
+        for field in PANEL_FIELDS
+    }
+
+def compute_indicators(panel, fast=20, slow=50, rsi_period=14, volume_window=20, high_window=252):
+    """Table d'indicateurs (une ligne par symbole) sur la dernière barre valide de chaque symbole
+
+    Le panneau est remis en format long (symbole, date) sans les dates où le
+    symbole n'a pas coté : un férié d'une place ou un calendrier TASE / US
+    décalé ne fausse ni les variations ni les moyennes.
+    """
+    symbols = panel['Close'].columns
+    long = pd.concat({field: panel[field] for field in PANEL_FIELDS}, axis=1).stack(level=1, future_stack=True)
+    long = long.swaplevel().sort_index()
+    long.index.names = ['symbol', 'date']
+    long = long[long['Close'].notna()]
+    if long.empty:
+        return pd.DataFrame(index=pd.Index(symbols, name='symbol'))
+
+    by_symbol = long.groupby(level='symbol', sort=False)
+    close = long['Close']
+    prev_close = by_symbol['Close'].shift(1)
+
+    def rolling(values, window, min_periods, how):
+        # Résultat dans l'ordre du format long (trié par symbole, donc par groupe)
+        return getattr(values.groupby(level='symbol', sort=False).rolling(window, min_periods=min_periods), how)().to_numpy()
+
+    # Moyennes mobiles : croisement sur la dernière barre du symbole
+    long['sma_fast'] = rolling(close, fast, fast, 'mean')
+    long['sma_slow'] = rolling(close, slow, slow, 'mean')
+    spread = long['sma_fast'] - long['sma_slow']
+    prev_spread = spread.groupby(level='symbol', sort=False).shift(1)
+    long['ma_cross_up'] = (spread > 0) & (prev_spread <= 0)
+    long['ma_cross_down'] = (spread < 0) & (prev_spread >= 0)
+
+    # RSI de Wilder (moyenne exponentielle alpha = 1/n)
+    delta = close - prev_close
+    ewm = dict(alpha=1 / rsi_period, min_periods=rsi_period, adjust=False)
+    g = delta.clip(lower=0).groupby(level='symbol', sort=False).ewm(**ewm).mean().to_numpy()
+    l = (-delta.clip(upper=0)).groupby(level='symbol', sort=False).ewm(**ewm).mean().to_numpy()
+    rsi = np.where(l > 0, 100 - 100 / (1 + np.divide(g, l, out=np.zeros_like(g), where=l > 0)), 100.0)
+    long['rsi'] = np.where(np.isnan(g) | np.isnan(l), np.nan, rsi)
+
+    # Volume relatif à la moyenne des séances précédentes du symbole
+    avg_volume = rolling(by_symbol['Volume'].shift(1), volume_window, 1, 'mean')
+    long['high_52w'] = rolling(close, high_window, 1, 'max')
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        long['price'] = close
+        long['change_pct'] = (close / prev_close - 1) * 100
+        long['gap_pct'] = (long['Open'] / prev_close - 1) * 100
+        long['volume'] = long['Volume']
+        long['volume_ratio'] = long['Volume'] / avg_volume
+        long['pct_from_52w_high'] = (close / long['high_52w'] - 1) * 100
+        long['at_52w_high'] = close >= long['high_52w']
+
+    columns = ['price', 'change_pct', 'gap_pct', 'volume', 'volume_ratio', 'sma_fast', 'sma_slow',
+               'ma_cross_up', 'ma_cross_down', 'rsi', 'high_52w', 'pct_from_52w_high', 'at_52w_high']
+    table = long.groupby(level='symbol', sort=False).tail(1).droplevel('date')[columns].reindex(symbols)
+    for column in ('ma_cross_up', 'ma_cross_down', 'at_52w_high'):
+        table[column] = table[column].fillna(False).astype(bool)
+    table.index.name = 'symbol'
+    return table.replace([np.inf, -np.inf], np.nan)
+
+# Opérateurs autorisés dans une condition saisie par l'utilisateur
+COMPARISONS = {
+    ast.Lt: np.less, ast.LtE: np.less_equal, ast.Gt: np.greater, ast.GtE: np.greater_equal,
+    ast.Eq: np.equal, ast.NotEq: np.not_equal,
+}
+LOGICAL = {ast.And: np.logical_and, ast.Or: np.logical_or, ast.BitAnd: np.logical_and, ast.BitOr: np.logical_or}
+
+def _evaluate(node, columns):
+    """Valeur d'un nœud de l'expression : colonnes d'indicateurs, nombres, abs(), comparaisons et logique"""
+    if isinstance(node, ast.Expression):
+        return _evaluate(node.body, columns)
+    if isinstance(node, ast.Name):
+        if node.id not in columns:
+            raise ValueError(f"Indicateur inconnu: {node.id}")
+        return columns[node.id]
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return node.value
+    if isinstance(node, ast.BoolOp) and type(node.op) in LOGICAL:
+        values = [_evaluate(v, columns) for v in node.values]
+        result = values[0]
+        for value in values[1:]:
+            result = LOGICAL[type(node.op)](result, value)
+        return result
+    if isinstance(node, ast.BinOp) and type(node.op) in LOGICAL:
+        return LOGICAL[type(node.op)](_evaluate(node.left, columns), _evaluate(node.right, columns))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.Invert)):
+        return np.logical_not(_evaluate(node.operand, columns))
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _evaluate(node.operand, columns)
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.Compare) and all(type(op) in COMPARISONS for op in node.ops):
+        left, result = _evaluate(node.left, columns), True
+        for op, comparator in zip(node.ops, node.comparators):
+            right = _evaluate(comparator, columns)
+            result = np.logical_and(result, COMPARISONS[type(op)](left, right))
+            left = right
+        return result
+    if (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == 'abs'
+            and len(node.args) == 1 and not node.keywords):
+        return np.abs(_evaluate(node.args[0], columns))
+    raise ValueError(f"Élément non autorisé dans l'expression: {ast.unparse(node)}")
+
+def scan(indicators, expression):
+    """Symboles vérifiant une expression (ex: 'rsi < 30 and volume_ratio > 2')
+
+    L'expression est analysée (ast) et évaluée ici : seuls les indicateurs de
+    la table, les nombres, abs() et les opérateurs de comparaison et logiques
+    sont acceptés. Aucun texte saisi n'est passé à eval.
+    """
+    expression = (expression or '').strip()
+    if not expression:
+        return indicators
+    try:
+        tree = ast.parse(expression, mode='eval')
+    except SyntaxError as e:
+        raise ValueError(f"Expression invalide: {expression}") from e
+    columns = {name: indicators[name].to_numpy() for name in indicators.columns}
+    with np.errstate(invalid='ignore'):
+        mask = np.asarray(_evaluate(tree, columns))
+    if mask.dtype != bool or mask.shape != (len(indicators),):
+        raise ValueError(f"L'expression doit être une condition: {expression}")
+    return indicators[mask]
@@ -0,0 +1,202 @@
+"""Cache de données de marché partagé entre les processus d'un même hôte (répliques Streamlit, worker)
+
+Un fichier SQLite en mode WAL (idéalement sur /dev/shm) contient les dernières
+cotations et les barres récentes. Les lecteurs ne bloquent jamais; pour chaque
+clé expirée, un seul processus obtient le bail de téléchargement, les autres
+servent la valeur précédente ou attendent la nouvelle.
+"""
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+
+import pandas as pd
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    value BLOB NOT NULL,
+    fetched_at REAL NOT NULL,
+    expires_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS leases (
+    key TEXT PRIMARY KEY,
+    owner TEXT NOT NULL,
+    expires_at REAL NOT NULL
+);
+"""
+
+# Durées de validité par type de données (secondes)
+QUOTES_TTL = 60
+HISTORY_TTL = 300
+CLOSED_HISTORY_TTL = 24 * 3600
+INFO_TTL = 24 * 3600
+
+# Alignement des plages demandées, pour que toutes les répliques partagent les mêmes clés
+RANGE_ALIGN = {
+    'start_intraday': '1h',
+    'start_daily': '1D',
+    'end': '5min',
+}
+
+class SharedCache:
+    """Clé -> valeur sérialisée avec expiration, et élection d'un seul processus de téléchargement par clé"""
+
+    def __init__(self, path, lease_timeout=30.0, poll=0.05, purge_every=500):
+        self.path = path
+        self.lease_timeout = lease_timeout
+        self.poll = poll
+        self.purge_every = purge_every
+        self.owner = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        self._local = threading.local()
+        self._writes = 0
+        self.stats = {'hits': 0, 'stale': 0, 'fetches': 0, 'waits': 0}
+
+        is_new = not os.path.exists(path)
+        conn = self._conn()
+        conn.executescript(SCHEMA)
+        if is_new:
+            try:
+                os.chmod(path, 0o600)
+            except OSError:
+                pass
+
+    def _conn(self):
+        """Une connexion par thread (lecteurs WAL concurrents)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute("PRAGMA mmap_size=268435456")
+            self._local.conn = conn
+        return conn
+
+    def _read(self, key):
+        row = self._conn().execute(
+            "SELECT value, expires_at FROM entries WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None, 0.0
+        return pickle.loads(row[0]), row[1]
+
+    def _acquire(self, key, now):
+        """Prend le bail de téléchargement si personne ne le détient (ou s'il a expiré)"""
+        cur = self._conn().execute(
+            "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at "
+            "WHERE leases.expires_at < ?",
+            (key, self.owner, now + self.lease_timeout, now)
+        )
+        return cur.rowcount == 1
+
+    def _release(self, key):
+        self._conn().execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, self.owner))
+
+    def put(self, key, value, ttl):
+        now = time.time()
+        self._conn().execute(
+            "INSERT OR REPLACE INTO entries (key, value, fetched_at, expires_at) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), now, now + ttl)
+        )
+        self._writes += 1
+        if self._writes % self.purge_every == 0:
+            self.purge()
+
+    def purge(self, grace=CLOSED_HISTORY_TTL):
+        """Supprime les entrées expirées depuis longtemps et les baux abandonnés"""
+        now = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM entries WHERE expires_at < ?", (now - grace,))
+        conn.execute("DELETE FROM leases WHERE expires_at < ?", (now,))
+
+    def get_or_fetch(self, key, ttl, fetch):
+        """Valeur en cache si valide; sinon un seul processus télécharge, les autres attendent ou servent l'ancienne valeur"""
+        value, expires_at = self._read(key)
+        now = time.time()
+        if value is not None and expires_at > now:
+            self.stats['hits'] += 1
+            return value
+
+        if self._acquire(key, now):
+            try:
+                self.stats['fetches'] += 1
+                value = fetch()
+                self.put(key, value, ttl)
+                return value
+            finally:
+                self._release(key)
+
+        # Un autre processus télécharge : valeur précédente si elle existe
+        if value is not None:
+            self.stats['stale'] += 1
+            return value
+        self.stats['waits'] += 1
+        deadline = now + self.lease_timeout
+        while time.time() < deadline:
+            time.sleep(self.poll)
+            value, expires_at = self._read(key)
+            if value is not None:
+                return value
+        # Bail abandonné (processus arrêté) : téléchargement local
+        self.stats['fetches'] += 1
+        value = fetch()
+        self.put(key, value, ttl)
+        return value
+
+class SharedSource:
+    """Source de données passant par le cache partagé (même interface que la source enveloppée)"""
+
+    def __init__(self, source, cache):
+        self.source = source
+        self.cache = cache
+
+    def __getattr__(self, name):
+        # name, now, advance... de la source d'origine
+        return getattr(self.source, name)
+
+    def _key(self, *parts):
+        # En rejeu, les données dépendent de l'instant simulé
+        now = getattr(self.source, 'now', None)
+        prefix = [self.source.name] + ([str(now)] if now is not None else [])
+        return ':'.join(prefix + [str(p) for p in parts])
+
+    def get_quotes(self, symbols):
+        symbols = list(symbols)
+        key = self._key('quotes', ','.join(sorted(symbols)))
+        quotes = self.cache.get_or_fetch(key, QUOTES_TTL, lambda: self.source.get_quotes(sorted(symbols)))
+        return quotes.reindex(symbols)
+
+    def get_history(self, symbol, period, interval):
+        key = self._key('history', symbol, period, interval)
+        return self.cache.get_or_fetch(key, HISTORY_TTL, lambda: self.source.get_history(symbol, period, interval))
+
+    def get_history_range(self, symbol, start, end, interval):
+        """Plage alignée sur une grille commune, puis découpée à la demande"""
+        start, end = pd.Timestamp(start), pd.Timestamp(end)
+        daily = not interval.endswith(('m', 'h'))
+        aligned_start = start.floor(RANGE_ALIGN['start_daily' if daily else 'start_intraday'])
+        aligned_end = end.ceil(RANGE_ALIGN['end'])
+        end_utc = aligned_end.tz_localize('UTC') if aligned_end.tz is None else aligned_end
+        closed = end_utc < pd.Timestamp.now(tz='UTC') - pd.Timedelta(days=1)
+        key = self._key('range', symbol, interval, aligned_start.value, aligned_end.value)
+        hist = self.cache.get_or_fetch(
+            key, CLOSED_HISTORY_TTL if closed else HISTORY_TTL,
+            lambda: self.source.get_history_range(symbol, aligned_start, aligned_end, interval)
+        )
+        if hist is None or hist.empty:
+            return hist
+        if getattr(hist.index, 'tz', None) is not None and start.tz is None:
+            start, end = start.tz_localize('UTC'), end.tz_localize('UTC')
+        return hist[(hist.index >= start) & (hist.index < end)]
+
+    def get_closes(self, symbols, start, interval='1d'):
+        symbols = list(symbols)
+        key = self._key('closes', ','.join(sorted(symbols)), pd.Timestamp(start).date(), interval)
+        closes = self.cache.get_or_fetch(key, HISTORY_TTL, lambda: self.source.get_closes(sorted(symbols), start, interval))
+        return closes.reindex(columns=symbols)
+
+    def get_info(self, symbol):
+        return self.cache.get_or_fetch(self._key('info', symbol), INFO_TTL, lambda: self.source.get_info(symbol))
@@ -0,0 +1,536 @@
+"""Persistance SQLite du portefeuille, des alertes, de la watchlist et de la config email"""
+import csv
+import io
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Emplacement de la base (surchargeable pour les déploiements multi-serveurs)
+DEFAULT_DB_PATH = os.environ.get(
+    'TRACKER_DB_PATH',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tracker.db')
+)
+
+DEFAULT_USER = 'default'
+
+DEFAULT_WATCHLIST = [
+    'TEVA',           # Teva Pharmaceutical Industries (TA100, aussi listé US)
+    'AZRG.TA',        # Azrieli Group
+    'BEZQ.TA',        # Bezeq
+    'LUMI.TA',        # Bank Leumi
+    'POLI.TA',        # Bank Hapoalim
+    'ICL.TA',         # ICL Group
+    'NICE',           # Nice Systems (TA100 & NASDAQ)
+    'ELAL.TA',        # El Al Airlines
+    'ENOG.TA',        # Energix
+    'KSML.TA'         # Kamada
+]
+
+# Configuration email de l'état utilisateur : le mot de passe SMTP n'y figure jamais
+# (table smtp_passwords, lue uniquement au moment de l'envoi)
+DEFAULT_EMAIL_CONFIG = {
+    'enabled': False,
+    'smtp_server': 'smtp.gmail.com',
+    'smtp_port': 587,
+    'email': '',
+    'password_set': False
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS lots (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    shares REAL NOT NULL,
+    buy_price REAL NOT NULL,
+    date TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_lots_user ON lots(user_id, symbol);
+
+CREATE TABLE IF NOT EXISTS alerts (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    price REAL NOT NULL,
+    condition TEXT NOT NULL CHECK (condition IN ('above', 'below')),
+    one_time INTEGER NOT NULL DEFAULT 0,
+    created TEXT NOT NULL,
+    state TEXT NOT NULL DEFAULT 'armed' CHECK (state IN ('armed', 'triggered', 'cooldown')),
+    triggered_at REAL,
+    hysteresis REAL NOT NULL DEFAULT 0.01,
+    cooldown INTEGER NOT NULL DEFAULT 3600
+);
+CREATE INDEX IF NOT EXISTS idx_alerts_user ON alerts(user_id);
+CREATE INDEX IF NOT EXISTS idx_alerts_symbol ON alerts(symbol);
+
+CREATE TABLE IF NOT EXISTS transactions (
+    id INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    type TEXT NOT NULL CHECK (type IN ('sell', 'dividend', 'fee')),
+    date TEXT NOT NULL,
+    quantity REAL NOT NULL,
+    price REAL NOT NULL,
+    fees REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_transactions_user ON transactions(user_id, symbol);
+
+CREATE TABLE IF NOT EXISTS watchlist (
+    user_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    symbol TEXT NOT NULL,
+    PRIMARY KEY (user_id, symbol)
+);
+
+CREATE TABLE IF NOT EXISTS email_config (
+    user_id TEXT PRIMARY KEY,
+    config TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS smtp_passwords (
+    user_id TEXT PRIMARY KEY,
+    password TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS workers (
+    name TEXT PRIMARY KEY,
+    pid INTEGER NOT NULL,
+    interval REAL NOT NULL,
+    beat_at REAL NOT NULL
+);
+"""
+
+# Colonnes ajoutées après la création initiale des tables (bases existantes)
+MIGRATIONS = {
+    'alerts': [
+        ('state', "TEXT NOT NULL DEFAULT 'armed'"),
+        ('triggered_at', 'REAL'),
+        ('hysteresis', 'REAL NOT NULL DEFAULT 0.01'),
+        ('cooldown', 'INTEGER NOT NULL DEFAULT 3600'),
+    ],
+}
+
+# Lecture de tout l'état d'un utilisateur en une seule requête indexée
+USER_STATE_QUERY = """
+SELECT 'lot', id, symbol, shares, buy_price, date, NULL, NULL, NULL, NULL, NULL FROM lots WHERE user_id = :u
+UNION ALL
+SELECT 'txn', id, symbol, quantity, price, date, type, fees, NULL, NULL, NULL FROM transactions WHERE user_id = :u
+UNION ALL
+SELECT 'alert', id, symbol, price, one_time, created, condition, state, triggered_at, hysteresis, cooldown
+FROM alerts WHERE user_id = :u
+UNION ALL
+SELECT 'watch', position, symbol, NULL, NULL, NULL, NULL, NULL, NULL, NULL, NULL FROM watchlist WHERE user_id = :u
+UNION ALL
+SELECT 'email', NULL, NULL, NULL, NULL, NULL, config,
+       EXISTS (SELECT 1 FROM smtp_passwords WHERE user_id = :u), NULL, NULL, NULL
+FROM email_config WHERE user_id = :u
+"""
+
+ALERT_QUERY = """
+SELECT id, user_id, symbol, price, condition, one_time, created, state, triggered_at, hysteresis, cooldown
+FROM alerts ORDER BY symbol
+"""
+
+def connect(db_path=DEFAULT_DB_PATH):
+    """Ouvre une connexion SQLite en mode WAL"""
+    is_new = not os.path.exists(db_path)
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    migrate(conn)
+    if is_new:
+        # La base contient des identifiants SMTP
+        try:
+            os.chmod(db_path, 0o600)
+        except OSError:
+            pass
+    return conn
+
+def migrate(conn):
+    """Ajoute les colonnes manquantes aux tables créées par une version antérieure"""
+    for table, columns in MIGRATIONS.items():
+        existing = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        for name, definition in columns:
+            if name not in existing:
+                conn.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+    # Mots de passe SMTP autrefois enregistrés dans la configuration email
+    for user_id, config in conn.execute("SELECT user_id, config FROM email_config").fetchall():
+        config = json.loads(config)
+        if 'password' in config:
+            password = config.pop('password')
+            if password:
+                conn.execute("INSERT OR REPLACE INTO smtp_passwords (user_id, password) VALUES (?, ?)", (user_id, password))
+            conn.execute("UPDATE email_config SET config = ? WHERE user_id = ?", (json.dumps(config), user_id))
+    conn.commit()
+
+class TrackerStore:
+    """Stockage durable avec cache en mémoire à écriture immédiate (write-through)
+
+    Copie sur écriture : les listes et dictionnaires de l'état en cache ne sont jamais
+    modifiés en place, chaque écriture remplace le conteneur concerné. Les lecteurs
+    reçoivent ces conteneurs partagés sans copie et ne doivent pas les modifier.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH):
+        self.db_path = db_path
+        self.conn = connect(db_path)
+        self._lock = threading.RLock()
+        self._cache = {}
+        self._data_version = self._read_data_version()
+
+    def _read_data_version(self):
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def _invalidate_if_changed(self):
+        """Vide le cache si un autre processus (worker d'alertes) a écrit dans la base"""
+        version = self._read_data_version()
+        if version != self._data_version:
+            self._data_version = version
+            self._cache.clear()
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+    def _load(self, user_id):
+        """Charge l'état d'un utilisateur depuis la base"""
+        state = {
+            'portfolio': {},
+            'transactions': [],
+            'price_alerts': [],
+            'watchlist': [],
+            'email_config': None
+        }
+        watch = []
+        rows = self.conn.execute(USER_STATE_QUERY, {'u': user_id}).fetchall()
+        for kind, row_id, symbol, a, b, c, d, e, f, g, h in rows:
+            if kind == 'lot':
+                state['portfolio'].setdefault(symbol, []).append({
+                    'id': row_id,
+                    'shares': a,
+                    'buy_price': b,
+                    'date': c
+                })
+            elif kind == 'txn':
+                state['transactions'].append({
+                    'id': row_id,
+                    'symbol': symbol,
+                    'type': d,
+                    'date': c,
+                    'quantity': a,
+                    'price': b,
+                    'fees': e
+                })
+            elif kind == 'alert':
+                state['price_alerts'].append({
+                    'id': row_id,
+                    'symbol': symbol,
+                    'price': a,
+                    'condition': d,
+                    'one_time': bool(b),
+                    'created': c,
+                    'state': e,
+                    'triggered_at': f,
+                    'hysteresis': g,
+                    'cooldown': h
+                })
+            elif kind == 'watch':
+                watch.append((row_id, symbol))
+            elif kind == 'email':
+                state['email_config'] = {**json.loads(d), 'password_set': bool(e)}
+
+        state['watchlist'] = [s for _, s in sorted(watch)]
+        return state
+
+    def _state(self, user_id):
+        """État en cache (chargé à la première demande)"""
+        if user_id not in self._cache:
+            self._cache[user_id] = self._load(user_id)
+        return self._cache[user_id]
+
+    def get_user_state(self, user_id=DEFAULT_USER):
+        """État d'un utilisateur (à ne pas modifier), avec les valeurs par défaut; rien n'est écrit"""
+        with self._lock:
+            self._invalidate_if_changed()
+            result = dict(self._state(user_id))
+        if not result['watchlist']:
+            result['watchlist'] = list(DEFAULT_WATCHLIST)
+        if result['email_config'] is None:
+            result['email_config'] = dict(DEFAULT_EMAIL_CONFIG)
+        return result
+
+    def get_all_alerts(self):
+        """Toutes les alertes de tous les utilisateurs (pour les traitements hors session)"""
+        with self._lock:
+            rows = self.conn.execute(ALERT_QUERY).fetchall()
+        return [
+            {'id': r[0], 'user_id': r[1], 'symbol': r[2], 'price': r[3],
+             'condition': r[4], 'one_time': bool(r[5]), 'created': r[6],
+             'state': r[7], 'triggered_at': r[8], 'hysteresis': r[9], 'cooldown': r[10]}
+            for r in rows
+        ]
+
+    def get_email_configs(self):
+        """Configurations email d'envoi de tous les utilisateurs, mots de passe SMTP compris"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT c.user_id, c.config, p.password FROM email_config c "
+                "LEFT JOIN smtp_passwords p ON p.user_id = c.user_id"
+            ).fetchall()
+        return {user_id: {**json.loads(config), 'password': password or ''} for user_id, config, password in rows}
+
+    def get_smtp_config(self, user_id):
+        """Configuration d'envoi d'un utilisateur, mot de passe compris (jamais placée dans l'état)"""
+        with self._lock:
+            row = self.conn.execute("SELECT password FROM smtp_passwords WHERE user_id = ?", (user_id,)).fetchone()
+        config = {k: v for k, v in self.get_user_state(user_id)['email_config'].items() if k != 'password_set'}
+        return {**config, 'password': row[0] if row else ''}
+
+    # ------------------------------------------------------------------
+    # Portefeuille
+    # ------------------------------------------------------------------
+    def add_lot(self, user_id, symbol, shares, buy_price, date):
+        """Ajoute une position au portefeuille"""
+        with self._lock, self.conn:
+            # État chargé avant l'insertion, sinon la nouvelle ligne y figurerait deux fois
+            state = self._state(user_id)
+            cur = self.conn.execute(
+                "INSERT INTO lots (user_id, symbol, shares, buy_price, date) VALUES (?, ?, ?, ?, ?)",
+                (user_id, symbol, shares, buy_price, date)
+            )
+            state['portfolio'] = {**state['portfolio'], symbol: state['portfolio'].get(symbol, []) + [{
+                'id': cur.lastrowid,
+                'shares': shares,
+                'buy_price': buy_price,
+                'date': date
+            }]}
+
+    def add_lots(self, user_id, lots):
+        """Ajoute un lot de positions en une transaction (symbol, shares, buy_price, date)"""
+        lots = list(lots)
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO lots (user_id, symbol, shares, buy_price, date) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, *lot) for lot in lots]
+            )
+            # Rechargement unique plutôt qu'une mise à jour ligne par ligne
+            self._cache.pop(user_id, None)
+        return len(lots)
+
+    def clear_portfolio(self, user_id):
+        """Vide le portefeuille d'un utilisateur"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM lots WHERE user_id = ?", (user_id,))
+            self.conn.execute("DELETE FROM transactions WHERE user_id = ?", (user_id,))
+            state = self._state(user_id)
+            state['portfolio'] = {}
+            state['transactions'] = []
+
+    # ------------------------------------------------------------------
+    # Transactions (ventes, dividendes, frais)
+    # ------------------------------------------------------------------
+    def add_transaction(self, user_id, symbol, kind, date, quantity, price, fees=0.0):
+        """Enregistre une vente, un dividende ou des frais"""
+        with self._lock, self.conn:
+            state = self._state(user_id)
+            cur = self.conn.execute(
+                "INSERT INTO transactions (user_id, symbol, type, date, quantity, price, fees) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (user_id, symbol, kind, date, quantity, price, fees)
+            )
+            state['transactions'] = state['transactions'] + [{
+                'id': cur.lastrowid,
+                'symbol': symbol,
+                'type': kind,
+                'date': date,
+                'quantity': quantity,
+                'price': price,
+                'fees': fees
+            }]
+
+    def import_transactions(self, user_id, transactions):
+        """Importe un relevé complet en une transaction SQL (achats en lots, le reste en transactions)"""
+        buys = [t for t in transactions if t['type'] == 'buy']
+        others = [t for t in transactions if t['type'] != 'buy']
+        # Les frais d'achat deviennent une ligne de frais distincte
+        others += [
+            {'symbol': t['symbol'], 'type': 'fee', 'date': t['date'], 'quantity': 0.0, 'price': t['fees'], 'fees': 0.0}
+            for t in buys if t.get('fees')
+        ]
+        with self._lock, self.conn:
+            self.conn.executemany(
+                "INSERT INTO lots (user_id, symbol, shares, buy_price, date) VALUES (?, ?, ?, ?, ?)",
+                [(user_id, t['symbol'], t['quantity'], t['price'], t['date']) for t in buys]
+            )
+            self.conn.executemany(
+                "INSERT INTO transactions (user_id, symbol, type, date, quantity, price, fees) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(user_id, t['symbol'], t['type'], t['date'], t['quantity'], t['price'], t.get('fees', 0.0)) for t in others]
+            )
+            self._cache.pop(user_id, None)
+        return len(transactions)
+
+    # ------------------------------------------------------------------
+    # Alertes
+    # ------------------------------------------------------------------
+    def add_alert(self, user_id, symbol, price, condition, one_time, created, hysteresis=0.01, cooldown=3600):
+        """Crée une alerte de prix (armée)"""
+        with self._lock, self.conn:
+            state = self._state(user_id)
+            cur = self.conn.execute(
+                "INSERT INTO alerts (user_id, symbol, price, condition, one_time, created, hysteresis, cooldown) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (user_id, symbol, price, condition, int(one_time), created, hysteresis, int(cooldown))
+            )
+            state['price_alerts'] = state['price_alerts'] + [{
+                'id': cur.lastrowid,
+                'symbol': symbol,
+                'price': price,
+                'condition': condition,
+                'one_time': bool(one_time),
+                'created': created,
+                'state': 'armed',
+                'triggered_at': None,
+                'hysteresis': hysteresis,
+                'cooldown': int(cooldown)
+            }]
+
+    def delete_alert(self, user_id, alert_id):
+        """Supprime une alerte"""
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM alerts WHERE id = ? AND user_id = ?", (alert_id, user_id))
+            state = self._state(user_id)
+            state['price_alerts'] = [a for a in state['price_alerts'] if a['id'] != alert_id]
+
+    def update_alert_states(self, records):
+        """Persiste un lot de transitions, tous utilisateurs confondus, par comparaison-échange
+
+        records : [(état, heure de déclenchement, id, état lu, heure lue)]. Une transition
+        n'est écrite que si l'alerte est encore dans l'état lu : quand le worker et une ou
+        plusieurs sessions évaluent la même alerte, un seul l'emporte. Renvoie les ids écrits.
+        """
+        committed = set()
+        if not records:
+            return committed
+        with self._lock, self.conn:
+            for state, triggered_at, alert_id, read_state, read_triggered_at in records:
+                cur = self.conn.execute(
+                    "UPDATE alerts SET state = ?, triggered_at = ? "
+                    "WHERE id = ? AND state = ? AND triggered_at IS ?",
+                    (state, triggered_at, alert_id, read_state, read_triggered_at)
+                )
+                if cur.rowcount:
+                    committed.add(alert_id)
+            self._cache.clear()
+        return committed
+
+    def delete_alerts(self, records):
+        """Supprime un lot d'alertes [(id, état lu)] encore dans l'état lu; renvoie les ids supprimés"""
+        deleted = set()
+        if not records:
+            return deleted
+        with self._lock, self.conn:
+            for alert_id, read_state in records:
+                cur = self.conn.execute("DELETE FROM alerts WHERE id = ? AND state = ?", (alert_id, read_state))
+                if cur.rowcount:
+                    deleted.add(alert_id)
+            self._cache.clear()
+        return deleted
+
+    # ------------------------------------------------------------------
+    # Processus de fond
+    # ------------------------------------------------------------------
+    def heartbeat(self, name, interval):
+        """Signale qu'un processus de fond (worker d'alertes) est actif, avec sa période en secondes"""
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO workers (name, pid, interval, beat_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(name) DO UPDATE SET pid = excluded.pid, interval = excluded.interval, "
+                "beat_at = excluded.beat_at",
+                (name, os.getpid(), float(interval), time.time())
+            )
+
+    def worker_alive(self, name, missed=3):
+        """Vrai si le processus a signalé sa présence depuis moins de missed périodes"""
+        with self._lock:
+            row = self.conn.execute("SELECT interval, beat_at FROM workers WHERE name = ?", (name,)).fetchone()
+        return row is not None and time.time() - row[1] < missed * max(row[0], 1.0)
+
+    # ------------------------------------------------------------------
+    # Watchlist et configuration email
+    # ------------------------------------------------------------------
+    def _set_watchlist(self, user_id, symbols):
+        with self.conn:
+            self.conn.execute("DELETE FROM watchlist WHERE user_id = ?", (user_id,))
+            self.conn.executemany(
+                "INSERT INTO watchlist (user_id, position, symbol) VALUES (?, ?, ?)",
+                [(user_id, i, s) for i, s in enumerate(symbols)]
+            )
+        self._state(user_id)['watchlist'] = list(symbols)
+
+    def set_watchlist(self, user_id, symbols):
+        """Remplace la watchlist d'un utilisateur"""
+        with self._lock:
+            self._set_watchlist(user_id, list(dict.fromkeys(symbols)))
+
+    def add_watchlist_symbol(self, user_id, symbol):
+        """Ajoute un symbole en fin de watchlist"""
+        with self._lock:
+            state = self._state(user_id)
+            watchlist = state['watchlist']
+            if not watchlist:
+                # Watchlist par défaut affichée mais jamais enregistrée : elle l'est à la première modification
+                self._set_watchlist(user_id, list(dict.fromkeys(DEFAULT_WATCHLIST + [symbol])))
+                return
+            if symbol in watchlist:
+                return
+            with self.conn:
+                self.conn.execute(
+                    "INSERT INTO watchlist (user_id, position, symbol) VALUES (?, ?, ?)",
+                    (user_id, len(watchlist), symbol)
+                )
+            state['watchlist'] = watchlist + [symbol]
+
+    def save_email_config(self, user_id, config):
+        """Enregistre la configuration email; un mot de passe vide conserve celui déjà enregistré"""
+        config = {k: v for k, v in config.items() if k != 'password_set'}
+        password = config.pop('password', '')
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO email_config (user_id, config) VALUES (?, ?) "
+                "ON CONFLICT(user_id) DO UPDATE SET config = excluded.config",
+                (user_id, json.dumps(config))
+            )
+            if password:
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO smtp_passwords (user_id, password) VALUES (?, ?)", (user_id, password)
+                )
+            password_set = self.conn.execute(
+                "SELECT 1 FROM smtp_passwords WHERE user_id = ?", (user_id,)
+            ).fetchone() is not None
+            self._state(user_id)['email_config'] = {**config, 'password_set': password_set}
+
+    # ------------------------------------------------------------------
+    # Import / export
+    # ------------------------------------------------------------------
+    def export_user(self, user_id):
+        """Exporte l'état d'un utilisateur (le mot de passe SMTP n'en fait pas partie)"""
+        return self.get_user_state(user_id)
+
+    def import_lots_csv(self, user_id, data):
+        """Importe des positions depuis un CSV (colonnes symbol, shares, buy_price, date)"""
+        if isinstance(data, bytes):
+            data = data.decode('utf-8-sig')
+        reader = csv.DictReader(io.StringIO(data) if isinstance(data, str) else data)
+        # Cellules absentes (None pour une ligne courte) ou vides : chaîne vide, puis ValueError sur les nombres
+        lots = (
+            (
+                (row.get('symbol') or '').strip().upper(),
+                float((row.get('shares') or '').strip()),
+                float((row.get('buy_price') or '').strip()),
+                (row.get('date') or '').strip(),
+            )
+            for row in reader
+            if (row.get('symbol') or '').strip()
+        )
+        return self.add_lots(user_id, lots)
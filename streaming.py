@@ -0,0 +1,342 @@
+"""Flux de prix en temps réel : agrégation des ticks en barres OHLCV en mémoire
+
+Le flux par défaut est le streamer websocket de Yahoo (yf.WebSocket). Pour les
+tests, ReplayTickServer rejoue des ticks enregistrés avec le même protocole :
+
+    python streaming.py --replay ticks.csv --port 8765
+    TRACKER_STREAM_URL=ws://127.0.0.1:8765 streamlit run Dashboard.py
+"""
+import argparse
+import base64
+import json
+import logging
+import os
+import random
+import threading
+import time
+
+import pandas as pd
+import yfinance as yf
+
+from market_data import unit_scales
+
+logger = logging.getLogger(__name__)
+
+YAHOO_STREAM_URL = "wss://streamer.finance.yahoo.com/?version=2"
+
+# Barres closes conservées par symbole (prolongement du graphique au-delà de l'historique REST)
+MAX_STREAM_BARS = 2000
+
+# Reconnexion : délai initial et plafond (s), durée de connexion au-delà de laquelle le délai repart du début
+RECONNECT_DELAY = 1.0
+RECONNECT_MAX_DELAY = 60.0
+RECONNECT_RESET = 30.0
+
+BAR_COLUMNS = {'open': 'Open', 'high': 'High', 'low': 'Low', 'close': 'Close', 'volume': 'Volume'}
+
+# Durée des barres intraday en millisecondes
+INTERVAL_MS = {
+    '1m': 60_000,
+    '2m': 120_000,
+    '5m': 300_000,
+    '15m': 900_000,
+    '30m': 1_800_000,
+    '1h': 3_600_000,
+}
+
+def parse_tick(message):
+    """Normalise un message du streamer (dict protobuf décodé) en tick"""
+    if not message or 'id' not in message or 'price' not in message:
+        return None
+    return {
+        'symbol': message['id'],
+        'time': int(message.get('time', time.time() * 1000)),
+        'price': float(message['price']),
+        'day_volume': int(message['day_volume']) if 'day_volume' in message else None,
+        'last_size': int(message['last_size']) if 'last_size' in message else None,
+    }
+
+class BarAggregator:
+    """Agrège les ticks dans la barre OHLCV courante de chaque symbole"""
+
+    def __init__(self, interval):
+        self.step = INTERVAL_MS[interval]
+        self.bars = {}
+        self.closed = {}
+        self._anchors = {}
+        self._day_volume = {}
+
+    def seed(self, symbol, hist):
+        """Aligne les barres sur la dernière barre de l'historique REST"""
+        if hist is None or hist.empty:
+            return
+        last = hist.iloc[-1]
+        start = int(hist.index[-1].timestamp() * 1000)
+        self._anchors[symbol] = start
+        self.bars[symbol] = {
+            'start': start,
+            'open': float(last['Open']),
+            'high': float(last['High']),
+            'low': float(last['Low']),
+            'close': float(last['Close']),
+            'volume': int(last['Volume']),
+        }
+
+    def _bar_start(self, symbol, t):
+        anchor = self._anchors.get(symbol, 0)
+        return anchor + ((t - anchor) // self.step) * self.step
+
+    def update(self, tick):
+        """Intègre un tick; renvoie (barre, nouvelle_barre)"""
+        symbol, t, price = tick['symbol'], tick['time'], tick['price']
+        start = self._bar_start(symbol, t)
+
+        # Volume du tick : taille de la transaction, sinon delta du volume journalier
+        volume = tick['last_size'] or 0
+        if tick['day_volume'] is not None:
+            previous = self._day_volume.get(symbol)
+            if not tick['last_size'] and previous is not None:
+                volume = max(tick['day_volume'] - previous, 0)
+            self._day_volume[symbol] = tick['day_volume']
+
+        bar = self.bars.get(symbol)
+        if bar is not None and start < bar['start']:
+            # Tick en retard : ignoré pour ne pas réécrire une barre close
+            return bar, False
+        if bar is None or start > bar['start']:
+            if bar is not None:
+                closed = self.closed.setdefault(symbol, [])
+                closed.append(bar)
+                del closed[:-MAX_STREAM_BARS]
+            bar = {'start': start, 'open': price, 'high': price, 'low': price, 'close': price, 'volume': volume}
+            self.bars[symbol] = bar
+            return bar, True
+
+        bar['high'] = max(bar['high'], price)
+        bar['low'] = min(bar['low'], price)
+        bar['close'] = price
+        bar['volume'] += volume
+        return bar, False
+
+    def frame(self, symbol):
+        """Barres closes et barre courante d'un symbole (OHLCV, index UTC)"""
+        bars = self.closed.get(symbol, []) + ([self.bars[symbol]] if symbol in self.bars else [])
+        frame = pd.DataFrame(bars, columns=['start', *BAR_COLUMNS]).rename(columns=BAR_COLUMNS)
+        frame.index = pd.to_datetime(frame.pop('start'), unit='ms', utc=True).rename(None)
+        return frame.astype(float)
+
+class StreamHub:
+    """Connexion websocket unique partagée par toutes les sessions du serveur
+
+    Le fil d'écoute se reconnecte après une coupure, avec un délai doublé à chaque
+    échec (de RECONNECT_DELAY à RECONNECT_MAX_DELAY, avec gigue), et réabonne tous
+    les symboles suivis.
+    """
+
+    def __init__(self, url=None, feed_factory=None):
+        self.url = url or os.environ.get('TRACKER_STREAM_URL', YAHOO_STREAM_URL)
+        self._feed_factory = feed_factory or (lambda url: yf.WebSocket(url=url, verbose=False))
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._aggregators = {}
+        self._symbols = set()
+        # Facteur unité de cotation -> devise des symboles suivis (ticks TASE en agorot)
+        self._scales = {}
+        self._feed = None
+        self._thread = None
+        self.last_tick = {}
+        self.versions = {}
+        self.reconnects = 0
+
+    @property
+    def connected(self):
+        return self._feed is not None
+
+    def _on_message(self, message):
+        tick = parse_tick(message)
+        if tick is None:
+            return
+        with self._lock:
+            # Même unité que l'historique REST qui amorce les barres
+            tick['price'] *= self._scales.get(tick['symbol'], 1.0)
+            self.last_tick[tick['symbol']] = tick
+            for aggregator in self._aggregators.values():
+                aggregator.update(tick)
+            self.versions[tick['symbol']] = self.versions.get(tick['symbol'], 0) + 1
+
+    def _connect(self):
+        """Ouvre une connexion et l'abonne aux symboles suivis (réseau hors du verrou)"""
+        with self._lock:
+            symbols = sorted(self._symbols)
+        feed = self._feed_factory(self.url)
+        feed.subscribe(symbols)
+        with self._lock:
+            if self._stop.is_set():
+                feed.close()
+                raise ConnectionAbortedError("Flux fermé")
+            self._feed = feed
+            added = sorted(self._symbols.difference(symbols))
+        if added:
+            feed.subscribe(added)
+        return feed
+
+    def _listen(self):
+        delay = RECONNECT_DELAY
+        while not self._stop.is_set():
+            started = time.monotonic()
+            try:
+                self._connect().listen(self._on_message)
+                logger.warning("Flux fermé par le serveur")
+            except Exception as e:
+                logger.warning("Flux interrompu: %s", e)
+            with self._lock:
+                self._feed = None
+            if self._stop.is_set():
+                break
+            if time.monotonic() - started >= RECONNECT_RESET:
+                delay = RECONNECT_DELAY
+            self.reconnects += 1
+            logger.info("Reconnexion au flux dans %.1f s", delay)
+            self._stop.wait(delay * random.uniform(0.5, 1.0))
+            delay = min(delay * 2, RECONNECT_MAX_DELAY)
+
+    def subscribe(self, symbol, interval, hist=None):
+        """Abonne un symbole et initialise son agrégateur pour l'intervalle donné"""
+        scale = self._scales.get(symbol)
+        if scale is None:
+            scale = unit_scales([symbol])[0]
+        with self._lock:
+            self._scales[symbol] = scale
+            aggregator = self._aggregators.setdefault(interval, BarAggregator(interval))
+            if symbol not in aggregator.bars:
+                aggregator.seed(symbol, hist)
+            new_symbol = symbol not in self._symbols
+            self._symbols.add(symbol)
+            if self._thread is None or not self._thread.is_alive():
+                self._stop.clear()
+                self._thread = threading.Thread(target=self._listen, name='stream-hub', daemon=True)
+                self._thread.start()
+            elif new_symbol and self._feed is not None:
+                # Sinon abonné à la (re)connexion
+                self._feed.subscribe([symbol])
+
+    def snapshot(self, symbol, interval):
+        """Copie de la barre courante, du dernier tick et du numéro de version"""
+        with self._lock:
+            aggregator = self._aggregators.get(interval)
+            bar = dict(aggregator.bars[symbol]) if aggregator and symbol in aggregator.bars else None
+            return bar, self.last_tick.get(symbol), self.versions.get(symbol, 0)
+
+    def bars(self, symbol, interval):
+        """Barres reçues par le flux depuis l'amorçage (OHLCV, index UTC), vide si aucune"""
+        with self._lock:
+            aggregator = self._aggregators.get(interval)
+            if aggregator is None:
+                return pd.DataFrame(columns=list(BAR_COLUMNS.values()), dtype=float)
+            return aggregator.frame(symbol)
+
+    def close(self):
+        self._stop.set()
+        with self._lock:
+            if self._feed is not None:
+                self._feed.close()
+                self._feed = None
+
+def encode_tick(symbol, time_ms, price, day_volume=None):
+    """Encode un tick au format du streamer Yahoo (protobuf PricingData en base64)"""
+    from yfinance.pricing_pb2 import PricingData
+
+    data = PricingData(id=symbol, price=price, time=int(time_ms))
+    if day_volume is not None:
+        data.day_volume = int(day_volume)
+    return json.dumps({'type': 'pricing', 'message': base64.b64encode(data.SerializeToString()).decode()})
+
+class ReplayTickServer:
+    """Serveur websocket local rejouant des ticks enregistrés (colonnes timestamp, symbol, price[, day_volume])
+
+    Le rejeu reprend après le dernier tick envoyé : un client qui se reconnecte
+    ne reçoit pas une seconde fois les ticks déjà agrégés.
+    """
+
+    def __init__(self, path_or_frame, host='127.0.0.1', port=0, speed=1.0, loop=False):
+        ticks = path_or_frame if isinstance(path_or_frame, pd.DataFrame) else pd.read_csv(path_or_frame)
+        ticks = ticks.copy()
+        ticks['timestamp'] = pd.to_datetime(ticks['timestamp'], utc=True)
+        self.ticks = ticks.sort_values('timestamp', kind='stable').reset_index(drop=True)
+        self.host = host
+        self.port = port
+        self.speed = speed
+        self.loop = loop
+        # Prochain tick à rejouer, partagé par les connexions successives
+        self.cursor = 0
+        self._server = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"ws://{self.host}:{self.port}"
+
+    def _handler(self, connection):
+        subscribed = set()
+        message = json.loads(connection.recv())
+        subscribed.update(message.get('subscribe', []))
+
+        times = self.ticks['timestamp'].dt.as_unit('ms').astype('int64').to_numpy()
+        has_volume = 'day_volume' in self.ticks
+        while True:
+            started, first = time.monotonic(), self.cursor
+            for i, row in enumerate(self.ticks.iloc[first:].itertuples(index=False), start=first):
+                if self.speed > 0:
+                    delay = (times[i] - times[first]) / 1000 / self.speed - (time.monotonic() - started)
+                    if delay > 0:
+                        time.sleep(delay)
+                try:
+                    update = json.loads(connection.recv(timeout=0))
+                    subscribed.update(update.get('subscribe', []))
+                    subscribed.difference_update(update.get('unsubscribe', []))
+                except TimeoutError:
+                    pass
+                if row.symbol in subscribed:
+                    connection.send(encode_tick(
+                        row.symbol, times[i], row.price,
+                        row.day_volume if has_volume else None
+                    ))
+                self.cursor = i + 1
+            if not self.loop:
+                break
+            self.cursor = 0
+
+    def start(self):
+        """Démarre le serveur dans un thread; renvoie son URL"""
+        from websockets.sync.server import serve
+
+        self._server = serve(self._handler, self.host, self.port)
+        self.port = self._server.socket.getsockname()[1]
+        self._thread = threading.Thread(target=self._server.serve_forever, name='replay-ticks', daemon=True)
+        self._thread.start()
+        return self.url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server = None
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur local de rejeu de ticks")
+    parser.add_argument('--replay', required=True, help="CSV timestamp, symbol, price[, day_volume]")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--speed', type=float, default=1.0, help="Facteur d'accélération (0 = sans attente)")
+    parser.add_argument('--loop', action='store_true', help="Rejouer en boucle")
+    args = parser.parse_args(argv)
+
+    server = ReplayTickServer(args.replay, args.host, args.port, args.speed, args.loop)
+    print(f"Rejeu des ticks sur {server.start()}")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        server.stop()
+
+if __name__ == '__main__':
+    main()
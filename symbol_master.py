@@ -0,0 +1,188 @@
+"""Référentiel local des valeurs (TASE et doubles cotations US), sans accès réseau
+
+La source éditable est data/symbols.csv. Elle est compilée en tableaux NumPy
+à largeur fixe (octets UTF-8), projetés en mémoire à la lecture :
+
+- les fiches, triées par symbole;
+- l'index de recherche : clés triées (symbole, symbole sans suffixe, mots des
+  noms anglais et hébreux, numéro de valeur) et numéro de fiche. C'est un trie
+  aplati : les clés commençant par un préfixe forment une plage contiguë,
+  trouvée par deux recherches dichotomiques.
+
+La recherche exacte d'un symbole passe par un dictionnaire (O(1)).
+"""
+import csv
+import difflib
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+SYMBOLS_CSV = os.path.join(DATA_DIR, 'symbols.csv')
+
+FIELDS = ['symbol', 'name_en', 'name_he', 'exchange', 'currency', 'unit', 'security_id', 'dual_listing']
+
+# Unité de cotation -> facteur vers la devise (les actions TASE sont cotées en agorot)
+UNIT_SCALE = {'agorot': 0.01, 'shekel': 1.0, 'dollar': 1.0, 'points': 1.0, 'rate': 1.0}
+
+CURRENCY_SIGNS = {'ILS': '₪', 'USD': '$'}
+
+def _suffix_exchange(symbol):
+    """Place déduite du suffixe, pour les symboles absents du référentiel"""
+    return 'TASE' if symbol.endswith('.TA') else 'US'
+
+def _search_keys(record):
+    """Clés d'autocomplétion d'une fiche (minuscules)"""
+    symbol = record['symbol'].lower()
+    keys = {symbol, symbol.split('.')[0].lstrip('^')}
+    for name in (record['name_en'], record['name_he']):
+        words = name.lower().replace('(', ' ').replace(')', ' ').split()
+        keys.update(words)
+        keys.add(' '.join(words))
+    if record['security_id']:
+        keys.add(record['security_id'])
+    keys.discard('')
+    return keys
+
+def _fixed_width(values):
+    encoded = [v.encode('utf-8') for v in values]
+    return np.array(encoded, dtype=f"S{max([len(v) for v in encoded] + [1])}")
+
+def compile_master(csv_path=SYMBOLS_CSV, out_dir=None):
+    """Compile le CSV en fichiers .npy (fiches et index de recherche); renvoie leurs chemins"""
+    out_dir = out_dir or os.path.dirname(csv_path)
+    with open(csv_path, encoding='utf-8', newline='') as f:
+        records = sorted(csv.DictReader(f), key=lambda r: r['symbol'])
+
+    table = np.empty(len(records), dtype=[
+        (field, _fixed_width([r[field] for r in records]).dtype) for field in FIELDS
+    ])
+    for field in FIELDS:
+        table[field] = _fixed_width([r[field] for r in records])
+
+    pairs = sorted((key.encode('utf-8'), row) for row, record in enumerate(records) for key in _search_keys(record))
+    keys = np.array([k for k, _ in pairs], dtype=f"S{max(len(k) for k, _ in pairs)}")
+    rows = np.array([row for _, row in pairs], dtype=np.int32)
+
+    base = os.path.join(out_dir, os.path.splitext(os.path.basename(csv_path))[0])
+    paths = (base + '.records.npy', base + '.keys.npy', base + '.rows.npy')
+    for path, array in zip(paths, (table, keys, rows)):
+        # Écriture atomique : les processus qui lisent déjà gardent l'ancienne projection
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, 'wb') as f:
+            np.save(f, array)
+        os.replace(tmp, path)
+    return paths
+
+class SymbolMaster:
+    """Fiches des valeurs : recherche exacte O(1) et autocomplétion par préfixe"""
+
+    def __init__(self, csv_path=SYMBOLS_CSV):
+        base = os.path.splitext(csv_path)[0]
+        paths = (base + '.records.npy', base + '.keys.npy', base + '.rows.npy')
+        # Recompilation si le CSV est plus récent que les fichiers compilés
+        if not all(os.path.exists(p) and os.path.getmtime(p) >= os.path.getmtime(csv_path) for p in paths):
+            try:
+                paths = compile_master(csv_path)
+            except OSError:
+                # Répertoire en lecture seule : compilation dans un répertoire temporaire
+                paths = compile_master(csv_path, tempfile.mkdtemp(prefix='symbols-'))
+        self.records, self.keys, self.rows = (np.load(p, mmap_mode='r') for p in paths)
+        self._index = {s.decode(): i for i, s in enumerate(self.records['symbol'])}
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, symbol):
+        return symbol in self._index
+
+    @property
+    def symbols(self):
+        return list(self._index)
+
+    def _record(self, row):
+        record = self.records[row]
+        return {field: record[field].decode('utf-8') for field in FIELDS}
+
+    def lookup(self, symbol):
+        """Fiche d'un symbole (dict) ou None"""
+        row = self._index.get(symbol)
+        return None if row is None else self._record(row)
+
+    def search(self, text, limit=10):
+        """Fiches dont un symbole, un mot du nom ou le numéro de valeur commence par text"""
+        prefix = text.strip().lower().encode('utf-8')
+        if not prefix:
+            return []
+        lo = np.searchsorted(self.keys, prefix, side='left')
+        hi = np.searchsorted(self.keys, prefix + b'\xff', side='left')
+        # Symboles exacts en premier, puis ordre alphabétique des fiches
+        rows = dict.fromkeys(self.rows[lo:hi].tolist())
+        exact = self._index.get(text.strip().upper())
+        ordered = ([exact] if exact is not None else []) + sorted(r for r in rows if r != exact)
+        return [self._record(row) for row in ordered[:limit]]
+
+    def suggest(self, symbol, limit=5):
+        """Symboles proches d'une saisie inconnue (préfixe puis ressemblance)"""
+        found = [r['symbol'] for r in self.search(symbol.split('.')[0], limit)]
+        close = difflib.get_close_matches(symbol.upper(), self.symbols, n=limit, cutoff=0.6)
+        return list(dict.fromkeys(found + close))[:limit]
+
+    def exchange(self, symbol):
+        row = self._index.get(symbol)
+        return self.records['exchange'][row].decode() if row is not None else _suffix_exchange(symbol)
+
+    def currency(self, symbol):
+        row = self._index.get(symbol)
+        if row is not None:
+            return self.records['currency'][row].decode()
+        return 'ILS' if symbol.endswith('.TA') else 'USD'
+
+    def unit(self, symbol):
+        """Unité de cotation ('agorot', 'dollar', 'points', ...)"""
+        row = self._index.get(symbol)
+        if row is not None:
+            return self.records['unit'][row].decode()
+        return 'agorot' if symbol.endswith('.TA') else 'dollar'
+
+    def columns(self, symbols, fields=('name_en', 'exchange', 'currency', 'unit')):
+        """Champs d'une liste de symboles en tableaux alignés ({champ: tableau}), sans boucle par fiche
+
+        Place, devise et unité des symboles absents sont déduites du suffixe, comme pour un symbole seul.
+        """
+        symbols = np.asarray(list(symbols), dtype=str)
+        rows = np.fromiter((self._index.get(s, -1) for s in symbols), dtype=np.int64, count=len(symbols))
+        known = rows >= 0
+        records = self.records[np.where(known, rows, 0)]
+        tase = np.char.endswith(symbols, '.TA')
+        fallback = {
+            'exchange': np.where(tase, 'TASE', 'US'),
+            'currency': np.where(tase, 'ILS', 'USD'),
+            'unit': np.where(tase, 'agorot', 'dollar'),
+        }
+        return {
+            field: np.where(known, np.char.decode(records[field], 'utf-8'), fallback.get(field, ''))
+            for field in fields
+        }
+
+    def label(self, symbol):
+        """Libellé d'affichage 'SYMBOLE — Nom / שם'"""
+        record = self.lookup(symbol)
+        if record is None:
+            return symbol
+        names = ' / '.join(n for n in (record['name_en'], record['name_he']) if n)
+        return f"{symbol} — {names}"
+
+_master = None
+_master_lock = threading.Lock()
+
+def get_symbol_master():
+    """Référentiel partagé par le processus (chargé une fois)"""
+    global _master
+    if _master is None:
+        with _master_lock:
+            if _master is None:
+                _master = SymbolMaster()
+    return _master
@@ -0,0 +1,89 @@
+"""Un déclenchement d'alerte n'est notifié qu'une fois : évaluateurs partageant la base, worker sur rejeu local"""
+import os
+import sys
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from alert_worker import run_cycle
+from alerts import AlertBook
+from market_data import ReplaySource, quotes_from_closes
+from storage import DEFAULT_EMAIL_CONFIG, TrackerStore
+
+def quotes(prices):
+    closes = pd.DataFrame([prices])
+    return quotes_from_closes(closes, list(prices))
+
+def test_transition_committed_once(tmp_path):
+    db = str(tmp_path / 'tracker.db')
+    worker, session = TrackerStore(db), TrackerStore(db)
+    worker.add_alert('u1', 'TEVA', 10.0, 'above', False, '2026-01-05 10:00:00')
+    worker.add_alert('u1', 'NICE', 10.0, 'above', True, '2026-01-05 10:00:00')
+
+    # Worker et session lisent le même état avant d'évaluer
+    books = [AlertBook(worker.get_all_alerts()), AlertBook(session.get_user_state('u1')['price_alerts'])]
+    results = [book.transition(quotes({'TEVA': 11.0, 'NICE': 11.0}), 1000.0) for book in books]
+    won = [book.commit(store, fired, changed) for book, store, (fired, _, changed) in zip(books, (worker, session), results)]
+
+    assert [len(fired) for fired, _, _ in results] == [2, 2]
+    assert [len(w) for w in won] == [2, 0]
+    alerts = worker.get_all_alerts()
+    assert [(a['symbol'], a['state']) for a in alerts] == [('TEVA', 'triggered')]
+
+def test_worker_heartbeat(tmp_path):
+    db = str(tmp_path / 'tracker.db')
+    worker, session = TrackerStore(db), TrackerStore(db)
+    assert not session.worker_alive('alert_worker')
+    worker.heartbeat('alert_worker', 30)
+    assert session.worker_alive('alert_worker')
+
+class CountingSource(ReplaySource):
+    """Rejeu local qui relève les symboles de chaque requête de cotations"""
+
+    def __init__(self, frame):
+        super().__init__(frame)
+        self.requests = []
+
+    def get_quotes(self, symbols):
+        self.requests.append(list(symbols))
+        return super().get_quotes(symbols)
+
+class RecordingDispatcher:
+    def __init__(self):
+        self.sent = []
+
+    def submit(self, config, subject, body, to_email):
+        self.sent.append((to_email, subject))
+
+def test_worker_cycle_on_replay(tmp_path):
+    store = TrackerStore(str(tmp_path / 'tracker.db'))
+    # Cours enregistrés dans l'unité de Yahoo (agorot pour les actions TASE)
+    source = CountingSource(pd.DataFrame({
+        'timestamp': ['2026-10-19 08:00'] * 3 + ['2026-10-19 08:01'] * 3,
+        'symbol': ['TEVA.TA', 'NICE.TA', 'AAPL'] * 2,
+        'close': [3400.0, 6000.0, 180.0, 3500.0, 5500.0, 200.0],
+    }))
+    created = '2026-10-19 09:00:00'
+    store.add_alert('u1', 'TEVA.TA', 34.5, 'above', False, created)
+    store.add_alert('u1', 'AAPL', 150.0, 'below', False, created)
+    store.add_alert('u2', 'TEVA.TA', 34.5, 'above', False, created)
+    store.add_alert('u2', 'NICE.TA', 60.0, 'below', False, created)
+    store.add_alert('u3', 'AAPL', 190.0, 'above', False, created)
+    for user_id in ('u1', 'u2'):
+        store.save_email_config(user_id, {**DEFAULT_EMAIL_CONFIG, 'enabled': True, 'email': f'{user_id}@example.com'})
+
+    dispatcher = RecordingDispatcher()
+    first = run_cycle(store, source, dispatcher)
+    second = run_cycle(store, source, dispatcher)
+
+    # Une requête par cycle, chaque symbole une seule fois
+    assert [sorted(r) for r in source.requests] == [['AAPL', 'NICE.TA', 'TEVA.TA']] * 2
+    assert (first['alerts'], first['triggered'], second['triggered']) == (5, 4, 0)
+    states = {(a['user_id'], a['symbol']): a['state'] for a in store.get_all_alerts()}
+    assert states == {
+        ('u1', 'TEVA.TA'): 'triggered', ('u1', 'AAPL'): 'armed', ('u2', 'TEVA.TA'): 'triggered',
+        ('u2', 'NICE.TA'): 'triggered', ('u3', 'AAPL'): 'triggered',
+    }
+    # Un récapitulatif par utilisateur configuré, au premier cycle seulement
+    assert sorted(to for to, _ in dispatcher.sent) == ['u1@example.com', 'u2@example.com']
@@ -0,0 +1,25 @@
+"""Les intervalles d'une période sont agrégés localement depuis une seule requête de la granularité de base"""
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from history_cache import HistoryCache
+from market_data import ReplaySource
+
+def one_minute_session(symbol, day='2026-10-19'):
+    """Séance TASE complète en barres 1 minute (10:00-17:15, heure d'Israël)"""
+    index = pd.date_range(f'{day} 10:00', f'{day} 17:14', freq='1min', tz='Asia/Jerusalem').tz_convert('UTC')
+    close = 100 * np.exp(np.cumsum(np.random.default_rng(0).normal(0, 1e-3, len(index))))
+    return pd.DataFrame({'timestamp': index, 'symbol': symbol, 'open': close, 'high': close * 1.001,
+                         'low': close * 0.999, 'close': close, 'volume': 100})
+
+def test_one_fetch_per_period():
+    cache = HistoryCache(ReplaySource(one_minute_session('TEVA.TA')))
+    counts = {interval: len(cache.get_interval('TEVA.TA', '1d', interval)) for interval in ('1m', '5m', '15m', '1h')}
+    assert cache.fetches == 1
+    # Barre de l'instant de rejeu exclue (fin de plage exclue)
+    assert counts == {'1m': 434, '5m': 87, '15m': 29, '1h': 8}
@@ -0,0 +1,96 @@
+"""Résultat réalisé FIFO et coût moyen comparés à des boucles de référence transaction par transaction"""
+import os
+import sys
+from collections import deque
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ledger import Ledger, build_ledger
+
+def reference(ledger, method):
+    """Résultat réalisé et coût restant par symbole, une transaction à la fois"""
+    realized, cost_basis = {}, {}
+    for symbol, rows in ledger.groupby('symbol', sort=False):
+        lots, cost, held, pnl = deque(), 0.0, 0.0, 0.0
+        for kind, qty, price, fees in rows[['type', 'quantity', 'price', 'fees']].itertuples(index=False):
+            if kind == 'buy':
+                lots.append([qty, price])
+                cost += qty * price
+                held += qty
+            elif kind == 'sell':
+                if method == 'fifo':
+                    sold, remaining = 0.0, qty
+                    while remaining > 1e-12:
+                        take = min(remaining, lots[0][0])
+                        sold += take * lots[0][1]
+                        lots[0][0] -= take
+                        remaining -= take
+                        if lots[0][0] <= 1e-12:
+                            lots.popleft()
+                    cost -= sold
+                else:
+                    sold = cost * qty / held
+                    cost = cost - sold if held - qty > 1e-9 else 0.0
+                held -= qty
+                pnl += qty * price - fees - sold
+        realized[symbol] = pnl
+        cost_basis[symbol] = cost if held > 1e-9 else 0.0
+    return pd.Series(realized), pd.Series(cost_basis)
+
+def random_ledger(n, n_symbols, seed):
+    """Achats et ventes aléatoires sans vente à découvert"""
+    rng = np.random.default_rng(seed)
+    symbols = rng.integers(0, n_symbols, n)
+    held = np.zeros(n_symbols)
+    portfolio, transactions = {}, []
+    dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(np.arange(n), unit='min')
+    for i, (code, date) in enumerate(zip(symbols, dates)):
+        symbol = f"SYM{code}"
+        price = float(rng.uniform(10, 200))
+        if held[code] > 0 and rng.random() < 0.45:
+            # Ventes partielles, parfois la position entière
+            qty = held[code] if rng.random() < 0.1 else float(np.round(held[code] * rng.uniform(0.1, 0.9), 4))
+            held[code] -= qty
+            transactions.append({'symbol': symbol, 'type': 'sell', 'date': date.isoformat(),
+                                 'quantity': qty, 'price': price, 'fees': 1.0})
+        else:
+            qty = float(rng.integers(1, 100))
+            held[code] += qty
+            portfolio.setdefault(symbol, []).append({'id': f"lot{i}", 'shares': qty, 'buy_price': price,
+                                                      'date': date.isoformat()})
+    return build_ledger(portfolio, transactions)
+
+def alternating_ledger(n_sells):
+    """Un achat puis n_sells ventes de la moitié de la position"""
+    portfolio = {'TEVA': [{'id': 'lot0', 'shares': 2.0 ** 60, 'buy_price': 50.0, 'date': '2020-01-01'}]}
+    held, transactions = 2.0 ** 60, []
+    dates = pd.Timestamp('2020-01-02') + pd.to_timedelta(np.arange(n_sells), unit='min')
+    for date in dates:
+        held /= 2
+        transactions.append({'symbol': 'TEVA', 'type': 'sell', 'date': date.isoformat(),
+                             'quantity': held, 'price': 55.0, 'fees': 0.0})
+    return build_ledger(portfolio, transactions)
+
+@pytest.mark.parametrize('method', ['fifo', 'average'])
+@pytest.mark.parametrize('build', [
+    lambda: random_ledger(20_000, 50, seed=0),
+    lambda: random_ledger(2_000, 3, seed=1),
+])
+def test_matches_reference(build, method):
+    ledger = build()
+    summary = Ledger(ledger).summary(method)
+    realized, cost_basis = reference(ledger, method)
+    np.testing.assert_allclose(summary['realized'], realized[summary.index], rtol=1e-9, atol=1e-6)
+    np.testing.assert_allclose(summary['cost_basis'], cost_basis[summary.index], rtol=1e-9, atol=1e-6)
+
+def test_average_cost_long_partial_sells():
+    ledger = alternating_ledger(1_500)
+    summary = Ledger(ledger).summary('average')
+    realized, cost_basis = reference(ledger, 'average')
+    assert np.isfinite(summary[['realized', 'cost_basis']].to_numpy()).all()
+    np.testing.assert_allclose(summary['realized'], realized[summary.index], rtol=1e-9)
+    np.testing.assert_allclose(summary['cost_basis'], cost_basis[summary.index], rtol=1e-9, atol=1e-9)
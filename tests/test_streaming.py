@@ -0,0 +1,79 @@
+"""Flux temps réel : ticks convertis dans l'unité de l'historique et agrégés en barres OHLCV"""
+import os
+import sys
+import threading
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import streaming
+from streaming import ReplayTickServer, StreamHub
+
+class IdleFeed:
+    """Connexion sans message, jusqu'à sa fermeture"""
+
+    def __init__(self):
+        self.closed = threading.Event()
+
+    def subscribe(self, symbols):
+        pass
+
+    def listen(self, callback):
+        self.closed.wait()
+
+    def close(self):
+        self.closed.set()
+
+def ms(timestamp):
+    return int(pd.Timestamp(timestamp).timestamp() * 1000)
+
+def test_tase_tick_in_shekels():
+    hub = StreamHub(url='ws://test', feed_factory=lambda url: IdleFeed())
+    hist = pd.DataFrame({'Open': [35.0], 'High': [35.1], 'Low': [34.9], 'Close': [35.0], 'Volume': [1000]},
+                        index=pd.DatetimeIndex(['2026-10-19 10:00'], tz='UTC'))
+    try:
+        hub.subscribe('TEVA.TA', '1m', hist)
+        # Tick Yahoo en agorot dans la barre amorcée
+        hub._on_message({'id': 'TEVA.TA', 'price': 3511.0, 'time': ms('2026-10-19 10:00:30+00:00')})
+        bar, tick, version = hub.snapshot('TEVA.TA', '1m')
+    finally:
+        hub.close()
+    assert tick['price'] == 35.11
+    assert (bar['open'], bar['high'], bar['low'], bar['close']) == (35.0, 35.11, 34.9, 35.11)
+    assert version == 1
+
+def wait_for(condition, timeout=20.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        time.sleep(0.05)
+
+def test_replay_server_bars(monkeypatch):
+    monkeypatch.setattr(streaming, 'RECONNECT_DELAY', 0.05)
+    ticks = pd.DataFrame({
+        'timestamp': ['2026-10-19 14:30:10', '2026-10-19 14:30:40', '2026-10-19 14:31:05', '2026-10-19 14:31:30'],
+        'symbol': 'AAPL',
+        'price': [100.0, 101.0, 99.0, 100.5],
+        'day_volume': [1000, 1500, 1700, 2000],
+    })
+    hist = pd.DataFrame({'Open': [100.0], 'High': [100.0], 'Low': [100.0], 'Close': [100.0], 'Volume': [0]},
+                        index=pd.DatetimeIndex(['2026-10-19 14:30'], tz='UTC'))
+    server = ReplayTickServer(ticks, speed=0)
+    hub = StreamHub(url=server.start())
+    try:
+        hub.subscribe('AAPL', '1m', hist)
+        wait_for(lambda: hub.versions.get('AAPL', 0) == len(ticks))
+        # Le serveur ferme la connexion en fin de fichier : le hub se reconnecte sans recevoir de doublons
+        wait_for(lambda: hub.reconnects >= 2)
+        bars = hub.bars('AAPL', '1m')
+    finally:
+        hub.close()
+        server.stop()
+    assert hub.versions['AAPL'] == len(ticks)
+    assert bars.index.tolist() == list(pd.DatetimeIndex(['2026-10-19 14:30', '2026-10-19 14:31'], tz='UTC'))
+    assert bars.to_numpy().tolist() == [
+        [100.0, 101.0, 100.0, 101.0, 500.0],
+        [99.0, 100.5, 99.0, 100.5, 500.0],
+    ]